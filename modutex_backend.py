@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - LLM Backends
+Where AI calls go and what the server behind them supports: the OpenAI API, or an
+OpenAI-compatible server on this machine (llama.cpp, vLLM, Ollama) whose model list is
+read from its /models endpoint
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+# Descriptions of the OpenAI models, shown in show_config and the GUI
+OPENAI_MODELS = {
+    "gpt-4": "GPT-4 (Best Quality - Expensive)",
+    "gpt-4-turbo": "GPT-4 Turbo (Recommended)",
+    "gpt-3.5-turbo": "GPT-3.5 Turbo (Fast & Cheap)"
+}
+
+# stream: server-sent events (needed for hedged requests); json_mode: response_format
+# json_object; n: several answers per request
+CAPABILITIES = ('stream', 'json_mode', 'n')
+
+PRESETS = {
+    'openai': {'base_url': "https://api.openai.com/v1", 'capabilities': CAPABILITIES, 'needs_key': True},
+    'local': {'base_url': "http://127.0.0.1:8080/v1", 'capabilities': ('stream', 'json_mode'), 'needs_key': False},
+}
+
+# Seconds to wait for a local server's model list
+MODELS_TIMEOUT = 3
+# Seconds before an unreachable server's model list is asked for again
+MODELS_RETRY = 30
+
+
+@dataclass
+class Backend:
+    """The active LLM server: base URL, models (name -> description) and capabilities"""
+    name: str
+    base_url: str
+    models: dict
+    capabilities: frozenset
+    needs_key: bool
+    # False when the model list could not be fetched and is only a placeholder
+    complete: bool = True
+
+    def supports(self, capability):
+        return capability in self.capabilities
+
+    @property
+    def default_model(self):
+        """OPENAI_MODEL when the backend has it, else the recommended or first model"""
+        model = os.environ.get('OPENAI_MODEL', "")
+        if model in self.models:
+            return model
+        if "gpt-4-turbo" in self.models:
+            return "gpt-4-turbo"
+        return next(iter(self.models), model or None)
+
+
+def fetch_models(base_url):
+    """Model ids served at base_url/models (OpenAI list format), or None if unreachable"""
+    try:
+        response = requests.get(f"{base_url}/models", timeout=MODELS_TIMEOUT)
+        response.raise_for_status()
+        return [entry['id'] for entry in response.json().get('data', []) if entry.get('id')]
+    except (requests.RequestException, ValueError, KeyError, AttributeError) as e:
+        print(f"[WARNING] Could not read the model list from {base_url}: {e}")
+        return None
+
+
+def _settings():
+    return tuple(os.environ.get(name, "") for name in
+                 ('MODUTEX_BACKEND', 'OPENAI_BASE_URL', 'MODUTEX_MODELS', 'MODUTEX_BACKEND_CAPS'))
+
+
+def load_backend():
+    """The backend described by MODUTEX_BACKEND (openai/local), OPENAI_BASE_URL,
+    MODUTEX_MODELS (comma-separated) and MODUTEX_BACKEND_CAPS (e.g. stream,json_mode)"""
+    name = os.environ.get('MODUTEX_BACKEND', "openai").strip().lower() or "openai"
+    if name not in PRESETS:
+        print(f"[WARNING] Unknown MODUTEX_BACKEND '{name}' - using openai (choices: {', '.join(PRESETS)})")
+        name = "openai"
+    preset = PRESETS[name]
+    base_url = (os.environ.get('OPENAI_BASE_URL') or preset['base_url']).rstrip("/")
+
+    capabilities = preset['capabilities']
+    caps = os.environ.get('MODUTEX_BACKEND_CAPS', "").strip()
+    if caps:
+        capabilities = [cap.strip() for cap in caps.split(",") if cap.strip() in CAPABILITIES]
+
+    listed = [model.strip() for model in os.environ.get('MODUTEX_MODELS', "").split(",") if model.strip()]
+    complete = True
+    if not listed and name == "openai":
+        models = dict(OPENAI_MODELS)
+    else:
+        names = listed or fetch_models(base_url)
+        if not names:
+            names = [os.environ.get('OPENAI_MODEL') or "local-model"]
+            complete = False
+        models = {model: OPENAI_MODELS.get(model, f"{model} ({name})") for model in names}
+    return Backend(name, base_url, models, frozenset(capabilities), preset['needs_key'], complete)
+
+
+_backend = None
+_backend_config = None
+_backend_loaded = 0.0
+_backend_lock = threading.Lock()
+
+
+def active_backend():
+    """The process-wide backend, loaded on first use and reloaded when its settings change;
+    a model list that could not be fetched is asked for again after MODELS_RETRY seconds"""
+    global _backend, _backend_config, _backend_loaded
+    config = _settings()
+    with _backend_lock:
+        stale = (_backend is not None and not _backend.complete
+                 and time.monotonic() - _backend_loaded > MODELS_RETRY)
+        if _backend is None or config != _backend_config or stale:
+            _backend = load_backend()
+            _backend_config = config
+            _backend_loaded = time.monotonic()
+        return _backend
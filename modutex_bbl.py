@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Bibliography Formatter
+Writes the .bbl for supported styles (ieeetr) straight from the .aux citations and the
+parsed .bib store, following the style file's rules so the output matches bibtex.
+Anything it cannot reproduce exactly makes it return None, and bibtex runs instead.
+"""
+
+import re
+from itertools import zip_longest
+from pathlib import Path
+
+from modutex_bib import load_bib_file
+
+# bibtex's .bbl line breaking (bibtex.web: max_print_line, min_print_line)
+MAX_PRINT_LINE = 79
+MIN_PRINT_LINE = 3
+# Names shorter than this get a tie instead of a space (bibtex.web: long_token, long_name)
+LONG_TOKEN = 3
+
+AUX_COMMAND = re.compile(r"^\\(citation|bibdata|bibstyle|@input)\{([^}]*)\}", re.MULTILINE)
+NAME_SEPARATOR = re.compile(r"\s+and\s+", re.IGNORECASE)
+PREAMBLE = re.compile(r"@\s*preamble\s*[{(]", re.IGNORECASE)
+
+# Control sequences that are letters of their own (they decide the case of a name token)
+FOREIGN_LETTERS = {"oe", "OE", "ae", "AE", "aa", "AA", "o", "O", "l", "L", "ss", "i", "j"}
+
+# ieeetr.bst month macros (a bare "month = jan"; a braced {jan} is printed as it is)
+IEEETR_MONTHS = {
+    "jan": "Jan.", "feb": "Feb.", "mar": "Mar.", "apr": "Apr.", "may": "May", "jun": "June",
+    "jul": "July", "aug": "Aug.", "sep": "Sept.", "oct": "Oct.", "nov": "Nov.", "dec": "Dec.",
+}
+# Fields ieeetr.bst reads for an entry type that this formatter does not reproduce
+IEEETR_UNSUPPORTED = {
+    'article': {"crossref"},
+    'inproceedings': {"crossref", "editor", "volume", "number", "series"},
+    'conference': {"crossref", "editor", "volume", "number", "series"},
+    'book': {"crossref", "editor", "volume", "number", "series", "edition"},
+    'misc': set(),
+}
+
+
+class Unsupported(Exception):
+    """The entry needs a rule this formatter does not implement"""
+
+
+def read_aux(aux_file):
+    """(citation keys in order, bib database names, style) of an .aux and the files it \\@inputs"""
+    aux_file = Path(aux_file)
+    citations, databases, style = [], [], None
+    pending = [aux_file]
+    while pending:
+        path = pending.pop(0)
+        if not path.exists():
+            return None
+        for command, argument in AUX_COMMAND.findall(path.read_text(encoding='utf-8', errors='replace')):
+            if command == "citation":
+                citations.extend(key.strip() for key in argument.split(",") if key.strip())
+            elif command == "bibdata":
+                databases.extend(name.strip() for name in argument.split(",") if name.strip())
+            elif command == "bibstyle":
+                style = argument.strip()
+            else:
+                pending.append(aux_file.parent / argument)
+    return citations, databases, style
+
+
+def _ascii_lower(text):
+    return "".join(char.lower() if "A" <= char <= "Z" else char for char in text)
+
+
+def _brace_group(text, position):
+    """End index (exclusive) of the {...} group starting at text[position]"""
+    depth = 0
+    for index in range(position, len(text)):
+        if text[index] == "{":
+            depth += 1
+        elif text[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    raise Unsupported("unbalanced braces")
+
+
+def add_period(text):
+    """bibtex's add.period$: a period unless the text already ends with . ? or !"""
+    stripped = text.rstrip("}")
+    if not stripped or stripped[-1] in ".?!":
+        return text
+    return text + "."
+
+
+def title_case(text):
+    """bibtex's "t" change.case$: lower-case everything except the first character, the
+    first character after a colon and a space, and anything in braces"""
+    output = []
+    prev_colon = False
+    position = 0
+    while position < len(text):
+        char = text[position]
+        keep = position == 0 or (prev_colon and text[position - 1] in " \t")
+        if char == "{":
+            end = _brace_group(text, position)
+            group = text[position:end]
+            if group.startswith("{\\") and not keep:
+                # Special character such as {\"O}: lower its letters, not nested groups
+                match = re.match(r"\{\\([A-Za-z]+|.)", group)
+                name = match.group(1)
+                if name in FOREIGN_LETTERS:
+                    name = _ascii_lower(name)
+                rest = group[match.end():]
+                converted, depth = [], 0
+                for inner in rest:
+                    depth += inner == "{"
+                    converted.append(inner if depth else _ascii_lower(inner))
+                    depth -= inner == "}"
+                group = "{\\" + name + "".join(converted)
+            output.append(group)
+            prev_colon = False
+            position = end
+            continue
+        output.append(char if keep else _ascii_lower(char))
+        if char == ":":
+            prev_colon = True
+        elif char not in " \t":
+            prev_colon = False
+        position += 1
+    return "".join(output)
+
+
+def n_dashify(pages):
+    """A single hyphen in a page range becomes an en dash; longer runs stay as they are"""
+    return re.sub(r"(?<!-)-(?!-)", "--", pages)
+
+
+def text_length(text):
+    """Characters as bibtex counts them: a {\\...} special character is one, braces are none"""
+    text = re.sub(r"\{\\[^{}]*\}", "x", text)
+    return len(text.replace("{", "").replace("}", "").encode('utf-8'))
+
+
+def _is_lower_token(token):
+    """Whether a name token starts with a lower-case letter (a "von" word)"""
+    position = 0
+    while position < len(token):
+        char = token[position]
+        if char == "{":
+            end = _brace_group(token, position)
+            match = re.match(r"\{\\([A-Za-z]+|[^A-Za-z])\s*([^A-Za-z]*)([A-Za-z]?)", token[position:end])
+            if match:
+                if match.group(1) in FOREIGN_LETTERS:
+                    return match.group(1)[0].islower()
+                if match.group(3):
+                    return match.group(3).islower()
+            position = end
+            continue
+        if "A" <= char <= "Z":
+            return False
+        if "a" <= char <= "z":
+            return True
+        position += 1
+    return False
+
+
+def _name_tokens(part):
+    """[(token, separator before it)] of one comma-separated part of a name"""
+    tokens = []
+    current, separator, position = "", "", 0
+    while position < len(part):
+        char = part[position]
+        if char == "{":
+            end = _brace_group(part, position)
+            current += part[position:end]
+            position = end
+            continue
+        if char in " \t~-":
+            if current:
+                tokens.append((current, separator))
+                current, separator = "", ""
+            if char in "~-":
+                separator = char
+            elif not separator:
+                separator = " "
+        else:
+            current += char
+        position += 1
+    if current:
+        tokens.append((current, separator))
+    return tokens
+
+
+def split_name(name):
+    """(first, von, last, jr) token lists of one name, as bibtex splits it"""
+    parts = []
+    current, position = "", 0
+    while position < len(name):
+        if name[position] == "{":
+            end = _brace_group(name, position)
+            current += name[position:end]
+            position = end
+        elif name[position] == ",":
+            parts.append(current)
+            current = ""
+            position += 1
+        else:
+            current += name[position]
+            position += 1
+    parts.append(current)
+    parts = [_name_tokens(part.strip()) for part in parts]
+    if len(parts) > 3:
+        raise Unsupported("too many commas in a name")
+
+    if len(parts) == 1:
+        tokens = parts[0]
+        lower = [index for index, (token, _) in enumerate(tokens[:-1]) if _is_lower_token(token)]
+        if lower:
+            return tokens[:lower[0]], tokens[lower[0]:lower[-1] + 1], tokens[lower[-1] + 1:], []
+        return tokens[:-1], [], tokens[-1:], []
+
+    von_last = parts[0]
+    lower = [index for index, (token, _) in enumerate(von_last[:-1]) if _is_lower_token(token)]
+    von_end = lower[-1] + 1 if lower else 0
+    jr = parts[1] if len(parts) == 3 else []
+    return parts[-1], von_last[:von_end], von_last[von_end:], jr
+
+
+def _initial(token):
+    """First letter of a token for an abbreviated first name"""
+    if token.startswith("{\\"):
+        return token[:_brace_group(token, 0)]
+    if not ("A" <= token[0] <= "Z" or "a" <= token[0] <= "z"):
+        raise Unsupported(f"cannot abbreviate {token!r}")
+    return token[0]
+
+
+def _format_part(tokens, abbreviate, post):
+    """One name part with bibtex's default separators: a tie between the last two tokens
+    or after short text, otherwise a space; a final "~" in post follows the same rule"""
+    if not tokens:
+        return ""
+    text = ""
+    for index, (token, _) in enumerate(tokens):
+        text += (_initial(token) + ".") if abbreviate else token
+        if index < len(tokens) - 1:
+            separator = tokens[index + 1][1]
+            if separator in ("-", "~"):
+                text += separator
+            elif index == len(tokens) - 2 or text_length(text) < LONG_TOKEN:
+                text += "~"
+            else:
+                text += " "
+    if post.endswith("~") and not post.endswith("~~"):
+        text += post[:-1]
+        text += "~" if text_length(text) < LONG_TOKEN else " "
+    else:
+        text += post
+    return text
+
+
+def format_name(name):
+    """One name in ieeetr's "{f.~}{vv~}{ll}{, jj}" form (e.g. "R.~E. Kalman")"""
+    first, von, last, jr = split_name(name)
+    if not last:
+        raise Unsupported(f"name without a last name: {name!r}")
+    return (_format_part(first, True, "~") + _format_part(von, False, "~")
+            + _format_part(last, False, "") + (", " + _format_part(jr, False, "") if jr else ""))
+
+
+def format_names(value):
+    """ieeetr's author list: "A and B", "A, B, and C", "A et~al." for "others\""""
+    if not value.isascii():
+        # bibtex abbreviates byte by byte, which splits multi-byte letters
+        raise Unsupported("non-ASCII name")
+    names = []
+    depth, start = 0, 0
+    for match in NAME_SEPARATOR.finditer(value):
+        depth = value.count("{", 0, match.start()) - value.count("}", 0, match.start())
+        if depth == 0:
+            names.append(value[start:match.start()])
+            start = match.end()
+    names.append(value[start:])
+    names = [name.strip() for name in names if name.strip()]
+
+    text = ""
+    for index, name in enumerate(names):
+        formatted = format_name(name)
+        if index == 0:
+            text = formatted
+        elif index < len(names) - 1:
+            text += ", " + formatted
+        else:
+            if len(names) > 2:
+                text += ","
+            text += " et~al." if formatted == "others" else " and " + formatted
+    return text
+
+
+def emphasize(text):
+    return "{\\em " + text + "}" if text else ""
+
+
+class EntryWriter:
+    """The style's output state machine: each piece is joined to the previous one with a
+    comma, a closing quote or a \\newblock, depending on the state"""
+
+    BEFORE_ALL, MID_SENTENCE, AFTER_BLOCK, AFTER_QUOTE, AFTER_QUOTED_BLOCK = range(5)
+
+    def __init__(self, key):
+        self.lines = ["", f"\\bibitem{{{key}}}"]
+        self.buffer = ""
+        self.pending = ""
+        self.state = self.BEFORE_ALL
+
+    def output(self, text):
+        if not text:
+            return
+        if self.state == self.MID_SENTENCE:
+            self.buffer += self.pending + ", "
+        elif self.state == self.AFTER_QUOTE:
+            self.buffer += self.pending + ",'' "
+        elif self.state == self.AFTER_QUOTED_BLOCK:
+            self._newblock(self.pending + ".''")
+        elif self.state == self.AFTER_BLOCK:
+            self._newblock(add_period(self.pending))
+        else:
+            self.buffer += self.pending
+        self.pending = text
+        self.state = self.MID_SENTENCE
+
+    def output_quoted(self, text):
+        """A title in quotes; its closing comma or period depends on what follows"""
+        if text:
+            self.output("``" + text)
+            self.state = self.AFTER_QUOTE
+
+    def _newblock(self, text):
+        self.lines.append(self.buffer + text)
+        self.buffer = "\\newblock "
+
+    def new_block(self):
+        if self.state == self.AFTER_QUOTE:
+            self.state = self.AFTER_QUOTED_BLOCK
+        elif self.state != self.BEFORE_ALL:
+            self.state = self.AFTER_BLOCK
+
+    def finish(self):
+        if self.state == self.AFTER_QUOTE:
+            self.lines.append(self.buffer + self.pending + ".''")
+        else:
+            self.lines.append(self.buffer + add_period(self.pending))
+        return self.lines
+
+
+def _date(entry):
+    year, month = entry.get('year'), entry.get('month')
+    if 'month' in entry.macros:
+        if month.lower() not in IEEETR_MONTHS:
+            raise Unsupported(f"month macro {month!r}")
+        month = IEEETR_MONTHS[month.lower()]
+    if not year:
+        return month
+    return f"{month} {year}" if month else year
+
+
+def _pages(entry):
+    pages = entry.get('pages')
+    if not pages:
+        return ""
+    if re.search(r"[-,+]", pages):
+        return "pp.~" + n_dashify(pages)
+    return "p.~" + pages
+
+
+def format_ieeetr(entry):
+    """Lines of one entry in ieeetr.bst's format"""
+    entry_type = entry.type
+    if entry_type not in IEEETR_UNSUPPORTED:
+        raise Unsupported(f"@{entry_type}")
+    unsupported = IEEETR_UNSUPPORTED[entry_type] & {name for name, value in entry.fields.items() if value}
+    if unsupported:
+        raise Unsupported(", ".join(sorted(unsupported)))
+    # Style macros other than months (journal abbreviations, undefined words) are bibtex's
+    macros = entry.macros - {'month'}
+    if macros:
+        raise Unsupported("macro in " + ", ".join(sorted(macros)))
+
+    writer = EntryWriter(entry.key)
+    writer.output(format_names(entry.get('author')))
+    if entry_type == "article":
+        writer.output_quoted(title_case(entry.get('title')))
+        writer.output(emphasize(entry.get('journal')))
+        writer.output("vol.~" + entry.get('volume') if entry.get('volume') else "")
+        writer.output("no.~" + entry.get('number') if entry.get('number') else "")
+        writer.output(_pages(entry))
+        writer.output(_date(entry))
+    elif entry_type in ("inproceedings", "conference"):
+        writer.output_quoted(title_case(entry.get('title')))
+        writer.output("in " + emphasize(entry.get('booktitle')) if entry.get('booktitle') else "")
+        writer.output(f"({entry.get('address')})" if entry.get('address') else "")
+        writer.output(_pages(entry))
+        writer.output(entry.get('organization'))
+        writer.output(entry.get('publisher'))
+        writer.output(_date(entry))
+    elif entry_type == "book":
+        writer.output(emphasize(entry.get('title')))
+        writer.new_block()
+        publisher, address = entry.get('publisher'), entry.get('address')
+        writer.output(f"{address}: {publisher}" if address and publisher else publisher or address)
+        writer.output(_date(entry))
+    else:  # misc
+        writer.output_quoted(title_case(entry.get('title')))
+        if entry.get('howpublished'):
+            writer.new_block()
+            writer.output(entry.get('howpublished'))
+        writer.output(_date(entry))
+    writer.new_block()
+    writer.output(entry.get('note'))
+    return writer.finish()
+
+
+# \bibliographystyle name -> entry formatter; other styles always go to bibtex
+STYLES = {'ieeetr': format_ieeetr}
+
+
+def break_line(line):
+    """Split one logical .bbl line the way bibtex does: at the last space that keeps the
+    line within 79 bytes, continuing with two spaces of indentation"""
+    data = line.encode('utf-8')
+    lines = []
+    while len(data) > MAX_PRINT_LINE:
+        position = MAX_PRINT_LINE
+        while position >= MIN_PRINT_LINE and data[position] not in b" \t":
+            position -= 1
+        if position < MIN_PRINT_LINE:
+            # No space early enough: break at the first one after the limit, if any
+            position = MAX_PRINT_LINE
+            while position < len(data) and data[position] not in b" \t":
+                position += 1
+            if position == len(data):
+                break
+        lines.append(data[:position].rstrip(b" \t"))
+        data = b"  " + data[position + 1:]
+    lines.append(data.rstrip(b" \t"))
+    return [part.decode('utf-8') for part in lines]
+
+
+def format_bbl(aux_file, root=Path(".")):
+    """The .bbl bibtex would write for this .aux, or None when bibtex has to run"""
+    aux = read_aux(aux_file)
+    if aux is None:
+        return None
+    citations, databases, style = aux
+    formatter = STYLES.get(style)
+    if formatter is None or not databases:
+        return None
+
+    entries = {}
+    ordered = []
+    for name in databases:
+        path = Path(root) / (name + ".bib")
+        if not path.exists():
+            return None
+        if PREAMBLE.search(path.read_text(encoding='utf-8', errors='replace')):
+            return None  # bibtex writes @preamble text into the .bbl
+        for entry in load_bib_file(path):
+            # The first definition wins, as in bibtex
+            if entry.key.lower() not in entries:
+                entries[entry.key.lower()] = entry
+                ordered.append(entry)
+
+    # Citation order (unsorted style); \nocite{*} adds every remaining entry in file order
+    cited = []
+    seen = set()
+    for key in citations:
+        if key == "*":
+            keys = [entry.key.lower() for entry in ordered]
+        elif key.lower() in entries:
+            keys = [key.lower()]
+        else:
+            print(f"[WARNING] Bibliography: no entry for citation '{key}'")
+            keys = []
+        for name in keys:
+            if name not in seen:
+                seen.add(name)
+                cited.append(entries[name])
+
+    lines = []
+    try:
+        for entry in cited:
+            lines.extend(formatter(entry))
+    except Unsupported:
+        return None
+
+    width = "1" + "0" * (len(str(len(cited))) - 1) if cited else ""
+    lines = [f"\\begin{{thebibliography}}{{{width}}}"] + lines + ["", "\\end{thebibliography}"]
+    return "".join(part + "\n" for line in lines for part in break_line(line))
+
+
+def verify_bbl(expected, bbl_file):
+    """Compare in-process output with the .bbl bibtex just wrote (MODUTEX_BBL=verify)"""
+    try:
+        actual = Path(bbl_file).read_text(encoding='utf-8', errors='replace')
+    except FileNotFoundError:
+        return False
+    for number, (ours, theirs) in enumerate(zip_longest(expected.splitlines(), actual.splitlines()), 1):
+        if ours != theirs:
+            print(f"[WARNING] In-process bibliography differs from bibtex at line {number}:")
+            print(f"  bibtex:     {theirs}")
+            print(f"  in-process: {ours}")
+            return False
+    print("[SUCCESS] In-process bibliography matches bibtex")
+    return True
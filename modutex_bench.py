@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Throughput Benchmarks
+Drives the AI commands, DOI lookups and batch runs against the local mock server and
+reports throughput, latency percentiles and memory, keeping every run so results can
+be compared across commits
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from modutex_jobs import STATE_DIR
+from modutex_mockserver import MockConfig, MockServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RESULTS_FILE = STATE_DIR / "bench" / "results.jsonl"
+
+# Seconds between resident-memory samples while a scenario runs
+MEMORY_SAMPLE_INTERVAL = 0.02
+
+# A slower p95 or lower throughput than this (relative) is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+PROJECT_FILES = ("main.tex", "sections", "bib", "document.json")
+
+SAMPLE_TEXT = """# Background
+
+Gradient methods minimise the loss $L(\\theta)$ over the parameters.
+
+The update rule uses \\nabla L and a step size \\eta chosen per layer | see the table.
+
+- fast convergence
+- simple to implement
+"""
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def current_rss_mb():
+    """Resident memory of this process right now in MB, or None where it cannot be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class MemoryWatch:
+    """Highest resident memory while one scenario runs, sampled from a background thread.
+
+    The process-wide peak (ru_maxrss) never goes down, so after the first heavy scenario
+    it reports the same number for every later one; sampling the current RSS does not.
+    """
+
+    def __init__(self):
+        self.start = current_rss_mb()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(MEMORY_SAMPLE_INTERVAL):
+            rss = current_rss_mb()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def __enter__(self):
+        if self.start is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return False
+
+    def stats(self):
+        """{'peak_rss_mb', 'rss_growth_mb'} for the scenario (None where RSS is unavailable)"""
+        if self.start is None:
+            return {'peak_rss_mb': None, 'rss_growth_mb': None}
+        return {'peak_rss_mb': round(self.peak, 1), 'rss_growth_mb': round(self.peak - self.start, 1)}
+
+
+class HeadlessApp:
+    """Stand-in for ModuTexGUI without a window: run_ai_task keeps its worker thread,
+    tracing span and section-list refresh, only the Tk widget updates are left out"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+    def log_message(self, message):
+        pass
+
+    def set_status(self, text):
+        pass
+
+    def start_progress(self):
+        pass
+
+    def stop_progress(self):
+        pass
+
+    def update_sections_list(self):
+        # The GUI re-reads the section index after every task (its last step)
+        from modutex_index import load_index
+        load_index().sections()
+        self.done.set()
+
+
+def git_commit(directory="."):
+    try:
+        process = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                 cwd=directory)
+        return process.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def prepare_project(source, directory):
+    """Copy the project's LaTeX files into a scratch directory the benchmark may modify"""
+    for name in PROJECT_FILES:
+        path = Path(source) / name
+        if path.is_dir():
+            shutil.copytree(path, Path(directory) / name)
+        elif path.is_file():
+            shutil.copyfile(path, Path(directory) / name)
+    (Path(directory) / "sections").mkdir(exist_ok=True)
+    (Path(directory) / "bib").mkdir(exist_ok=True)
+
+
+def _stream_first_byte(base_url, index):
+    """Time to first streamed byte of a raw chat request (what hedging and streaming UIs see)"""
+    start = time.perf_counter()
+    response = requests.post(f"{base_url}/chat/completions", stream=True, timeout=60,
+                             headers={"Authorization": f"Bearer {os.environ.get('OPENAI_API_KEY')}"},
+                             json={"model": "gpt-3.5-turbo", "stream": True,
+                                   "messages": [{"role": "user", "content": f"benchmark {index}"}]})
+    with response:
+        if response.status_code != 200:
+            return False
+        next(response.iter_content(chunk_size=1))
+        first_byte = time.perf_counter() - start
+        for _ in response.iter_content(chunk_size=4096):
+            pass
+    return first_byte
+
+
+def scenarios(texchat, base_url):
+    """name -> (setup(count), run(index)); run returns True/False, or a latency override"""
+    def setup_edit(count):
+        for index in range(count):
+            Path("sections", f"bench_edit_{index}.tex").write_text(
+                "\\subsection{Draft}\nA first draft of the text that needs improving.\n", encoding='utf-8')
+
+    def setup_text(count):
+        for index in range(count):
+            Path(f"bench_notes_{index}.md").write_text(SAMPLE_TEXT, encoding='utf-8')
+
+    def run_batch(index):
+        jobs = [{'command': "add_section", 'name': f"bench_batch_{index}_{job}", 'prompt': "Benchmark section"}
+                for job in range(3)] + [{'command': "cite_doi", 'doi': f"10.5555/bench.batch.{index}"}]
+        batch_file = Path(f"bench_batch_{index}.json")
+        batch_file.write_text(json.dumps(jobs), encoding='utf-8')
+        batch = texchat.queue_batch(batch_file)
+        return batch is not None and texchat.resume_batch(batch)
+
+    def run_gui_task(index):
+        # The path the Generate Section dialog takes: run_ai_task's worker thread
+        from modutex_gui import ModuTexGUI
+        app = HeadlessApp()
+        outcome = []
+
+        def generate_and_update():
+            outcome.append(bool(texchat.generate_section(f"bench_gui_{index}", "Benchmark section about caching")
+                                and texchat.update_main_tex()))
+            return outcome[-1]
+
+        ModuTexGUI.run_ai_task(app, generate_and_update)
+        return app.done.wait(120) and bool(outcome) and outcome[0]
+
+    return {
+        'add_section': (None, lambda i: texchat.generate_section(f"bench_add_{i}", "Benchmark section about caching")),
+        'edit_section': (setup_edit, lambda i: texchat.edit_section(f"bench_edit_{i}", "Make it more concise")),
+        'text_to_latex': (setup_text, lambda i: texchat.text_to_latex(f"bench_notes_{i}.md", f"bench_text_{i}")),
+        'cite_doi': (None, lambda i: texchat.fetch_doi_citation(f"10.5555/bench.{i}")),
+        'batch': (None, run_batch),
+        'gui_task': (None, run_gui_task),
+        'stream_first_byte': (None, lambda i: _stream_first_byte(base_url, i)),
+    }
+
+
+def run_scenario(name, setup, run, count, concurrency):
+    """Run one scenario `count` times with `concurrency` threads; returns its statistics"""
+    if setup:
+        setup(count)
+    latencies = []
+    errors = 0
+
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            outcome = run(index)
+        except Exception:
+            outcome = False
+        return outcome, time.perf_counter() - start
+
+    start = time.perf_counter()
+    # The commands print progress; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()), MemoryWatch() as memory:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for outcome, seconds in pool.map(timed, range(count)):
+                if outcome is False or outcome is None:
+                    errors += 1
+                else:
+                    # A float outcome is the latency that matters (e.g. time to first byte)
+                    latencies.append(outcome if isinstance(outcome, float) else seconds)
+    wall_clock = time.perf_counter() - start
+    return {
+        'ops': count,
+        'errors': errors,
+        'seconds': round(wall_clock, 3),
+        'throughput': round((count - errors) / wall_clock, 3) if wall_clock else None,
+        'mean': round(sum(latencies) / len(latencies), 4) if latencies else None,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        **memory.stats(),
+    }
+
+
+def load_results():
+    try:
+        lines = RESULTS_FILE.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return []
+    results = []
+    for line in lines:
+        try:
+            results.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return results
+
+
+def compare(current, baseline):
+    """Print per-scenario changes against an earlier run; returns the regressed scenario names"""
+    print(f"\n[COMPARE] Against {baseline.get('commit') or 'unknown commit'} "
+          f"({time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['timestamp']))})")
+    regressions = []
+    for name, stats in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before or not before.get('p95') or not stats.get('p95') or not before.get('throughput'):
+            continue
+        p95_change = stats['p95'] / before['p95'] - 1
+        throughput_change = (stats['throughput'] or 0) / before['throughput'] - 1
+        regressed = p95_change > REGRESSION_THRESHOLD or throughput_change < -REGRESSION_THRESHOLD
+        if regressed:
+            regressions.append(name)
+        print(f"  {'SLOWER' if regressed else 'ok    '} {name:<18} p95 {p95_change:+6.1%}  "
+              f"throughput {throughput_change:+6.1%}")
+    return regressions
+
+
+def run_benchmarks(names=None, count=20, concurrency=4, config=None, label=None, save=True,
+                   baseline_commit=None):
+    """Start the mock server, run the scenarios in a scratch copy of the project and report"""
+    config = config or MockConfig()
+    project = Path.cwd()
+    workspace = Path(tempfile.mkdtemp(prefix="modutex-bench-"))
+    server = MockServer(config, port=0).start()
+    saved_env = {name: os.environ.get(name) for name in ("OPENAI_API_KEY", "OPENAI_BASE_URL", "CROSSREF_URL")}
+    try:
+        prepare_project(project, workspace)
+        os.chdir(workspace)
+        import texchat  # Imported here: it loads .env, which must not override the mock settings
+        os.environ.update({'OPENAI_API_KEY': "sk-mock-benchmark", 'OPENAI_BASE_URL': f"{server.url}/v1",
+                           'CROSSREF_URL': server.url})
+        available = scenarios(texchat, f"{server.url}/v1")
+        names = names or list(available)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            print(f"[ERROR] Unknown scenario(s): {', '.join(unknown)} (available: {', '.join(available)})")
+            return None
+
+        print(f"[BENCH] {len(names)} scenario(s), {count} operation(s) each, concurrency {concurrency}, "
+              f"mock latency {config.latency:.2f}s")
+        report = {'timestamp': time.time(), 'commit': git_commit(project), 'label': label,
+                  'settings': {'count': count, 'concurrency': concurrency, 'mock': vars(config)},
+                  'scenarios': {}}
+        for name in names:
+            setup, run = available[name]
+            stats = run_scenario(name, setup, run, count, concurrency)
+            report['scenarios'][name] = stats
+            print(f"  {name:<18} {stats['throughput'] or 0:7.2f} op/s  p50 {_ms(stats['p50'])}  "
+                  f"p95 {_ms(stats['p95'])}  p99 {_ms(stats['p99'])}  errors {stats['errors']}/{stats['ops']}"
+                  + (f"  peak RSS {stats['peak_rss_mb']} MB (+{stats['rss_growth_mb']})"
+                     if stats['peak_rss_mb'] is not None else ""))
+        report['mock_requests'] = dict(server.counts)
+    finally:
+        os.chdir(project)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.stop()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    # Compare with the latest earlier run that used the same settings
+    earlier = [result for result in load_results()
+               if result.get('settings') == report['settings']
+               and (baseline_commit is None or result.get('commit') == baseline_commit)]
+    if earlier:
+        compare(report, earlier[-1])
+    elif baseline_commit:
+        print(f"[INFO] No earlier run of commit {baseline_commit} with these settings to compare against")
+
+    if save:
+        RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"[INFO] Results appended to {RESULTS_FILE}")
+    return report
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:6.0f}ms" if seconds is not None else "     -  "
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ModuTex throughput benchmarks against a local mock API")
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run (default: all)')
+    parser.add_argument('--requests', type=int, default=20, help='Operations per scenario (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent operations (default: 4)')
+    parser.add_argument('--latency', type=float, default=0.2, help='Mock time to first token (default: 0.2s)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Mock latency noise (default: 0.05s)')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of very slow requests')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of HTTP 500 answers')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of HTTP 429 answers')
+    parser.add_argument('--seed', type=int, default=1, help='Mock random seed (default: 1)')
+    parser.add_argument('--label', help='Free-form note stored with the results')
+    parser.add_argument('--baseline', help='Compare against the latest run of this commit')
+    parser.add_argument('--no-save', action='store_true', help=f'Do not append to {RESULTS_FILE}')
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate,
+                        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+                        crossref_latency=args.latency / 2)
+    report = run_benchmarks(args.scenarios, args.requests, args.concurrency, config, args.label,
+                            save=not args.no_save, baseline_commit=args.baseline)
+    sys.exit(0 if report else 1)
+
+
+if __name__ == "__main__":
+    main()
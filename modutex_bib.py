@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Bibliography Store
+Fast in-process BibTeX parser with a per-file cache keyed by mtime and size
+"""
+
+import re
+import threading
+from pathlib import Path
+
+BIB_DIR = Path("bib")
+
+ENTRY_START = re.compile(r"@\s*([A-Za-z]+)\s*([{(])")
+FIELD_NAME = re.compile(r"\s*([A-Za-z][\w\-:.]*)\s*=\s*")
+BARE_WORD = re.compile(r"[^\s,#}\)]+")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class BibEntry:
+    """One BibTeX entry: type, key, raw field values and where it was defined.
+
+    macros names the fields that use a bare word the file does not define with @string
+    (e.g. month = jan); the bibliography style expands those, so the text differs from
+    a braced {jan}.
+    """
+    __slots__ = ("type", "key", "fields", "file", "line", "macros")
+
+    def __init__(self, entry_type, key, fields, file=None, line=0, macros=()):
+        self.type = entry_type
+        self.key = key
+        self.fields = fields
+        self.file = file
+        self.line = line
+        self.macros = frozenset(macros)
+
+    def get(self, name, default=""):
+        return self.fields.get(name, default)
+
+    def __repr__(self):
+        return f"BibEntry({self.type}, {self.key})"
+
+
+def _read_braced(text, position):
+    """Return (content, end) of a {...} group starting at text[position] == '{'"""
+    depth = 0
+    for index in range(position, len(text)):
+        char = text[index]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[position + 1:index], index + 1
+    return text[position + 1:], len(text)
+
+
+def _read_value(text, position, strings, macros=None):
+    """Parse a field value: {..}, ".." or bare words/macros joined with #; bare words
+    that are neither numbers nor @strings are appended to macros"""
+    parts = []
+    while position < len(text):
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            break
+        char = text[position]
+        if char == "{":
+            content, position = _read_braced(text, position)
+            parts.append(content)
+        elif char == '"':
+            depth = 0
+            end = position + 1
+            while end < len(text):
+                if text[end] == "{":
+                    depth += 1
+                elif text[end] == "}":
+                    depth -= 1
+                elif text[end] == '"' and depth == 0 and text[end - 1] != "\\":
+                    break
+                end += 1
+            parts.append(text[position + 1:end])
+            position = end + 1
+        else:
+            match = BARE_WORD.match(text, position)
+            if not match:
+                break
+            word = match.group(0)
+            if macros is not None and not word.isdigit() and word.lower() not in strings:
+                macros.append(word)
+            parts.append(strings.get(word.lower(), word))
+            position = match.end()
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position < len(text) and text[position] == "#":
+            position += 1
+            continue
+        break
+    return "".join(parts), position
+
+
+def parse_bib(text, file=None):
+    """Parse BibTeX source into a list of BibEntry (duplicates are kept)"""
+    entries = []
+    strings = {}
+    position = 0
+    # Line numbers are counted on from the previous entry, keeping the parse linear
+    line, counted = 1, 0
+    while True:
+        match = ENTRY_START.search(text, position)
+        if not match:
+            break
+        entry_type = match.group(1).lower()
+        line += text.count("\n", counted, match.start())
+        counted = match.start()
+        closing = "}" if match.group(2) == "{" else ")"
+        position = match.end()
+
+        if entry_type == "comment":
+            if match.group(2) == "{":
+                _, position = _read_braced(text, match.end() - 1)
+            continue
+        if entry_type == "preamble":
+            _, position = _read_value(text, position, strings)
+            continue
+        if entry_type == "string":
+            name = FIELD_NAME.match(text, position)
+            if name:
+                value, position = _read_value(text, name.end(), strings)
+                strings[name.group(1).lower()] = value
+            continue
+
+        key_end = text.find(",", position)
+        brace_end = text.find(closing, position)
+        if key_end == -1 or (brace_end != -1 and brace_end < key_end):
+            position = brace_end + 1 if brace_end != -1 else len(text)
+            continue
+        key = text[position:key_end].strip()
+        position = key_end + 1
+
+        fields = {}
+        macros = set()
+        while True:
+            field = FIELD_NAME.match(text, position)
+            if not field:
+                break
+            used = []
+            value, position = _read_value(text, field.end(), strings, used)
+            fields[field.group(1).lower()] = re.sub(r"\s+", " ", value).strip()
+            if used:
+                macros.add(field.group(1).lower())
+            while position < len(text) and text[position] in " \t\r\n,":
+                position += 1
+        end = text.find(closing, position)
+        position = end + 1 if end != -1 else len(text)
+        entries.append(BibEntry(entry_type, key, fields, file, line, macros))
+    return entries
+
+
+def clear_cache():
+    """Forget every parsed file, so the next load parses from disk (used by the benchmarks)"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def load_bib_file(path):
+    """Parsed entries of one .bib file, cached until its mtime or size changes"""
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return []
+    stamp = (stat.st_mtime, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path.as_posix())
+        if cached and cached[0] == stamp:
+            return cached[1]
+    entries = parse_bib(path.read_text(encoding='utf-8', errors='replace'), path.as_posix())
+    with _cache_lock:
+        _cache[path.as_posix()] = (stamp, entries)
+    return entries
+
+
+def bib_files_for(main_file="main.tex"):
+    """The .bib files main.tex's \\bibliography uses, or everything in bib/"""
+    main_file = Path(main_file)
+    if main_file.exists():
+        match = re.search(r"\\bibliography\{([^}]*)\}", main_file.read_text(encoding='utf-8', errors='replace'))
+        if match:
+            return [Path(name.strip() + ".bib") for name in match.group(1).split(",") if name.strip()]
+    return sorted(BIB_DIR.glob("*.bib")) if BIB_DIR.exists() else []
+
+
+def load_bibliography(files=None):
+    """All entries of the project's bibliography files, in file order"""
+    entries = []
+    for path in files if files is not None else bib_files_for():
+        entries.extend(load_bib_file(path))
+    return entries
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Build Engine
+Cross-platform Python counterpart of compile.bat with incremental LaTeX passes
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from modutex_bbl import format_bbl, verify_bbl
+from modutex_cache import ArtifactCache, ARTIFACT_SUFFIXES, PROJECT_PREFIX, toolchain_version
+from modutex_figures import prepare_figures, figure_requests, output_path
+from modutex_fonts import check_fonts, configured_fonts
+from modutex_index import load_index, SectionIndex, INPUT
+from modutex_stats import recorded_build
+from modutex_tikz import externalize_tikz, TIKZ_SOURCES, TIKZ_CACHE
+from modutex_trace import annotate, record, traced
+
+BUILD_DIR = Path("build")
+TEMPLATES_DIR = Path("templates")
+MAX_PASSES = 4
+
+# Bump when the set or layout of cached build artifacts changes
+ARTIFACT_VERSION = 2
+
+# .bbl files shared between targets and builds, keyed by bib_fingerprint()
+BBL_CACHE = BUILD_DIR / "bbl-cache"
+
+# Log messages that mean another LaTeX pass is needed
+RERUN_PATTERN = re.compile(r"Rerun to get|Label\(s\) may have changed|Please rerun")
+# \include'd files get their own .aux, pulled into the main one with \@input
+AUX_INPUT = re.compile(r"\\@input\{([^}]*)\}")
+
+# Packages that only work with xelatex/lualatex
+UNICODE_PACKAGES = re.compile(r"\\usepackage\s*(?:\[[^\]]*\])?\s*\{[^}]*\b(?:fontspec|polyglossia|xepersian|unicode-math|bidi)\b")
+# "% !TEX program = xelatex" magic comment, as understood by most editors
+ENGINE_COMMENT = re.compile(r"^%\s*!TEX\s+(?:TS-)?program\s*=\s*(pdflatex|xelatex|lualatex)", re.MULTILINE | re.IGNORECASE)
+ENGINES = ("pdflatex", "xelatex", "lualatex")
+
+# With -file-line-error, errors look like "./sections/intro.tex:12: Undefined control sequence."
+ERROR_PATTERN = re.compile(r"^(?P<file>[^\s:][^:\n]*\.tex):(?P<line>\d+): (?P<message>.*)$", re.MULTILINE)
+
+
+@dataclass
+class LatexError:
+    """One error from the LaTeX log, mapped back to its source file and line"""
+    file: str
+    line: int
+    message: str
+    context: str = ""
+
+    @property
+    def is_section(self):
+        return self.file.startswith("sections/")
+
+
+@dataclass
+class BuildResult:
+    """Outcome of one build: success flag, output PDF, and per-phase timings"""
+    success: bool
+    pdf: Path = None
+    engine: str = None
+    passes: int = 0
+    bibtex_ran: bool = False
+    timings: list = field(default_factory=list)
+    log: str = ""
+    errors: list = field(default_factory=list)
+
+    def add_timing(self, phase, start):
+        """Record a phase that began at the time.perf_counter() reading `start` (also as a trace span)"""
+        end = time.perf_counter()
+        self.timings.append((phase, end - start))
+        record(phase, start, end)
+
+    @property
+    def total_time(self):
+        return sum(seconds for _, seconds in self.timings)
+
+
+def find_engine(engine="pdflatex"):
+    """Return True if the LaTeX engine is on PATH"""
+    return shutil.which(engine) is not None
+
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode('utf-8', errors='replace')).hexdigest()
+
+
+def _read(path):
+    path = Path(path)
+    if not path.exists():
+        return ""
+    return path.read_text(encoding='utf-8', errors='replace')
+
+
+def read_aux_tree(aux_file):
+    """Text of an .aux plus every .aux it \\@inputs (\\include'd sections), recursively"""
+    aux_file = Path(aux_file)
+    parts, pending, seen = [], [aux_file], set()
+    while pending:
+        path = pending.pop(0)
+        if path in seen:
+            continue
+        seen.add(path)
+        text = _read(path)
+        parts.append(text)
+        pending += [aux_file.parent / name for name in AUX_INPUT.findall(text)]
+    return "\n".join(parts)
+
+
+def bib_fingerprint(aux_text, root=Path(".")):
+    """Hash of everything bibtex depends on: citations, style, and the .bib contents"""
+    lines = [line for line in aux_text.splitlines()
+             if line.startswith(("\\citation", "\\bibdata", "\\bibstyle"))]
+    digest = hashlib.sha256("\n".join(lines).encode('utf-8'))
+    for match in re.finditer(r"\\bibdata\{([^}]*)\}", aux_text):
+        for name in match.group(1).split(","):
+            bib = Path(root) / (name.strip() + ".bib")
+            if bib.exists():
+                digest.update(bib.read_bytes())
+    return digest.hexdigest()
+
+
+def parse_log_errors(log_text):
+    """Extract errors from a LaTeX log produced with -file-line-error"""
+    errors = []
+    lines = log_text.splitlines()
+    for index, text in enumerate(lines):
+        match = ERROR_PATTERN.match(text)
+        if not match:
+            continue
+        # TeX prints the offending input after the message, ending with an "l.<n>" line
+        context = []
+        for offset, follow in enumerate(lines[index + 1:index + 8], start=index + 1):
+            if ERROR_PATTERN.match(follow):
+                break
+            context.append(follow)
+            if follow.startswith("l."):
+                # The line after "l.<n>" holds the rest of the offending input
+                context.extend(lines[offset + 1:offset + 2])
+                break
+        path = match.group('file').replace("\\", "/")
+        if path.startswith("./"):
+            path = path[2:]
+        if f"/{TIKZ_SOURCES}/" in path:
+            # Externalized copy of a section: report the real file (line numbers match)
+            path = path.split(f"/{TIKZ_SOURCES}/", 1)[1]
+        errors.append(LatexError(path, int(match.group('line')), match.group('message').strip(),
+                                 "\n".join(context).strip()))
+    return errors
+
+
+def _figure_files(figure):
+    """Files an \\includegraphics name can mean (the extension may be left out)"""
+    path = Path(figure)
+    return [path] if path.suffix else sorted(path.parent.glob(path.name + ".*"))
+
+
+def _dependency_files(main_text, index):
+    """Non-section files a build reads: .bib databases, figures and other \\input files"""
+    files = []
+    for match in re.finditer(r"\\bibliography\{([^}]*)\}", main_text):
+        files += [Path(name.strip() + ".bib") for name in match.group(1).split(",")]
+    inputs = INPUT.findall(main_text)
+    for entry in index.sections():
+        inputs += entry.get('inputs', [])
+        for figure in entry['figures']:
+            files += _figure_files(figure)
+    for name in inputs:
+        path = Path(name.strip())
+        path = path if path.suffix else path.with_suffix(".tex")
+        # Sections are covered by the index's content hashes
+        if path.parts[:1] != ("sections",) and path not in files:
+            files.append(path)
+    return files
+
+
+def input_fingerprint(main_file, engine, search_dirs=(), only=None):
+    """Hash of everything a build reads: main.tex, every indexed section,
+    the .bib files, referenced figures, other \\input files and any template class files"""
+    main_text = _read(main_file)
+    index = load_index()
+    digest = hashlib.sha256(f"{engine}|{only}|{index.fingerprint()}\n{main_text}".encode('utf-8'))
+
+    files = _dependency_files(main_text, index)
+    for directory in search_dirs:
+        files += sorted(Path(directory).glob("*.*"))
+    for path in files:
+        # Size and mtime are enough for binary assets and much cheaper than hashing them
+        stat = path.stat() if path.exists() else None
+        digest.update(f"{path}:{stat.st_size if stat else '-'}:{stat.st_mtime if stat else '-'}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _file_digest(path):
+    path = Path(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest() if path.is_file() else "-"
+
+
+def artifact_key(main_file, engine, search_dirs=(), out_dir=BUILD_DIR):
+    """Portable build key: content hashes of every input (never mtimes) plus toolchain versions;
+    each output directory (e.g. a matrix target's) gets its own key"""
+    main_text = _read(main_file)
+    index = load_index()
+    digest = hashlib.sha256(f"{ARTIFACT_VERSION}|{engine}|{toolchain_version(engine)}|"
+                            f"{toolchain_version('bibtex')}|{Path(main_file).as_posix()}|"
+                            f"{Path(out_dir).as_posix()}\n{main_text}".encode('utf-8'))
+
+    for entry in index.sections():
+        digest.update(f"{entry['name']}:{entry['hash']}\n".encode('utf-8'))
+    files = _dependency_files(main_text, index)
+    for directory in search_dirs:
+        files += sorted(Path(directory).glob("*.*"))
+    for path in files:
+        digest.update(f"{path.as_posix()}:{_file_digest(path)}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_artifacts(main_file, out_dir):
+    """{artifact name: path} of everything worth caching from a finished build: names are
+    relative to out_dir, or PROJECT_PREFIX + project path for the shared figure caches"""
+    stem = Path(main_file).stem
+    out_dir = Path(out_dir)
+    paths = [path for path in out_dir.glob(f"{stem}.*") if path.suffix in ARTIFACT_SUFFIXES + (".pdf",)]
+    paths += [out_dir / f"{part}.aux" for part in included_parts(_read(main_file))]
+    # Externalized pictures and processed figures, so later edits start warm too
+    for source in (out_dir / TIKZ_SOURCES).rglob("*.tex") if (out_dir / TIKZ_SOURCES).exists() else []:
+        paths += [Path(name) for name in re.findall(re.escape(TIKZ_CACHE.as_posix()) + r"/\w+\.pdf", _read(source))]
+    paths += [output_path(source) for source in figure_requests([main_file] + SectionIndex().section_files())]
+    artifacts = {}
+    for path in paths:
+        if path.is_file():
+            inside = path.resolve().is_relative_to(out_dir.resolve())
+            name = path.relative_to(out_dir).as_posix() if inside else PROJECT_PREFIX + path.as_posix()
+            artifacts[name] = path
+    return artifacts
+
+
+def search_path_env(extra_dirs):
+    """Environment with extra directories prepended to the TeX/BibTeX search paths"""
+    if not extra_dirs:
+        return None
+    env = os.environ.copy()
+    prefix = os.pathsep.join(str(Path(d).resolve()) for d in extra_dirs)
+    for name in ("TEXINPUTS", "BSTINPUTS"):
+        # A trailing separator keeps the distribution's default paths
+        env[name] = prefix + os.pathsep + env.get(name, "")
+    return env
+
+
+def effective_preamble(main_text):
+    """Preamble without comments, with \\newif switches such as \\ifpersian resolved"""
+    preamble = re.sub(r"(?<!\\)%[^\n]*", "", main_text.split("\\begin{document}", 1)[0])
+    flags = {}
+    for name, value in re.findall(r"\\([A-Za-z]+)(true|false)\b", preamble):
+        flags[name] = value == "true"
+    for name, value in flags.items():
+        branch = re.compile(r"\\if" + name + r"\b((?:(?!\\if|\\fi\b).)*?)(?:\\else\b((?:(?!\\if|\\fi\b).)*?))?\\fi\b",
+                            re.DOTALL)
+        preamble = branch.sub(lambda m: m.group(1) if value else (m.group(2) or ""), preamble)
+    return preamble
+
+
+def detect_engine(main_file):
+    """xelatex for fontspec/polyglossia documents (e.g. \\persiantrue), pdflatex otherwise"""
+    main_text = _read(main_file)
+    comment = ENGINE_COMMENT.search(main_text)
+    if comment:
+        return comment.group(1).lower()
+    return "xelatex" if UNICODE_PACKAGES.search(effective_preamble(main_text)) else "pdflatex"
+
+
+def included_parts(main_text):
+    """Files pulled in with \\include - each one gets its own .aux file"""
+    return re.findall(r"^\s*\\include\{([^}]*)\}", main_text, re.MULTILINE)
+
+
+def run_latex(main_file, out_dir, engine="pdflatex", env=None, only=None):
+    """Run one LaTeX pass into the output directory.
+
+    `only` lists \\include parts to typeset; it is passed as \\includeonly on the
+    command line so main.tex itself never changes.
+    """
+    source = str(main_file)
+    if only is not None:
+        source = f"\\includeonly{{{','.join(only)}}}\\input{{{Path(main_file).as_posix()}}}"
+    return subprocess.run(
+        [engine, "-interaction=nonstopmode", "-file-line-error",
+         f"-jobname={Path(main_file).stem}", f"-output-directory={out_dir}", source],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        env=env
+    )
+
+
+def run_bibtex(out_dir, stem, env=None):
+    """Run bibtex from the project root so bib/ paths in \\bibliography resolve"""
+    return subprocess.run(
+        ["bibtex", str(Path(out_dir) / stem)],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        env=env
+    )
+
+
+@traced("build")
+@recorded_build
+def build_pdf(main_file="main.tex", out_dir=BUILD_DIR, engine=None, copy_pdf=True,
+              search_dirs=(), only=None, figures=True, externalize=True, cache=True):
+    """Build main.tex incrementally into out_dir.
+
+    Auxiliary files are kept between builds, so bibtex only runs when citations
+    or .bib files change, and LaTeX is re-run only until the .aux settles.
+    `search_dirs` are added to the TeX search path (e.g. a template's class files).
+    `only` names the sections to typeset when main.tex uses \\include; the rest keep
+    their page numbers and labels from the last full build.
+    `figures` runs the figure pipeline first so LaTeX reads downscaled copies.
+    `externalize` compiles tikzpictures once and places them as cached PDFs.
+    `engine` defaults to the one the preamble needs (see detect_engine).
+    `cache` restores full builds from the artifact cache (local, then MODUTEX_REMOTE_CACHE)
+    and stores successful ones there.
+    """
+    main_file = Path(main_file)
+    out_dir = Path(out_dir)
+    stem = main_file.stem
+    result = BuildResult(success=False)
+
+    if not main_file.exists():
+        print(f"[ERROR] {main_file} not found!")
+        return result
+    if engine is None:
+        engine = detect_engine(main_file)
+    if not find_engine(engine):
+        print(f"[ERROR] {engine} not found! Please install TeX Live or MiKTeX.")
+        return result
+    result.engine = engine
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    aux_file = out_dir / f"{stem}.aux"
+    log_file = out_dir / f"{stem}.log"
+    bib_stamp = out_dir / f"{stem}.bibstamp"
+    env = search_path_env(search_dirs)
+
+    # \include writes one .aux per part, mirroring the source tree inside out_dir
+    parts = included_parts(_read(main_file))
+    for part in parts:
+        (out_dir / part).parent.mkdir(parents=True, exist_ok=True)
+
+    # Nothing changed since the last clean build: reuse its PDF
+    input_stamp = out_dir / f"{stem}.inputstamp"
+    fingerprint = input_fingerprint(main_file, engine, search_dirs, only)
+    if (out_dir / f"{stem}.pdf").exists() and _read(input_stamp) == fingerprint:
+        result.success = True
+        result.pdf = out_dir / f"{stem}.pdf"
+        if copy_pdf:
+            shutil.copyfile(result.pdf, main_file.with_suffix(".pdf"))
+            result.pdf = main_file.with_suffix(".pdf")
+        print(f"[BUILD] {main_file} is up to date - no input changed since the last build")
+        return result
+
+    artifacts = ArtifactCache() if cache and not only else None
+    if artifacts:
+        start = time.perf_counter()
+        key = artifact_key(main_file, engine, search_dirs, out_dir)
+        restored, origin = artifacts.restore(key, out_dir)
+        result.add_timing("artifact cache", start)
+        if restored and f"{stem}.pdf" in restored and (out_dir / f"{stem}.pdf").exists():
+            input_stamp.write_text(fingerprint, encoding='utf-8')
+            result.success = True
+            result.pdf = out_dir / f"{stem}.pdf"
+            if copy_pdf:
+                shutil.copyfile(result.pdf, main_file.with_suffix(".pdf"))
+                result.pdf = main_file.with_suffix(".pdf")
+            print(f"[BUILD] Restored {main_file} from the {origin} artifact cache "
+                  f"({len(restored)} file(s), {result.total_time:.2f}s)")
+            return result
+
+    if only:
+        if not parts:
+            print("[ERROR] Partial builds need \\include - run 'texchat.py update_main --include' first")
+            return result
+        only = [name if name.startswith("sections/") else f"sections/{name}" for name in only]
+        unknown = [name for name in only if name not in parts]
+        if unknown:
+            print(f"[ERROR] Not included in {main_file}: {', '.join(unknown)}")
+            return result
+        missing = [part for part in parts if not (out_dir / f"{part}.aux").exists()]
+        if missing or not aux_file.exists():
+            # Skipped parts take page numbers and labels from their .aux files
+            print("[INFO] No previous full build found - running a full build first")
+            full = build_pdf(main_file, out_dir, engine, copy_pdf=False, search_dirs=search_dirs,
+                             figures=figures, externalize=externalize)
+            if not full.success:
+                return full
+            result.timings.extend(full.timings)
+        print(f"[BUILD] Partial build: {', '.join(only)}")
+
+    if engine != "pdflatex":
+        # Fonts are checked (and fontconfig warmed) once, then served from .modutex/fonts.json
+        start = time.perf_counter()
+        missing = check_fonts(configured_fonts(effective_preamble(_read(main_file))), engine)
+        result.add_timing("fonts", start)
+        for name in missing:
+            print(f"[WARNING] Font '{name}' is not installed - {engine} will fail or substitute it")
+
+    prepared = []
+    if figures:
+        start = time.perf_counter()
+        prepared.append(prepare_figures([main_file] + SectionIndex().section_files()))
+        result.add_timing("figures", start)
+    if externalize:
+        start = time.perf_counter()
+        tikz_dir = externalize_tikz(SectionIndex().section_files(), main_file, out_dir, engine)
+        if tikz_dir:
+            prepared.insert(0, tikz_dir)
+            result.add_timing("tikz", start)
+    if prepared:
+        env = search_path_env(prepared + list(search_dirs))
+
+    print(f"[BUILD] Compiling {main_file} with {engine} into {out_dir}/")
+    # A stale PDF would hide a failed first pass
+    (out_dir / f"{stem}.pdf").unlink(missing_ok=True)
+    input_stamp.unlink(missing_ok=True)
+    previous_aux = _hash_text(_read(aux_file))
+
+    for pass_number in range(1, MAX_PASSES + 1):
+        start = time.perf_counter()
+        process = run_latex(main_file, out_dir, engine, env, only)
+        result.add_timing(f"{engine} pass {pass_number}", start)
+        result.passes = pass_number
+        result.log = _read(log_file)
+
+        if process.returncode != 0 and not (out_dir / f"{stem}.pdf").exists():
+            result.errors = parse_log_errors(result.log)
+            print(f"[ERROR] LaTeX pass {pass_number} failed")
+            for error in result.errors[:5]:
+                print(f"  {error.file}:{error.line}: {error.message}")
+            return result
+
+        # With \include the sections' \citation and \newlabel lines are in their own .aux files
+        aux_text = read_aux_tree(aux_file)
+
+        # Bibliography: only when citations, style or .bib contents changed
+        needs_bib = "\\bibdata" in aux_text and (
+            not (out_dir / f"{stem}.bbl").exists()
+            or _read(bib_stamp) != bib_fingerprint(aux_text)
+        )
+        if needs_bib:
+            start = time.perf_counter()
+            bib_key = bib_fingerprint(aux_text)
+            cached_bbl = BBL_CACHE / f"{bib_key}.bbl"
+            if cached_bbl.exists():
+                # Same citations, style and .bib files: reuse another build's bibliography
+                shutil.copyfile(cached_bbl, out_dir / f"{stem}.bbl")
+                result.add_timing("bibtex (shared)", start)
+            else:
+                # Supported styles are formatted in-process; bibtex handles everything else
+                bbl_mode = os.environ.get('MODUTEX_BBL', 'auto').lower()
+                bbl_text = format_bbl(aux_file) if bbl_mode in ("auto", "verify") else None
+                if bbl_text is not None and bbl_mode != "verify":
+                    (out_dir / f"{stem}.bbl").write_bytes(bbl_text.encode('utf-8'))
+                    result.add_timing("bbl (in-process)", start)
+                    bbl_ok = True
+                else:
+                    bib_process = run_bibtex(out_dir, stem, env)
+                    result.add_timing("bibtex", start)
+                    result.bibtex_ran = True
+                    bbl_ok = bib_process.returncode == 0
+                    if not bbl_ok:
+                        print("[WARNING] Bibliography processing had warnings (normal if no citations)")
+                    if bbl_text is not None:
+                        verify_bbl(bbl_text, out_dir / f"{stem}.bbl")
+                if bbl_ok and (out_dir / f"{stem}.bbl").exists():
+                    # Copy then rename, so parallel builds never read a half-written file
+                    BBL_CACHE.mkdir(parents=True, exist_ok=True)
+                    partial = cached_bbl.with_suffix(f".{os.getpid()}.tmp")
+                    shutil.copyfile(out_dir / f"{stem}.bbl", partial)
+                    os.replace(partial, cached_bbl)
+            bib_stamp.write_text(bib_key, encoding='utf-8')
+
+        current_aux = _hash_text(aux_text)
+        settled = (current_aux == previous_aux and not needs_bib
+                   and not RERUN_PATTERN.search(result.log))
+        previous_aux = current_aux
+        if settled:
+            break
+
+    result.errors = parse_log_errors(result.log)
+    pdf = out_dir / f"{stem}.pdf"
+    if not pdf.exists():
+        print("[ERROR] PDF compilation failed!")
+        return result
+    if result.errors:
+        print(f"[WARNING] PDF created despite {len(result.errors)} LaTeX error(s)")
+    else:
+        input_stamp.write_text(fingerprint, encoding='utf-8')
+        if artifacts:
+            start = time.perf_counter()
+            artifacts.save(key, build_artifacts(main_file, out_dir))
+            result.add_timing("cache store", start)
+
+    if copy_pdf:
+        start = time.perf_counter()
+        shutil.copyfile(pdf, main_file.with_suffix(".pdf"))
+        result.add_timing("copy pdf", start)
+        pdf = main_file.with_suffix(".pdf")
+
+    result.success = True
+    result.pdf = pdf
+    annotate(engine=engine, passes=result.passes, bibtex=result.bibtex_ran, latex_errors=len(result.errors))
+    print(f"[SUCCESS] PDF built: {pdf} ({result.passes} LaTeX pass(es), "
+          f"bibtex {'run' if result.bibtex_ran else 'skipped'}, {result.total_time:.1f}s)")
+    return result
+
+
+def available_targets():
+    """Build targets: the project's own main.tex plus every shipped template"""
+    templates = sorted(d.name for d in TEMPLATES_DIR.iterdir()
+                       if (d / "sample-template.tex").exists()) if TEMPLATES_DIR.exists() else []
+    return ["article"] + templates
+
+
+def _document_body(main_text):
+    """Section content of main.tex between \\maketitle and the bibliography,
+    without the parts every template provides itself (abstract, TOC, references)"""
+    body = main_text.split("\\begin{document}", 1)[-1].split("\\bibliographystyle", 1)[0]
+    if "\\maketitle" in body:
+        body = body.split("\\maketitle", 1)[1]
+    skip = re.compile(r"^\s*(\\tableofcontents|\\newpage|\\section\*?\{(Abstract|References)\}"
+                      r"|\\(input|include)\{sections/abstract\}|% (Abstract|Bibliography)\s*$)")
+    return "\n".join(line for line in body.splitlines() if not skip.match(line)).strip()
+
+
+def render_target(target, main_file="main.tex", out_dir=None):
+    """Write main.tex's content into a template's layout; returns the generated .tex path"""
+    main_text = Path(main_file).read_text(encoding='utf-8')
+    template = (TEMPLATES_DIR / target / "sample-template.tex").read_text(encoding='utf-8')
+    out_dir = Path(out_dir or BUILD_DIR / target)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Template preamble and front matter end where its sample sections start
+    document_start = template.index("\\begin{document}")
+    first_section = template.find("\\section", document_start)
+    head = template[:first_section] if first_section != -1 else template[:document_start]
+    tail = template[template.index("\\bibliographystyle"):]
+
+    title = re.search(r"^\\title\{.*\}\s*$", main_text, re.MULTILINE)
+    if title:
+        head = re.sub(r"^\\title\{.*\}\s*$", lambda m: title.group(0), head, count=1, flags=re.MULTILINE)
+    if Path("sections/abstract.tex").exists():
+        head = re.sub(r"(\\begin\{abstract\}).*?(\\end\{abstract\})",
+                      lambda m: m.group(1) + "\n\\input{sections/abstract}\n" + m.group(2),
+                      head, count=1, flags=re.DOTALL)
+    bibliography = re.search(r"\\bibliography\{[^}]*\}", main_text)
+    if bibliography:
+        tail = re.sub(r"\\bibliography\{[^}]*\}", lambda m: bibliography.group(0), tail, count=1)
+
+    rendered = out_dir / "main.tex"
+    rendered.write_text(f"% Generated by ModuTex from {main_file} - do not edit\n"
+                        f"{head.rstrip()}\n\n{_document_body(main_text)}\n\n{tail}",
+                        encoding='utf-8')
+    return rendered
+
+
+def build_target(target, main_file="main.tex"):
+    """Build one target into build/<target>/ (runs inside a worker process)"""
+    start = time.perf_counter()
+    out_dir = BUILD_DIR / target
+    if target == "article":
+        result = build_pdf(main_file, out_dir, copy_pdf=False)
+    else:
+        result = build_pdf(render_target(target, main_file, out_dir), out_dir,
+                           copy_pdf=False, search_dirs=[TEMPLATES_DIR / target])
+    return {
+        'target': target,
+        'success': result.success and not result.errors,
+        'pdf': str(result.pdf) if result.pdf else None,
+        'timings': result.timings,
+        'seconds': time.perf_counter() - start,
+        'errors': [f"{e.file}:{e.line}: {e.message}" for e in result.errors[:3]],
+    }
+
+
+def build_matrix(targets=None, main_file="main.tex", max_workers=None):
+    """Build several targets concurrently, each in its own output directory"""
+    targets = targets or available_targets()
+    unknown = [t for t in targets if t not in available_targets()]
+    if unknown:
+        print(f"[ERROR] Unknown build target(s): {', '.join(unknown)}")
+        print(f"[INFO] Available: {', '.join(available_targets())}")
+        return []
+
+    print(f"[BUILD] Building {len(targets)} target(s) in parallel: {', '.join(targets)}")
+    start = time.perf_counter()
+    # Once here, so the target workers only ever find cached figures
+    prepare_figures([main_file] + SectionIndex().section_files())
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(targets), os.cpu_count() or 1)) as pool:
+        reports = list(pool.map(build_target, targets, [main_file] * len(targets)))
+    wall_clock = time.perf_counter() - start
+
+    print(f"\n[SUMMARY] Build matrix finished in {wall_clock:.1f}s")
+    for report in reports:
+        status = "OK  " if report['success'] else "FAIL"
+        phases = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in report['timings'])
+        print(f"  {status} {report['target']:<10} {report['seconds']:6.1f}s  {report['pdf'] or '-'}")
+        if phases:
+            print(f"       {phases}")
+        for error in report['errors']:
+            print(f"       {error}")
+    return reports
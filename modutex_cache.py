@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Artifact Cache
+Content-addressed store for build outputs (.aux, .bbl, .toc, PDF, externalized figures)
+with a local directory backend and pluggable remote backends, so an unchanged
+document builds instantly on any machine that shares the cache
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from pathlib import Path
+
+from modutex_jobs import STATE_DIR
+
+LOCAL_CACHE_DIR = STATE_DIR / "artifacts"
+TOOLCHAIN_FILE = STATE_DIR / "toolchain.json"
+
+# Build outputs worth keeping, by extension (the PDF is added separately)
+ARTIFACT_SUFFIXES = (".aux", ".bbl", ".toc", ".lof", ".lot", ".out", ".nav", ".snm", ".fmt", ".bibstamp")
+# Artifact names are relative to the build directory; this prefix marks files that live
+# relative to the project instead (externalized pictures and processed figures)
+PROJECT_PREFIX = "_project/"
+
+
+def safe_name(name):
+    """Whether a stored artifact name stays inside the directory it is restored to"""
+    path = Path(name)
+    return bool(name) and not path.is_absolute() and not path.drive and ".." not in path.parts
+
+
+def artifact_target(name, out_dir):
+    """Where a stored artifact name is restored to for a build in out_dir"""
+    if name.startswith(PROJECT_PREFIX):
+        return Path(name[len(PROJECT_PREFIX):])
+    return Path(out_dir) / name
+
+
+class DirectoryBackend:
+    """Artifacts as files under root/<key[:2]>/<key>/, published with an atomic rename.
+
+    Works the same for a local folder and a mounted network share or CI cache directory.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _entry(self, key):
+        return self.root / key[:2] / key
+
+    def has(self, key):
+        return (self._entry(key) / "manifest.json").exists()
+
+    def fetch(self, key, locate):
+        """Copy an entry's files to locate(name); returns the names or None.
+
+        Names come from a manifest that may live on a shared store, so any name that
+        could escape the destination rejects the whole entry.
+        """
+        entry = self._entry(key)
+        try:
+            files = json.loads((entry / "manifest.json").read_text(encoding='utf-8'))['files']
+            if not all(isinstance(name, str) and safe_name(name) for name in files):
+                print(f"[WARNING] Ignoring artifact cache entry {key[:12]} with unsafe file names")
+                return None
+            for name in files:
+                target = locate(name)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry / "files" / name, target)
+        except (OSError, ValueError, KeyError):
+            return None
+        return files
+
+    def store(self, key, files):
+        """Publish {artifact name: source path}; concurrent writers of the same key are harmless"""
+        entry = self._entry(key)
+        if self.has(key):
+            return True
+        staging = self.root / "tmp" / f"{key}.{uuid.uuid4().hex}"
+        try:
+            for name, source in files.items():
+                target = staging / "files" / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(source, target)
+            (staging / "manifest.json").write_text(
+                json.dumps({'files': sorted(files), 'created': time.time()}), encoding='utf-8')
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging, entry)
+            return True
+        except OSError:
+            # Another machine published the same key first, or the share is unavailable
+            return self.has(key)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+# Scheme -> backend factory; register_backend() adds more (e.g. an S3 or HTTP store)
+BACKENDS = {'dir': DirectoryBackend}
+
+
+def register_backend(scheme, factory):
+    """Make "scheme:location" usable in MODUTEX_REMOTE_CACHE"""
+    BACKENDS[scheme] = factory
+
+
+def open_backend(spec):
+    """Backend for "scheme:location", or a plain directory path"""
+    scheme, _, location = spec.partition(":")
+    if location and scheme in BACKENDS:
+        return BACKENDS[scheme](location)
+    return DirectoryBackend(spec)
+
+
+class ArtifactCache:
+    """Local cache in front of an optional shared remote one"""
+
+    def __init__(self, local=None, remote=None):
+        self.local = local or DirectoryBackend(os.environ.get('MODUTEX_CACHE_DIR', LOCAL_CACHE_DIR))
+        remote_spec = os.environ.get('MODUTEX_REMOTE_CACHE')
+        self.remote = remote or (open_backend(remote_spec) if remote_spec else None)
+
+    def restore(self, key, out_dir):
+        """Bring a cached build back into out_dir; returns (names, 'local'|'remote') or (None, None)"""
+        def locate(name):
+            return artifact_target(name, out_dir)
+        files = self.local.fetch(key, locate)
+        if files is not None:
+            return files, 'local'
+        if self.remote is not None:
+            files = self.remote.fetch(key, locate)
+            if files is not None:
+                # Keep a local copy for the next build on this machine
+                self.local.store(key, {name: locate(name) for name in files})
+                return files, 'remote'
+        return None, None
+
+    def save(self, key, files):
+        """Store {artifact name: source path} locally and (best effort) remotely"""
+        self.local.store(key, files)
+        if self.remote is not None and not self.remote.store(key, files):
+            print("[WARNING] Could not write to the remote artifact cache")
+
+
+def toolchain_version(program):
+    """First line of `program --version`, remembered until the binary changes"""
+    path = shutil.which(program)
+    if not path:
+        return f"{program}: missing"
+    stamp = f"{path}:{os.stat(path).st_mtime}"
+    try:
+        known = json.loads(TOOLCHAIN_FILE.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        known = {}
+    if known.get(program, {}).get('stamp') != stamp:
+        process = subprocess.run([program, "--version"], capture_output=True, text=True, errors='replace')
+        version = (process.stdout.splitlines() or ["unknown"])[0].strip()
+        known[program] = {'stamp': stamp, 'version': version}
+        TOOLCHAIN_FILE.parent.mkdir(parents=True, exist_ok=True)
+        TOOLCHAIN_FILE.write_text(json.dumps(known, indent=1), encoding='utf-8')
+    return known[program]['version']
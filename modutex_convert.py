@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Rule-Based Text Converter
+Converts the unambiguous parts of plain text / Markdown notes (headings, lists, tables,
+paragraphs, $ math) to LaTeX locally; only the rest needs the model
+"""
+
+import csv
+import re
+
+HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+NUMBERED = re.compile(r"^(\s*)\d+[.)]\s+(.*)$")
+PIPE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+DISPLAY_MATH = re.compile(r"^\s*\$\$(.+?)\$\$\s*$", re.DOTALL)
+# Like pandoc: no space inside the delimiters and no digit after the closing $ ("$5 and $10")
+INLINE = re.compile(r"(?P<math>\$(?!\s)[^$\n]+?(?<!\s)\$(?!\d))|(?P<code>`[^`\n]+`)|(?P<link>\[[^\]\n]+\]\([^)\s]+\))")
+
+# Markdown heading depth -> LaTeX command (sections never contain \section)
+HEADING_COMMANDS = {1: "subsection", 2: "subsection", 3: "subsubsection"}
+
+SPECIAL_CHARACTERS = {
+    "\\": "\\textbackslash{}", "&": "\\&", "%": "\\%", "#": "\\#", "_": "\\_",
+    "{": "\\{", "}": "\\}", "~": "\\textasciitilde{}", "^": "\\textasciicircum{}", "$": "\\$",
+}
+
+MAX_CELL_WORDS = 6
+# Commas alone are weak evidence: hard-wrapped prose has them on every line too
+MIN_CSV_ROWS = 3
+SENTENCE_END = re.compile(r"[.!?;:]$")
+# Several words starting in lower case read as a clause ("we tried again"), not a cell
+CLAUSE = re.compile(r"^[a-z]\S*(\s+\S+)+$")
+
+
+def escape_text(text):
+    """Escape LaTeX special characters and turn **bold** / *italic* into commands"""
+    text = "".join(SPECIAL_CHARACTERS.get(char, char) for char in text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"\\textbf{\1}", text)
+    text = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])", r"\\textit{\1}", text)
+    return text
+
+
+def convert_inline(text):
+    """Escape a line of prose, keeping $math$ as-is and converting `code` and [links](url)"""
+    parts = []
+    position = 0
+    for match in INLINE.finditer(text):
+        parts.append(escape_text(text[position:match.start()]))
+        value = match.group(0)
+        if match.lastgroup == "math":
+            parts.append(value)
+        elif match.lastgroup == "code":
+            parts.append(f"\\texttt{{{escape_text(value[1:-1])}}}")
+        else:
+            label, url = re.match(r"\[(.*)\]\((.*)\)", value).groups()
+            parts.append(f"\\href{{{url}}}{{{escape_text(label)}}}")
+        position = match.end()
+    parts.append(escape_text(text[position:]))
+    return "".join(parts)
+
+
+def _is_ambiguous(text):
+    """Content the rules cannot convert faithfully: existing LaTeX, stray $, fences, images"""
+    without_math = INLINE.sub(" ", text)
+    return ("\\" in text or "$" in without_math or "```" in text
+            or re.search(r"!\[[^\]]*\]\(", text) is not None or "|" in without_math)
+
+
+def convert_heading(lines):
+    match = HEADING.match(lines[0])
+    if len(lines) != 1 or not match:
+        return None
+    command = HEADING_COMMANDS.get(len(match.group(1)), "paragraph")
+    return f"\\{command}{{{convert_inline(match.group(2))}}}"
+
+
+def convert_list(lines):
+    """Bullet or numbered list with indented sub-items and continuation lines"""
+    items = []  # (depth, environment, text)
+    indents = []
+    for line in lines:
+        match = BULLET.match(line) or NUMBERED.match(line)
+        if not match:
+            if not items or not line.startswith((" ", "\t")):
+                return None
+            depth, environment, text = items[-1]
+            items[-1] = (depth, environment, f"{text} {line.strip()}")
+            continue
+        indent = len(match.group(1).expandtabs(4))
+        while indents and indent < indents[-1]:
+            indents.pop()
+        if not indents or indent > indents[-1]:
+            indents.append(indent)
+        environment = "itemize" if BULLET.match(line) else "enumerate"
+        items.append((len(indents) - 1, environment, match.group(2)))
+    if not items or any(_is_ambiguous(text) for _, _, text in items):
+        return None
+
+    output = []
+    stack = []
+    for depth, environment, text in items:
+        while len(stack) > depth + 1:
+            output.append("    " * (len(stack) - 1) + f"\\end{{{stack.pop()}}}")
+        if len(stack) < depth + 1:
+            output.append("    " * len(stack) + f"\\begin{{{environment}}}")
+            stack.append(environment)
+        elif stack[-1] != environment:
+            # Bullets followed by numbers (or vice versa) at the same level: two lists
+            output.append("    " * (len(stack) - 1) + f"\\end{{{stack.pop()}}}")
+            output.append("    " * len(stack) + f"\\begin{{{environment}}}")
+            stack.append(environment)
+        output.append("    " * len(stack) + f"\\item {convert_inline(text)}")
+    while stack:
+        output.append("    " * (len(stack) - 1) + f"\\end{{{stack.pop()}}}")
+    return "\n".join(output)
+
+
+def _table_rows(lines):
+    """Rows of a Markdown pipe table, TSV or CSV block, or None if it is not a clean table"""
+    if len(lines) < 2:
+        return None
+    if all(line.strip().startswith("|") for line in lines) and PIPE_SEPARATOR.match(lines[1]):
+        rows = [[cell.strip() for cell in line.strip().strip("|").split("|")]
+                for index, line in enumerate(lines) if index != 1]
+    elif all("\t" in line for line in lines):
+        rows = [[cell.strip() for cell in line.split("\t")] for line in lines]
+    elif len(lines) >= MIN_CSV_ROWS and all("," in line for line in lines):
+        rows = [[cell.strip() for cell in row] for row in csv.reader(lines)]
+        # Cells ending like a sentence or reading like a clause ("In 2020, we tried again.") are prose
+        if any(SENTENCE_END.search(cell) or CLAUSE.match(cell) for row in rows for cell in row):
+            return None
+    else:
+        return None
+    width = len(rows[0])
+    if width < 2 or any(len(row) != width for row in rows):
+        return None
+    # Long cells mean this is prose that happens to contain commas
+    if any(len(cell.split()) > MAX_CELL_WORDS for row in rows for cell in row):
+        return None
+    return rows
+
+
+def convert_table(lines):
+    rows = _table_rows(lines)
+    if rows is None or any(_is_ambiguous(cell) for row in rows for cell in row):
+        return None
+    numeric = [all(re.fullmatch(r"[-+]?[\d.,]+%?", row[column]) for row in rows[1:])
+               for column in range(len(rows[0]))]
+    spec = "".join("r" if is_number else "l" for is_number in numeric)
+    body = [" & ".join(convert_inline(cell) for cell in row) + " \\\\" for row in rows]
+    return "\n".join([
+        "\\begin{table}[htbp]",
+        "    \\centering",
+        f"    \\begin{{tabular}}{{{spec}}}",
+        "        \\hline",
+        f"        {body[0]}",
+        "        \\hline",
+        *[f"        {row}" for row in body[1:]],
+        "        \\hline",
+        "    \\end{tabular}",
+        "\\end{table}",
+    ])
+
+
+def convert_display_math(block):
+    match = DISPLAY_MATH.match(block)
+    if not match:
+        return None
+    return f"\\begin{{equation}}\n    {match.group(1).strip()}\n\\end{{equation}}"
+
+
+def convert_paragraph(lines):
+    if any(HEADING.match(line) or BULLET.match(line) or NUMBERED.match(line) for line in lines):
+        return None
+    text = " ".join(line.strip() for line in lines)
+    if text.startswith(">"):
+        quote = " ".join(line.strip().lstrip(">").strip() for line in lines)
+        return None if _is_ambiguous(quote) else f"\\begin{{quote}}\n{convert_inline(quote)}\n\\end{{quote}}"
+    if _is_ambiguous(text):
+        return None
+    return convert_inline(text)
+
+
+def convert_block(block):
+    """LaTeX for one blank-line-separated block, or None when the model should handle it"""
+    lines = [line.rstrip() for line in block.strip("\n").split("\n")]
+    return (convert_display_math(block)
+            or convert_heading(lines)
+            or convert_table(lines)
+            or convert_list(lines)
+            or convert_paragraph(lines))
+
+
+def plain_block(block):
+    """Model-free fallback for an ambiguous block: one escaped paragraph, keeping only
+    well-formed $math$"""
+    return convert_inline(" ".join(block.split()))
+
+
+def split_blocks(text):
+    """Blank-line-separated blocks; a heading line always starts its own block"""
+    blocks = []
+    for block in re.split(r"\n[ \t]*\n", text.replace("\r\n", "\n")):
+        current = []
+        for line in block.split("\n"):
+            if HEADING.match(line):
+                if current:
+                    blocks.append("\n".join(current))
+                blocks.append(line)
+                current = []
+            else:
+                current.append(line)
+        if any(line.strip() for line in current):
+            blocks.append("\n".join(current))
+    return blocks
+
+
+def convert_text(text):
+    """Convert text block by block. Returns a list of (source block, LaTeX or None)."""
+    return [(block, convert_block(block)) for block in split_blocks(text)]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Figure Pipeline
+Downscales and recompresses raster figures and converts vector sources to PDF
+before a build; results are cached by content hash so unchanged figures are free
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Pillow is optional: without it raster figures are passed through unchanged
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+FIGURE_CACHE = Path("build") / "figures"
+MANIFEST = FIGURE_CACHE / "manifest.json"
+
+# Bump when processing changes so old cache entries are redone
+PIPELINE_VERSION = 2
+
+TARGET_DPI = 300
+# Widest text block of the shipped layouts (letter paper, narrow margins)
+TEXT_WIDTH_IN = 6.5
+
+RASTER_SUFFIXES = {".png", ".jpg", ".jpeg"}
+VECTOR_SUFFIXES = {".eps", ".ps", ".svg"}
+
+INCLUDE_GRAPHICS = re.compile(r"\\includegraphics\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}")
+RELATIVE_WIDTH = re.compile(r"width\s*=\s*([\d.]*)\s*\\(?:textwidth|linewidth|columnwidth|hsize)")
+ABSOLUTE_WIDTH = re.compile(r"width\s*=\s*([\d.]+)\s*(cm|mm|in|pt|bp)")
+UNITS_PER_INCH = {'in': 1.0, 'cm': 2.54, 'mm': 25.4, 'pt': 72.27, 'bp': 72.0}
+
+
+def figure_width_inches(options):
+    """Printed width of an \\includegraphics from its options (full text width if unknown)"""
+    options = options or ""
+    relative = RELATIVE_WIDTH.search(options)
+    if relative:
+        return float(relative.group(1) or 1) * TEXT_WIDTH_IN
+    absolute = ABSOLUTE_WIDTH.search(options)
+    if absolute:
+        return float(absolute.group(1)) / UNITS_PER_INCH[absolute.group(2)]
+    return TEXT_WIDTH_IN
+
+
+def _resolve(name):
+    """Source file for an \\includegraphics argument, trying graphicx's extensions"""
+    path = Path(name)
+    if path.suffix.lower() in RASTER_SUFFIXES | VECTOR_SUFFIXES | {".pdf"}:
+        return path if path.exists() else None
+    for suffix in (".pdf", ".png", ".jpg", ".jpeg", ".eps", ".svg"):
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def figure_requests(tex_files, explicit_vectors=None):
+    """{source path: widest printed width in inches} for every figure the files include.
+
+    A vector figure named with its extension (figures/x.eps) makes LaTeX look for that
+    exact file, so a converted PDF would never be read; such references are left out
+    and, when explicit_vectors is a list, appended to it as (tex file, name).
+    """
+    requests = {}
+    for tex in tex_files:
+        tex = Path(tex)
+        if not tex.exists():
+            continue
+        text = re.sub(r"(?<!\\)%[^\n]*", "", tex.read_text(encoding='utf-8', errors='replace'))
+        for match in INCLUDE_GRAPHICS.finditer(text):
+            name = match.group(2).strip()
+            source = _resolve(name)
+            if source is None or source.suffix.lower() == ".pdf":
+                continue
+            if Path(name).suffix.lower() in VECTOR_SUFFIXES:
+                if explicit_vectors is not None:
+                    explicit_vectors.append((tex, name))
+                continue
+            width = figure_width_inches(match.group(1))
+            requests[source] = max(width, requests.get(source, 0))
+    return requests
+
+
+def output_path(source):
+    """Where the processed copy of a figure lives in the cache tree"""
+    source = Path(source)
+    if source.suffix.lower() in VECTOR_SUFFIXES:
+        source = source.with_suffix(".pdf")
+    return FIGURE_CACHE / source
+
+
+def _cache_key(data, max_pixels):
+    settings = f"{PIPELINE_VERSION}|{max_pixels}|{PIL_AVAILABLE}".encode('utf-8')
+    return hashlib.sha256(settings + b"\0" + data).hexdigest()
+
+
+def convert_vector(source, target):
+    """Convert an EPS/PS/SVG figure to PDF with whichever converter is installed"""
+    suffix = source.suffix.lower()
+    if suffix == ".svg":
+        commands = [["inkscape", str(source), "--export-type=pdf", f"--export-filename={target}"],
+                    ["rsvg-convert", "-f", "pdf", "-o", str(target), str(source)]]
+    else:
+        commands = [["epstopdf", str(source), f"--outfile={target}"],
+                    ["ps2pdf", "-dEPSCrop", str(source), str(target)]]
+    for command in commands:
+        if shutil.which(command[0]):
+            process = subprocess.run(command, capture_output=True, text=True, errors='replace')
+            if process.returncode == 0 and target.exists():
+                return True
+    return False
+
+
+def shrink_raster(source, target, max_pixels):
+    """Downscale to max_pixels wide and recompress; keeps the original if that is smaller"""
+    if not PIL_AVAILABLE:
+        shutil.copyfile(source, target)
+        return False
+    with Image.open(source) as image:
+        resized = image.width > max_pixels
+        # LaTeX sizes figures without width/height from their DPI (72 when unset), so the
+        # copy keeps the original's physical size: DPI scales with the pixel width
+        dpi = image.info.get('dpi') or (72, 72)
+        if resized:
+            scale = max_pixels / image.width
+            dpi = (dpi[0] * scale, dpi[1] * scale)
+            height = max(1, round(image.height * scale))
+            image = image.resize((max_pixels, height), Image.LANCZOS)
+        keep = {'dpi': dpi} if resized or 'dpi' in image.info else {}
+        if source.suffix.lower() == ".png":
+            image.save(target, "PNG", optimize=True, **keep)
+        elif resized:
+            image.save(target, "JPEG", quality=90, optimize=True, progressive=True, **keep)
+        else:
+            # Re-encoding an unscaled JPEG would only lose quality
+            image.save(target, "JPEG", quality="keep", optimize=True, progressive=True, **keep)
+    if not resized and target.stat().st_size >= source.stat().st_size:
+        shutil.copyfile(source, target)
+    return resized
+
+
+def process_figure(source, target, max_pixels):
+    """Produce one cached figure (runs inside a worker process)"""
+    source, target = Path(source), Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f"{target.stem}.{os.getpid()}.tmp{target.suffix}")
+    try:
+        if source.suffix.lower() in VECTOR_SUFFIXES:
+            ok = convert_vector(source, partial)
+            resized = False
+        else:
+            resized = shrink_raster(source, partial, max_pixels)
+            ok = True
+        if ok:
+            os.replace(partial, target)
+            return {'ok': True, 'resized': resized, 'bytes': target.stat().st_size}
+        return {'ok': False, 'error': f"no converter for {source.suffix} (install inkscape or ghostscript)"}
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _load_manifest():
+    try:
+        return json.loads(MANIFEST.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(manifest):
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    partial = MANIFEST.with_suffix(f".{os.getpid()}.tmp")
+    partial.write_text(json.dumps(manifest, indent=1), encoding='utf-8')
+    os.replace(partial, MANIFEST)
+
+
+def prepare_figures(tex_files, dpi=TARGET_DPI, max_workers=None):
+    """Bring the figure cache up to date for the given .tex files.
+
+    Returns the cache directory, which mirrors the project tree and goes first on the
+    TeX search path so \\includegraphics{figures/x.png} picks up the processed copy.
+    """
+    manifest = _load_manifest()
+    pending = []
+    explicit_vectors = []
+    requests = figure_requests(tex_files, explicit_vectors)
+    for tex, name in explicit_vectors:
+        print(f"[WARNING] {tex}: \\includegraphics{{{name}}} names the {Path(name).suffix} file, so the "
+              f"converted PDF cannot be used - drop the extension to use the figure cache")
+    for source, width in requests.items():
+        max_pixels = max(1, round(width * dpi))
+        key = _cache_key(source.read_bytes(), max_pixels)
+        target = output_path(source)
+        entry = manifest.get(source.as_posix())
+        if entry and entry['key'] == key and target.exists():
+            continue
+        pending.append((source, target, max_pixels, key))
+
+    if not pending:
+        return FIGURE_CACHE
+
+    if not PIL_AVAILABLE and any(s.suffix.lower() in RASTER_SUFFIXES for s, _, _, _ in pending):
+        print("[INFO] Pillow not installed - figures are used at full size (pip install pillow)")
+
+    sources, targets, sizes, keys = zip(*pending)
+    if len(pending) == 1:
+        results = [process_figure(sources[0], targets[0], sizes[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            results = list(pool.map(process_figure, sources, targets, sizes))
+
+    saved = 0
+    for source, key, outcome in zip(sources, keys, results):
+        if not outcome['ok']:
+            print(f"[WARNING] Figure {source} not processed: {outcome['error']}")
+            continue
+        manifest[source.as_posix()] = {'key': key, 'bytes': outcome['bytes']}
+        saved += source.stat().st_size - outcome['bytes']
+    _save_manifest(manifest)
+    print(f"[FIGURES] Processed {len(pending)} figure(s), {saved / 1024:.0f} KiB smaller")
+    return FIGURE_CACHE
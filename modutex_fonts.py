@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Font Cache
+Checks the fonts a xelatex/lualatex document asks for and warms the system font cache
+once, keeping a persistent lookup so later builds need no font scanning at all
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from modutex_jobs import STATE_DIR
+
+FONT_CACHE = STATE_DIR / "fonts.json"
+
+FONT_COMMAND = re.compile(
+    r"\\(?:setmainfont|setsansfont|setmonofont|setromanfont|setdefaultfont|settextfont"
+    r"|setlatintextfont|setdigitfont|newfontfamily\s*\\[A-Za-z@]+|setmathfont)"
+    r"\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}"
+)
+
+# First bytes of TrueType/OpenType files (setup.bat may leave text placeholders behind)
+FONT_SIGNATURES = (b"\x00\x01\x00\x00", b"true", b"OTTO", b"ttcf")
+
+
+def configured_fonts(preamble):
+    """Font names a (conditionals-resolved) preamble loads through fontspec"""
+    names = []
+    for match in FONT_COMMAND.finditer(preamble):
+        name = match.group(1).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def font_dirs():
+    """System and user font directories for this platform"""
+    home = Path.home()
+    if sys.platform == "win32":
+        dirs = [Path(os.environ.get("WINDIR", "C:/Windows")) / "Fonts",
+                Path(os.environ.get("LOCALAPPDATA", home)) / "Microsoft" / "Windows" / "Fonts",
+                home / ".fonts"]
+    elif sys.platform == "darwin":
+        dirs = [Path("/System/Library/Fonts"), Path("/Library/Fonts"), home / "Library" / "Fonts"]
+    else:
+        dirs = [Path("/usr/share/fonts"), Path("/usr/local/share/fonts"),
+                home / ".fonts", home / ".local" / "share" / "fonts"]
+    return [d for d in dirs if d.is_dir()]
+
+
+def fonts_stamp():
+    """Changes whenever a font is installed or removed (directory mtimes)"""
+    digest = hashlib.sha256()
+    for directory in font_dirs():
+        digest.update(f"{directory}:{directory.stat().st_mtime}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _is_font_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) in FONT_SIGNATURES
+    except OSError:
+        return False
+
+
+def find_font(name):
+    """Path of an installed font by family name, or None"""
+    if shutil.which("fc-list"):
+        process = subprocess.run(["fc-list", name, "file"], capture_output=True, text=True, errors='replace')
+        for line in process.stdout.splitlines():
+            path = line.strip().rstrip(":")
+            if path:
+                return path
+    # No fontconfig (or it does not know the font): look for a matching file name
+    wanted = re.sub(r"[\s_-]", "", name).lower()
+    for directory in font_dirs():
+        for path in directory.rglob("*"):
+            if (path.suffix.lower() in (".ttf", ".otf", ".ttc")
+                    and re.sub(r"[\s_-]", "", path.stem).lower() == wanted and _is_font_file(path)):
+                return str(path)
+    return None
+
+
+def warm_font_cache(engine):
+    """Refresh the engine's font database once per font change, not on every first build"""
+    if engine == "lualatex" and shutil.which("luaotfload-tool"):
+        command = ["luaotfload-tool", "--update"]
+    elif shutil.which("fc-cache"):
+        command = ["fc-cache"]
+    else:
+        return False
+    print(f"[FONTS] Updating font cache ({command[0]}) - only needed once after fonts change")
+    return subprocess.run(command, capture_output=True).returncode == 0
+
+
+def check_fonts(fonts, engine="xelatex"):
+    """Make sure the font cache is warm and every font exists.
+
+    Results are stored in .modutex/fonts.json and reused until the font directories
+    change, so a warm build does no font work at all. Returns the missing font names.
+    """
+    try:
+        cache = json.loads(FONT_CACHE.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+
+    stamp = fonts_stamp()
+    warmed = cache.get('warmed', {})
+    lookups = cache.get('fonts', {}) if cache.get('stamp') == stamp else {}
+    if warmed.get(engine) != stamp:
+        warm_font_cache(engine)
+        # fontconfig may write .uuid files into the font directories
+        stamp = fonts_stamp()
+        warmed = {engine: stamp}
+        lookups = {}
+
+    dirty = warmed != cache.get('warmed') or cache.get('stamp') != stamp
+    for name in fonts:
+        if name not in lookups:
+            lookups[name] = find_font(name)
+            dirty = True
+
+    if dirty:
+        FONT_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        FONT_CACHE.write_text(json.dumps({'stamp': stamp, 'warmed': warmed, 'fonts': lookups},
+                                         ensure_ascii=False, indent=1), encoding='utf-8')
+    return [name for name in fonts if not lookups.get(name)]
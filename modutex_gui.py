@@ -28,8 +28,9 @@ try:
     from texchat import (
         edit_section, generate_section, text_to_latex, 
         fetch_doi_citation, update_main_tex, show_config,
-        get_openai_key
+        get_openai_key, queue_batch, resume_batch, select_model
     )
+    from modutex_backend import active_backend
     AI_AVAILABLE = True
 except ImportError:
     print("Warning: AI functions not available. Running in demo mode.")
@@ -42,6 +43,19 @@ except ImportError:
     def update_main_tex(*args): return True
     def show_config(*args): pass
     def get_openai_key(): return "demo_key"
+    def queue_batch(*args): return None
+    def resume_batch(*args): return True
+    def select_model(): return None
+    active_backend = None
+
+from modutex_jobs import JobStore, MAX_ATTEMPTS
+from modutex_build import build_pdf
+from modutex_index import load_index
+from modutex_refcheck import check_document
+from modutex_manifest import section_names
+from modutex_trace import span
+from modutex_stats import stats_report
+from modutex_routing import ROUTED_TASKS, routing_enabled, task_override, save_override, save_env_value
 
 class ModuTexGUI:
     def __init__(self):
@@ -272,7 +286,8 @@ class ModuTexGUI:
             bd=0,
             highlightthickness=1,
             highlightcolor=self.colors['primary'],
-            activestyle='none'  # Better visual feedback
+            activestyle='none',  # Better visual feedback
+            selectmode=tk.EXTENDED  # Ctrl/Shift-click to pick sections for partial builds
         )
         
         # Scrollbar with styling
@@ -363,7 +378,9 @@ class ModuTexGUI:
             ("✨ Generate New Section", self.generate_section_dialog, self.colors['success']),
             ("📚 Add Citation from DOI", self.add_citation_dialog, self.colors['primary']),
             ("📋 Manage Sections", self.manage_sections_dialog, self.colors['text']),
+            ("🗂️ Task Queue", self.task_queue_dialog, self.colors['secondary']),
             ("🚀 Compile PDF", self.compile_pdf, self.colors['success']),
+            ("⚡ Compile Selected Sections", self.compile_selected, self.colors['primary']),
             ("⚙️ Configuration", self.show_configuration, self.colors['text_light'])
         ]
         
@@ -615,19 +632,33 @@ Ready to create amazing LaTeX documents! 🚀✨
         
     def update_sections_list(self):
         """Update the sections list display with beautiful formatting"""
+        # Keep the user's selection across the periodic refresh
+        selected = set(self.selected_sections())
         self.sections_listbox.delete(0, tk.END)
         
         sections_dir = Path("sections")
         if sections_dir.exists():
-            section_files = sorted(sections_dir.glob("*.tex"))
-            if section_files:
-                for file in section_files:
-                    self.sections_listbox.insert(tk.END, f"📄 {file.stem}.tex")
+            # The index only re-reads files that changed since the last refresh
+            sections = load_index().sections()
+            if sections:
+                for index, entry in enumerate(sections):
+                    self.sections_listbox.insert(tk.END, f"📄 {entry['name']}.tex  ·  {entry['words']} words")
+                    if entry['name'] in selected:
+                        self.sections_listbox.selection_set(index)
             else:
                 self.sections_listbox.insert(tk.END, "📝 No sections yet - Create your first!")
         else:
             self.sections_listbox.insert(tk.END, "📁 Sections folder will be created automatically")
                     
+    def selected_sections(self):
+        """Names of the sections currently selected in the sections list"""
+        names = []
+        for index in self.sections_listbox.curselection():
+            entry = self.sections_listbox.get(index)
+            if entry.startswith("📄 "):
+                names.append(entry[2:].split(".tex")[0].strip())
+        return names
+        
     def log_message(self, message):
         """Add a beautifully formatted message to the output area"""
         timestamp = time.strftime("%H:%M:%S")
@@ -675,7 +706,8 @@ Ready to create amazing LaTeX documents! 🚀✨
                 self.set_status("Processing AI request...")
                 self.log_message("🤖 Starting AI processing...")
                 
-                result = task_func(*args, **kwargs)
+                with span(f"gui.{getattr(task_func, '__name__', 'task')}"):
+                    result = task_func(*args, **kwargs)
                 
                 if result:
                     self.log_message("✅ Task completed successfully!")
@@ -717,8 +749,37 @@ Ready to create amazing LaTeX documents! 🚀✨
         """Show beautiful section management dialog"""
         dialog = ManageSectionsDialog(self.root, self)
         
+    def task_queue_dialog(self):
+        """Show the persistent batch job queue"""
+        dialog = TaskQueueDialog(self.root, self)
+        
+    def references_ok(self):
+        """Static ref/cite check before compiling; True when the build should go ahead"""
+        try:
+            report = check_document()
+        except Exception as e:
+            self.log_message(f"⚠️ Reference check skipped: {str(e)}")
+            return True
+            
+        for message in report['errors']:
+            self.log_message(f"❌ {message}")
+        if not report['errors']:
+            return True
+            
+        shown = "\n".join(f"• {message}" for message in report['errors'][:10])
+        if len(report['errors']) > 10:
+            shown += f"\n... and {len(report['errors']) - 10} more"
+        return messagebox.askyesno(
+            "Reference Problems",
+            f"Found {len(report['errors'])} reference problem(s):\n\n{shown}\n\nCompile anyway?"
+        )
+        
     def compile_pdf(self):
         """Compile PDF with beautiful progress feedback"""
+        if not self.references_ok():
+            self.set_status("Compilation cancelled - fix references first")
+            return
+            
         def compile_worker():
             try:
                 self.start_progress()
@@ -726,29 +787,30 @@ Ready to create amazing LaTeX documents! 🚀✨
                 self.log_message("🚀 Starting PDF compilation...")
                 self.log_message("📄 Processing LaTeX document...")
                 
-                # Run compile.bat
-                result = subprocess.run(
-                    ["compile.bat"],
-                    capture_output=True,
-                    text=True,
-                    cwd=Path.cwd()
-                )
+                # The same incremental build as the command line: engine detection,
+                # figure/TikZ caches, artifact cache, bibliography and build statistics
+                with span("gui.compile"):
+                    result = build_pdf()
                 
-                if result.returncode == 0:
-                    self.log_message("✅ PDF compiled successfully!")
+                if result.success:
+                    self.log_message(f"✅ PDF compiled successfully in {result.total_time:.1f}s!")
                     self.log_message("📄 Beautiful PDF document created!")
+                    for error in result.errors[:5]:
+                        self.log_message(f"⚠️ {error.file}:{error.line}: {error.message}")
                     
-                    if Path("main.pdf").exists():
+                    if result.pdf and Path(result.pdf).exists():
                         self.log_message("🎉 Opening your beautiful PDF...")
                         try:
-                            os.startfile("main.pdf")
+                            os.startfile(str(result.pdf))
                         except:
-                            self.log_message("📂 PDF saved as main.pdf")
+                            self.log_message(f"📂 PDF saved as {result.pdf}")
                     
                     self.set_status("PDF compilation successful!")
                 else:
-                    error_msg = result.stderr.strip() if result.stderr else "Unknown compilation error"
-                    self.log_message(f"❌ Compilation failed: {error_msg}")
+                    for error in result.errors[:5]:
+                        self.log_message(f"❌ {error.file}:{error.line}: {error.message}")
+                    if not result.errors:
+                        self.log_message("❌ Compilation failed - see the console for the LaTeX log")
                     self.set_status("Compilation failed - check output")
                     
             except Exception as e:
@@ -761,6 +823,48 @@ Ready to create amazing LaTeX documents! 🚀✨
         thread.daemon = True
         thread.start()
         
+    def compile_selected(self):
+        """Compile only the selected sections with \\includeonly"""
+        names = self.selected_sections()
+        if not names:
+            messagebox.showwarning(
+                "No Selection",
+                "Select one or more sections in the list (Ctrl+click for several)."
+            )
+            return
+        if not self.references_ok():
+            self.set_status("Compilation cancelled - fix references first")
+            return
+            
+        def compile_worker():
+            try:
+                self.start_progress()
+                self.set_status("Compiling selected sections...")
+                self.log_message(f"⚡ Partial build: {', '.join(names)}")
+                
+                with span("gui.compile_selected", sections=len(names)):
+                    result = build_pdf(only=names)
+                
+                if result.success:
+                    self.log_message(f"✅ Partial PDF ready in {result.total_time:.1f}s - "
+                                     "other pages keep numbers from the last full build")
+                    for error in result.errors[:5]:
+                        self.log_message(f"⚠️ {error.file}:{error.line}: {error.message}")
+                    self.set_status("Partial build successful!")
+                else:
+                    self.log_message("❌ Partial build failed. Sync main.tex with \\include "
+                                     "(texchat.py update_main --include) and check the console.")
+                    self.set_status("Partial build failed - check output")
+            except Exception as e:
+                self.log_message(f"❌ Compilation error: {str(e)}")
+                self.set_status(f"Compilation error: {str(e)}")
+            finally:
+                self.stop_progress()
+                
+        thread = threading.Thread(target=compile_worker)
+        thread.daemon = True
+        thread.start()
+        
     def show_configuration(self):
         """Show beautiful configuration dialog"""
         dialog = ConfigurationDialog(self.root, self)
@@ -948,10 +1052,7 @@ class EditSectionDialog(BaseDialog):
         ).grid(row=0, column=0, sticky="w", padx=15, pady=(15, 5))
         
         # Get available sections
-        sections_dir = Path("sections")
-        section_files = []
-        if sections_dir.exists():
-            section_files = [f.stem for f in sections_dir.glob("*.tex")]
+        section_files = section_names()
             
         self.section_var = tk.StringVar()
         self.section_combo = ttk.Combobox(
@@ -1536,17 +1637,15 @@ class ManageSectionsDialog(BaseDialog):
         
     def update_sections(self):
         self.sections_list.delete(0, tk.END)
-        sections_dir = Path("sections")
-        if sections_dir.exists():
-            for file in sorted(sections_dir.glob("*.tex")):
-                self.sections_list.insert(tk.END, f"📄 {file.stem}")
+        for name in section_names():
+            self.sections_list.insert(tk.END, f"📄 {name}")
                 
     def create_section(self):
         from tkinter import simpledialog
         name = simpledialog.askstring("Create Section", "Section name:")
         if name:
             section_path = Path("sections") / f"{name}.tex"
-            section_path.parent.mkdir(exist_ok=True)
+            section_path.parent.mkdir(parents=True, exist_ok=True)
             section_path.write_text(f"% TODO: Add content for {name} section\n")
             self.update_sections()
             self.main_app.log_message(f"✅ Created empty section: {name}.tex")
@@ -1568,12 +1667,155 @@ class ManageSectionsDialog(BaseDialog):
         self.main_app.run_ai_task(update_main_tex)
 
 
+class TaskQueueDialog(BaseDialog):
+    """Dialog for the persistent batch job queue"""
+    def __init__(self, parent, main_app):
+        super().__init__(parent, main_app)
+        self.dialog.title("Task Queue")
+        self.dialog.geometry("750x550")
+        self.store = JobStore()
+        self.create_widgets()
+        
+    def create_widgets(self):
+        self.create_title("🗂️ Task Queue", "Batch jobs survive crashes and resume where they stopped")
+        
+        # Main content - use scrollable area
+        content_frame = tk.Frame(self.get_content_frame(), bg=self.colors['background'])
+        content_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        content_frame.grid_columnconfigure(0, weight=1)
+        
+        # Batch selection
+        batch_frame = tk.Frame(content_frame, bg=self.colors['surface'], relief='raised', bd=1)
+        batch_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        tk.Label(
+            batch_frame,
+            text="📦 Batch:",
+            font=('Segoe UI', 12, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(anchor="w", padx=15, pady=(15, 5))
+        
+        self.batch_var = tk.StringVar()
+        self.batch_combo = ttk.Combobox(
+            batch_frame,
+            textvariable=self.batch_var,
+            state="readonly",
+            font=('Segoe UI', 11)
+        )
+        self.batch_combo.pack(fill=tk.X, padx=15, pady=(0, 15))
+        self.batch_combo.bind("<<ComboboxSelected>>", lambda e: self.update_jobs())
+        
+        # Jobs list
+        list_frame = tk.Frame(content_frame, bg=self.colors['surface'], relief='raised', bd=1)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+        
+        list_container = tk.Frame(list_frame, bg=self.colors['surface'])
+        list_container.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        self.jobs_list = tk.Listbox(
+            list_container,
+            height=10,
+            font=('Consolas', 10),
+            bg=self.colors['accent'],
+            fg=self.colors['text'],
+            selectbackground=self.colors['primary'],
+            selectforeground='white'
+        )
+        scrollbar = ttk.Scrollbar(list_container, orient="vertical")
+        self.jobs_list.config(yscrollcommand=scrollbar.set)
+        scrollbar.config(command=self.jobs_list.yview)
+        
+        self.jobs_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Buttons
+        button_frame = tk.Frame(content_frame, bg=self.colors['background'])
+        button_frame.pack(fill=tk.X)
+        
+        buttons = [
+            ("📂 Load Batch", self.load_batch, self.colors['success']),
+            ("▶️ Resume", self.resume, self.colors['primary']),
+            ("🔁 Retry Failed", self.retry_failed, self.colors['secondary']),
+            ("🔄 Refresh", self.update_batches, self.colors['text_light'])
+        ]
+        for text, command, color in buttons:
+            tk.Button(
+                button_frame,
+                text=text,
+                command=command,
+                font=('Segoe UI', 10, 'bold'),
+                bg=color,
+                fg='white',
+                activebackground=self.main_app._darken_color(color),
+                relief='flat',
+                padx=15,
+                pady=8,
+                cursor='hand2'
+            ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.update_batches()
+        
+    def update_batches(self):
+        batches = list(self.store.batches())
+        self.batch_combo.config(values=batches)
+        if batches and self.batch_var.get() not in batches:
+            self.batch_var.set(batches[0])
+        self.update_jobs()
+        
+    def update_jobs(self):
+        self.jobs_list.delete(0, tk.END)
+        batch = self.batch_var.get()
+        if not batch:
+            self.jobs_list.insert(tk.END, "📝 No batches yet - load a batch file to start")
+            return
+        icons = {'pending': '⏳', 'running': '🔄', 'done': '✅', 'failed': '❌'}
+        for job in self.store.list_jobs(batch):
+            target = job['inputs'].get('name') or job['inputs'].get('doi') or job['inputs'].get('text_file', '')
+            self.jobs_list.insert(
+                tk.END,
+                f"{icons.get(job['state'], '•')} {job['kind']:<14} {target:<24} "
+                f"attempts {job['attempts']}/{MAX_ATTEMPTS}"
+            )
+            
+    def load_batch(self):
+        batch_file = filedialog.askopenfilename(
+            title="Select batch file",
+            filetypes=[("JSON batch files", "*.json"), ("All files", "*.*")]
+        )
+        if not batch_file:
+            return
+        batch = queue_batch(batch_file, self.store)
+        if batch:
+            self.main_app.log_message(f"🗂️ Queued batch '{batch}'")
+            self.batch_var.set(batch)
+            self.update_batches()
+        else:
+            messagebox.showerror("Invalid Batch", "Could not load the batch file. See the console for details.")
+            
+    def resume(self):
+        batch = self.batch_var.get()
+        if not batch:
+            messagebox.showwarning("No Batch", "Please select or load a batch first.")
+            return
+        self.main_app.log_message(f"▶️ Resuming batch '{batch}'...")
+        self.dialog.destroy()
+        self.main_app.run_ai_task(resume_batch, batch)
+        
+    def retry_failed(self):
+        batch = self.batch_var.get()
+        if batch:
+            count = self.store.retry_failed(batch)
+            self.main_app.log_message(f"🔁 {count} failed job(s) in '{batch}' reset for retry")
+            self.update_jobs()
+
+
 class ConfigurationDialog(BaseDialog):
     """Beautiful dialog for configuration"""
     def __init__(self, parent, main_app):
         super().__init__(parent, main_app)
         self.dialog.title("Configuration")
-        self.dialog.geometry("650x500")
+        self.dialog.geometry("760x820")
         self.create_widgets()
         
     def create_widgets(self):
@@ -1647,6 +1889,128 @@ class ConfigurationDialog(BaseDialog):
         instruction_text.config(state=tk.DISABLED)
         instruction_text.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
         
+        # Per-task model routing
+        routing_frame = tk.Frame(content_frame, bg=self.colors['surface'], relief='raised', bd=1)
+        routing_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        tk.Label(
+            routing_frame,
+            text="🧭 Model per Task",
+            font=('Segoe UI', 12, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(anchor="w", padx=15, pady=(15, 5))
+        self.routing_var = tk.BooleanVar(value=routing_enabled())
+        tk.Checkbutton(
+            routing_frame,
+            text="Route automatically ('auto' tasks use the fastest adequate model, not the default)",
+            variable=self.routing_var,
+            command=self.save_routing,
+            font=('Segoe UI', 9),
+            fg=self.colors['text_light'],
+            bg=self.colors['surface'],
+            activebackground=self.colors['surface']
+        ).pack(anchor="w", padx=15, pady=(0, 5))
+        
+        # Read when the panel opens: a local server's model list may have changed since startup
+        backend = active_backend() if active_backend else None
+        models = list(backend.models) if backend else []
+        if backend:
+            tk.Label(
+                routing_frame,
+                text=f"Backend: {backend.name} at {backend.base_url} - {len(backend.models)} model(s)",
+                font=('Segoe UI', 9),
+                fg=self.colors['text_light'],
+                bg=self.colors['surface']
+            ).pack(anchor="w", padx=15, pady=(0, 5))
+        
+        default_row = tk.Frame(routing_frame, bg=self.colors['surface'])
+        default_row.pack(fill=tk.X, padx=15, pady=(0, 5))
+        tk.Label(
+            default_row,
+            text="Default model",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        self.default_model_var = tk.StringVar(value=select_model() or "")
+        default_combo = ttk.Combobox(
+            default_row,
+            textvariable=self.default_model_var,
+            values=models,
+            state="readonly",
+            width=24,
+            font=('Segoe UI', 10)
+        )
+        default_combo.pack(side=tk.LEFT)
+        default_combo.bind("<<ComboboxSelected>>", lambda e: self.save_default_model())
+        
+        grid = tk.Frame(routing_frame, bg=self.colors['surface'])
+        grid.pack(fill=tk.X, padx=15, pady=(0, 15))
+        self.route_vars = {}
+        for index, task in enumerate(ROUTED_TASKS):
+            tk.Label(
+                grid,
+                text=task,
+                font=('Segoe UI', 10),
+                fg=self.colors['text'],
+                bg=self.colors['surface']
+            ).grid(row=index // 2, column=(index % 2) * 2, sticky="w", padx=(0, 10), pady=2)
+            var = tk.StringVar(value=task_override(task) or "auto")
+            combo = ttk.Combobox(
+                grid,
+                textvariable=var,
+                values=["auto"] + models,
+                state="readonly",
+                width=16,
+                font=('Segoe UI', 10)
+            )
+            combo.grid(row=index // 2, column=(index % 2) * 2 + 1, sticky="w", padx=(0, 25), pady=2)
+            combo.bind("<<ComboboxSelected>>", lambda e, task=task: self.save_route(task))
+            self.route_vars[task] = var
+        
+        # Usage statistics
+        stats_frame = tk.Frame(content_frame, bg=self.colors['surface'], relief='raised', bd=1)
+        stats_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+        
+        header = tk.Frame(stats_frame, bg=self.colors['surface'])
+        header.pack(fill=tk.X, padx=15, pady=(15, 10))
+        tk.Label(
+            header,
+            text="📊 Usage & Latency",
+            font=('Segoe UI', 12, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(side=tk.LEFT)
+        
+        self.stats_windows = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "All time": 0}
+        self.stats_var = tk.StringVar(value="Last 7 days")
+        stats_combo = ttk.Combobox(
+            header,
+            textvariable=self.stats_var,
+            values=list(self.stats_windows),
+            state="readonly",
+            width=14,
+            font=('Segoe UI', 10)
+        )
+        stats_combo.pack(side=tk.RIGHT)
+        stats_combo.bind("<<ComboboxSelected>>", lambda e: self.update_stats())
+        
+        self.stats_text = scrolledtext.ScrolledText(
+            stats_frame,
+            height=14,
+            wrap=tk.NONE,
+            font=('Consolas', 9),
+            bg=self.colors['accent'],
+            fg=self.colors['text'],
+            relief='flat',
+            bd=0,
+            padx=10,
+            pady=10
+        )
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
+        self.update_stats()
+        
         # Buttons
         button_frame = tk.Frame(content_frame, bg=self.colors['background'])
         button_frame.pack(fill=tk.X)
@@ -1681,6 +2045,44 @@ class ConfigurationDialog(BaseDialog):
         )
         close_btn.pack(side=tk.RIGHT)
         
+    def save_route(self, task):
+        """Store the chosen model for a task in .env"""
+        model = self.route_vars[task].get()
+        try:
+            save_override(task, model)
+            self.main_app.log_message(f"🧭 {task}: {'automatic model choice' if model == 'auto' else model}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not update .env: {str(e)}")
+        
+    def save_routing(self):
+        """Store MODUTEX_ROUTING in .env"""
+        enabled = self.routing_var.get()
+        try:
+            save_env_value('MODUTEX_ROUTING', "on" if enabled else None)
+            self.main_app.log_message(f"🧭 Automatic model routing {'on' if enabled else 'off'}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not update .env: {str(e)}")
+        
+    def save_default_model(self):
+        """Store the chosen default model as OPENAI_MODEL in .env"""
+        model = self.default_model_var.get()
+        try:
+            save_env_value('OPENAI_MODEL', model)
+            self.main_app.log_message(f"🧭 Default model: {model}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not update .env: {str(e)}")
+        
+    def update_stats(self):
+        """Fill the statistics panel for the selected time window"""
+        try:
+            lines = stats_report(self.stats_windows[self.stats_var.get()])
+        except Exception as e:
+            lines = [f"Statistics unavailable: {str(e)}"]
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert("1.0", "\n".join(lines))
+        self.stats_text.config(state=tk.DISABLED)
+        
     def edit_env_file(self):
         try:
             os.startfile(".env")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Hedged Requests
+Streams chat completions and, when the first token is later than the recent percentile,
+sends a duplicate request and keeps whichever starts answering first; the loser is
+cancelled by closing its stream, and a budget caps how many duplicates are sent
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+
+from modutex_keypool import rate_limits
+from modutex_stats import get_store, percentile, recording
+from modutex_trace import propagate, span
+
+# Recent time-to-first-byte readings kept per model
+WINDOW = 100
+# Hedging starts once a model has this many readings
+MIN_SAMPLES = 10
+# Never hedge sooner than this, whatever the percentile says
+MIN_DELAY = 0.25
+
+
+def hedging_enabled():
+    """MODUTEX_HEDGE=on in .env turns hedging on"""
+    return os.environ.get('MODUTEX_HEDGE', 'off').lower() in ('1', 'on', 'true', 'yes')
+
+
+def _setting(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+class HedgePolicy:
+    """Adaptive hedge delay per model and the duplicate-request budget"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.first_bytes = {}
+        self.calls = None
+        self.hedges = 0
+
+    def _load(self):
+        # Budget over the last 24 hours, so short CLI runs share it with earlier ones
+        if self.calls is None:
+            self.calls, self.hedges = 0, 0
+            if recording():
+                try:
+                    self.calls, self.hedges = get_store().request_counts(time.time() - 86400)
+                except Exception:
+                    pass
+
+    def delay(self, model):
+        """Seconds to wait for a first byte before hedging, or None while there is too little data"""
+        with self._lock:
+            if model not in self.first_bytes:
+                history = []
+                if recording():
+                    try:
+                        history = get_store().first_bytes(model, WINDOW)
+                    except Exception:
+                        pass
+                self.first_bytes[model] = deque(history, maxlen=WINDOW)
+            readings = list(self.first_bytes[model])
+        if len(readings) < MIN_SAMPLES:
+            return None
+        fraction = min(max(_setting('MODUTEX_HEDGE_PERCENTILE', 95), 50), 99.9) / 100
+        return max(MIN_DELAY, percentile(readings, fraction))
+
+    def observe(self, model, first_byte):
+        with self._lock:
+            self.first_bytes.setdefault(model, deque(maxlen=WINDOW)).append(first_byte)
+
+    def start_call(self):
+        with self._lock:
+            self._load()
+            self.calls += 1
+
+    def take_hedge(self):
+        """Reserve one duplicate request if the budget (MODUTEX_HEDGE_BUDGET percent extra) allows"""
+        budget = _setting('MODUTEX_HEDGE_BUDGET', 5) / 100
+        with self._lock:
+            self._load()
+            if self.hedges + 1 > budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+
+policy = HedgePolicy()
+
+
+class Attempt:
+    """One streamed request; reports ('first', self) and ('done', self) on the events queue"""
+
+    def __init__(self, index, url, headers, data, events):
+        self.index = index
+        self.url = url
+        self.headers = headers
+        self.data = data
+        self.events = events
+        self.cancelled = False
+        self.response = None
+        self.status = None
+        self.server_ms = None
+        self.limits = {}
+        self.content = []
+        self.usage = {}
+        self.first_byte = None
+        self.error = None
+        self.finished = threading.Event()
+        self.start = time.perf_counter()
+
+    def run(self):
+        with span("attempt", hedge=self.index > 0) as current:
+            try:
+                self._stream()
+            except Exception as e:
+                if not self.cancelled:
+                    self.error = str(e)
+            finally:
+                if self.response is not None:
+                    self.response.close()
+                current.set(status_code=self.status, cancelled=self.cancelled or None,
+                            first_byte_ms=round(self.first_byte * 1000) if self.first_byte else None)
+                self.finished.set()
+                self.events.put(("done", self))
+
+    def _stream(self):
+        payload = dict(self.data, stream=True, stream_options={'include_usage': True})
+        self.response = requests.post(self.url, headers=self.headers, json=payload, stream=True, timeout=60)
+        self.status = self.response.status_code
+        self.limits = rate_limits(self.response.headers)
+        processing_ms = self.response.headers.get('openai-processing-ms')
+        if processing_ms and processing_ms.isdigit():
+            self.server_ms = int(processing_ms)
+        if self.status != 200:
+            self.error = self.response.text
+            return
+        for line in self.response.iter_lines():
+            if self.cancelled:
+                return
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            chunk = json.loads(data)
+            if chunk.get('usage'):
+                self.usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                text = (choice.get('delta') or {}).get('content')
+                if text:
+                    if self.first_byte is None:
+                        self.first_byte = time.perf_counter() - self.start
+                        self.events.put(("first", self))
+                    self.content.append(text)
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.error is None and not self.cancelled
+
+    def cancel(self):
+        """Stop reading and close the connection, which ends generation on the server"""
+        self.cancelled = True
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+
+
+def hedged_chat(url, headers, data):
+    """Streamed chat completion with at most one hedge; returns (text or None, info, error details).
+
+    info holds status, server_ms, token usage, first_byte and retries (hedges sent),
+    in the form call_openai_api records in the usage statistics, plus the rate-limit
+    headers under 'limits' for the key pool.
+    """
+    model = data.get('model')
+    delay = policy.delay(model)
+    policy.start_call()
+    events = queue.Queue()
+
+    def launch(index):
+        attempt = Attempt(index, url, headers, data, events)
+        threading.Thread(target=propagate(attempt.run), daemon=True).start()
+        return attempt
+
+    attempts = [launch(0)]
+    deadline = time.perf_counter() + delay if delay is not None else None
+    winner = None
+    while winner is None:
+        timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+        try:
+            kind, attempt = events.get(timeout=timeout)
+        except queue.Empty:
+            deadline = None
+            if policy.take_hedge():
+                print(f"[HEDGE] No response after {delay:.1f}s - sending a duplicate request")
+                attempts.append(launch(1))
+            continue
+        if kind == "first" or attempt.ok:
+            winner = attempt
+        elif all(other.finished.is_set() for other in attempts):
+            winner = attempt  # Every attempt failed: report the last failure
+
+    for attempt in attempts:
+        if attempt is not winner:
+            attempt.cancel()
+    winner.finished.wait()
+    if winner.first_byte is not None:
+        policy.observe(model, winner.first_byte)
+
+    info = {'status': winner.status, 'server_ms': winner.server_ms,
+            'prompt_tokens': winner.usage.get('prompt_tokens'),
+            'completion_tokens': winner.usage.get('completion_tokens'),
+            'first_byte': winner.first_byte, 'retries': len(attempts) - 1, 'limits': winner.limits}
+    if not winner.ok:
+        return None, info, winner.error
+    if len(attempts) > 1:
+        print(f"[HEDGE] {'Duplicate' if winner.index else 'Original'} request answered first")
+    return "".join(winner.content), info, None
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Section Index
+Persistent per-section metadata (hash, word count, labels, refs, citations, figures)
+updated incrementally so commands and the GUI never rescan unchanged files
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+from modutex_jobs import STATE_DIR
+
+INDEX_FILE = STATE_DIR / "index.json"
+SECTIONS_DIR = Path("sections")
+INDEX_VERSION = 4
+
+COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+LABEL = re.compile(r"\\label\s*\{([^}]*)\}")
+REF = re.compile(r"\\(?:ref|eqref|pageref|autoref|nameref|[cC]ref|[cC]pageref)\*?\s*\{([^}]*)\}")
+CITE = re.compile(r"\\(?:no)?cite[a-zA-Z]*\*?\s*(?:\[[^\]]*\]\s*){0,2}\{([^}]*)\}")
+FIGURE = re.compile(r"\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}")
+INPUT = re.compile(r"\\(?:input|include)\s*\{([^}]*)\}")
+MATH = re.compile(r"\$\$.*?\$\$|\$[^$]*\$|\\\[.*?\\\]", re.DOTALL)
+COMMAND = re.compile(r"\\[A-Za-z@]+\*?")
+WORD = re.compile(r"\w+", re.UNICODE)
+
+# load_index() makes a new SectionIndex per call, so concurrent commands share this lock
+_lock = threading.Lock()
+
+
+def _keys(pattern, text, unique=True):
+    """All comma-separated keys captured by pattern, in order"""
+    keys = []
+    for match in pattern.finditer(text):
+        for key in match.group(1).split(","):
+            key = key.strip()
+            if key and not (unique and key in keys):
+                keys.append(key)
+    return keys
+
+
+def scan_section(text):
+    """Extract the metadata the index stores for one section"""
+    text = COMMENT.sub("", text)
+    prose = COMMAND.sub(" ", MATH.sub(" ", text))
+    # Arguments that are keys, not prose
+    for pattern in (LABEL, REF, CITE, FIGURE, INPUT):
+        prose = pattern.sub(" ", prose)
+    return {
+        'words': len(WORD.findall(prose)),
+        # Labels keep duplicates so the checker can report them
+        'labels': _keys(LABEL, text, unique=False),
+        'refs': _keys(REF, text),
+        'cites': _keys(CITE, text),
+        'figures': _keys(FIGURE, text),
+        'inputs': _keys(INPUT, text),
+    }
+
+
+class SectionIndex:
+    """Sidecar index of sections/**/*.tex keyed by path, refreshed by mtime, size and hash"""
+
+    def __init__(self, index_file=INDEX_FILE, sections_dir=SECTIONS_DIR):
+        self.index_file = Path(index_file)
+        self.sections_dir = Path(sections_dir)
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.index_file.read_text(encoding='utf-8'))
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data.get('sections', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def _save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        # A temporary file of its own per write, renamed over the index in one step
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.index_file.parent,
+                                         suffix=".tmp", delete=False) as partial:
+            json.dump({'version': INDEX_VERSION, 'sections': self.entries}, partial, ensure_ascii=False, indent=1)
+        os.replace(partial.name, self.index_file)
+
+    def section_files(self):
+        if not self.sections_dir.exists():
+            return []
+        return sorted(self.sections_dir.rglob("*.tex"))
+
+    def refresh(self):
+        """Re-scan only files whose mtime/size changed; returns the names that were re-parsed"""
+        with _lock:
+            changed = []
+            seen = set()
+            dirty = False
+            for path in self.section_files():
+                key = path.as_posix()
+                seen.add(key)
+                stat = path.stat()
+                entry = self.entries.get(key)
+                if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                    continue
+
+                data = path.read_bytes()
+                digest = hashlib.sha256(data).hexdigest()
+                if entry and entry['hash'] == digest:
+                    # Touched but not modified
+                    entry['mtime'] = stat.st_mtime
+                    dirty = True
+                    continue
+
+                # Nested sections are named by their path, e.g. 'background/related_work'
+                name = path.relative_to(self.sections_dir).with_suffix("").as_posix()
+                entry = {'name': name, 'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest}
+                entry.update(scan_section(data.decode('utf-8', errors='replace')))
+                self.entries[key] = entry
+                changed.append(name)
+                dirty = True
+
+            for key in [key for key in self.entries if key not in seen]:
+                del self.entries[key]
+                dirty = True
+
+            if dirty:
+                self._save()
+            return changed
+
+    def sections(self):
+        """Index entries in file order"""
+        return [self.entries[key] for key in sorted(self.entries)]
+
+    def get(self, name):
+        for entry in self.entries.values():
+            if entry['name'] == name:
+                return entry
+        return None
+
+    def labels(self):
+        """{label: [section names that define it]}"""
+        found = {}
+        for entry in self.sections():
+            for label in entry['labels']:
+                found.setdefault(label, []).append(entry['name'])
+        return found
+
+    def citations(self):
+        """{cite key: [section names that cite it]}"""
+        found = {}
+        for entry in self.sections():
+            for key in entry['cites']:
+                found.setdefault(key, []).append(entry['name'])
+        return found
+
+    def fingerprint(self):
+        """Single hash over every section's content hash"""
+        digest = hashlib.sha256()
+        for key in sorted(self.entries):
+            digest.update(f"{key}:{self.entries[key]['hash']}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def load_index():
+    """Open the project index and bring it up to date"""
+    index = SectionIndex()
+    index.refresh()
+    return index
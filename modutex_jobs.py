@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Persistent Job Store
+SQLite-backed queue that lets long batch runs resume after a crash or network drop
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# All ModuTex state (jobs, caches, indexes) lives in this hidden folder
+STATE_DIR = Path(".modutex")
+JOBS_DB = STATE_DIR / "jobs.db"
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    batch       TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    inputs      TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    output_hash TEXT,
+    before_hash TEXT,
+    result      TEXT,
+    error       TEXT,
+    created     REAL NOT NULL,
+    updated     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, seq);
+"""
+
+
+def hash_file(path):
+    """Return the SHA-256 of a file's contents, or None if it does not exist"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def job_id_for(batch, kind, inputs):
+    """Stable job id so re-submitting the same batch never duplicates work"""
+    key = json.dumps([batch, kind, inputs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+class JobStore:
+    """Persistent record of every queued AI job: inputs, state, attempts and output hash"""
+
+    def __init__(self, db_path=JOBS_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # The GUI runs jobs from worker threads; serialize writes ourselves
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            # Stores created before the pre-run output hash was recorded
+            if 'before_hash' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN before_hash TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_job(self, batch, kind, inputs):
+        """Queue a job; returns its id (existing jobs are left untouched)"""
+        job_id = job_id_for(batch, kind, inputs)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs WHERE batch = ?", (batch,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, batch, seq, kind, inputs, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, batch, seq, kind, json.dumps(inputs, ensure_ascii=False), now, now)
+            )
+        return job_id
+
+    def add_jobs(self, batch, jobs):
+        """Queue (kind, inputs) pairs in one transaction, so a batch is queued whole or not at all"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs WHERE batch = ?", (batch,)
+            ).fetchone()[0]
+            ids = []
+            for offset, (kind, inputs) in enumerate(jobs):
+                job_id = job_id_for(batch, kind, inputs)
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (id, batch, seq, kind, inputs, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, batch, seq + offset, kind, json.dumps(inputs, ensure_ascii=False), now, now)
+                )
+                ids.append(job_id)
+        return ids
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim_next(self, batch, max_attempts=MAX_ATTEMPTS, output_hash=None):
+        """Atomically move the next runnable job of a batch to RUNNING.
+
+        output_hash(job) is the current hash of the job's output file; it is stored in
+        the same update, so recover_interrupted can tell whether a job that died had
+        already written its output.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE batch = ? AND "
+                "(state = ? OR (state = ? AND attempts < ?)) ORDER BY seq LIMIT 1",
+                (batch, PENDING, FAILED, max_attempts)
+            ).fetchone()
+            if not row:
+                return None
+            job = self._to_dict(row)
+            before = (output_hash(job) or "") if output_hash else None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, before_hash = ?, updated = ? WHERE id = ?",
+                (RUNNING, before, time.time(), row['id'])
+            )
+        job['state'] = RUNNING
+        job['attempts'] += 1
+        job['before_hash'] = before
+        return job
+
+    def mark_done(self, job_id, output_hash=None, result=None):
+        self._set_state(job_id, DONE, output_hash=output_hash, result=result, error=None)
+
+    def mark_failed(self, job_id, error):
+        self._set_state(job_id, FAILED, error=str(error))
+
+    def _set_state(self, job_id, state, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        values = list(fields.values())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET state = ?, updated = ?, {columns} WHERE id = ?",
+                [state, time.time()] + values + [job_id]
+            )
+
+    def recover_interrupted(self, batch=None, output_hash=None):
+        """Jobs left RUNNING belong to a run that died; returns (made runnable, completed).
+
+        With output_hash(job), a job whose output file changed since it was claimed
+        already did its work (e.g. an edit written just before a crash) and is marked
+        done instead of running a second time.
+        """
+        query = "SELECT * FROM jobs WHERE state = ?"
+        params = [RUNNING]
+        if batch:
+            query += " AND batch = ?"
+            params.append(batch)
+        requeued = completed = 0
+        with self._lock, self._connect() as conn:
+            for row in conn.execute(query, params).fetchall():
+                job = self._to_dict(row)
+                current = output_hash(job) if output_hash else None
+                # before_hash is "" for a file that did not exist yet, NULL when never recorded
+                written = (output_hash is not None and job['before_hash'] is not None
+                           and (current or "") != job['before_hash'])
+                if written:
+                    conn.execute("UPDATE jobs SET state = ?, output_hash = ?, error = NULL, updated = ? "
+                                 "WHERE id = ?", (DONE, current, time.time(), job['id']))
+                    completed += 1
+                else:
+                    conn.execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?",
+                                 (PENDING, time.time(), job['id']))
+                    requeued += 1
+        return requeued, completed
+
+    def retry_failed(self, batch):
+        """Reset exhausted jobs so they get a fresh set of attempts"""
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, error = NULL, updated = ? "
+                "WHERE batch = ? AND state = ?",
+                (PENDING, time.time(), batch, FAILED)
+            ).rowcount
+
+    def clear(self, batch):
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE batch = ?", (batch,)).rowcount
+
+    def list_jobs(self, batch=None):
+        with self._connect() as conn:
+            if batch:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE batch = ? ORDER BY seq", (batch,)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY batch, seq").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def batches(self):
+        """Return {batch: {state: count}} for every batch in the store"""
+        summary = {}
+        with self._connect() as conn:
+            for row in conn.execute(
+                "SELECT batch, state, COUNT(*) AS n FROM jobs GROUP BY batch, state ORDER BY batch"
+            ):
+                summary.setdefault(row['batch'], {})[row['state']] = row['n']
+        return summary
+
+    def is_finished(self, batch, max_attempts=MAX_ATTEMPTS):
+        """True when nothing in the batch is left to run"""
+        with self._connect() as conn:
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch = ? AND "
+                "(state IN (?, ?) OR (state = ? AND attempts < ?))",
+                (batch, PENDING, RUNNING, FAILED, max_attempts)
+            ).fetchone()[0]
+        return remaining == 0
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job['inputs'] = json.loads(job['inputs'])
+        return job
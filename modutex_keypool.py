@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - API Key Pool
+Spreads AI calls over several API keys and OpenAI-compatible endpoints by their remaining
+rate-limit quota, and takes keys out of rotation when they are rejected (401) or
+rate limited (429)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from modutex_backend import active_backend
+
+# Cool-down for a 429 without Retry-After / reset headers
+RATE_LIMIT_COOLDOWN = 20.0
+# Assumed remaining quota of a key that has not reported one yet
+UNKNOWN_REMAINING = 1000
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(text):
+    """Seconds in an OpenAI reset header ("20ms", "1s", "6m0s"), or None"""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(text)
+    return sum(float(value) * DURATION_UNITS[unit] for value, unit in parts) if parts else None
+
+
+def rate_limits(headers):
+    """Remaining requests and the wait before retrying, from a response's headers"""
+    limits = {}
+    remaining = headers.get('x-ratelimit-remaining-requests')
+    if remaining is not None and str(remaining).isdigit():
+        limits['remaining'] = int(remaining)
+    wait = parse_duration(headers.get('retry-after')) or parse_duration(headers.get('x-ratelimit-reset-requests'))
+    if wait is not None:
+        limits['reset'] = wait
+    return limits
+
+
+def mask_key(key):
+    """A loggable name for a key; short keys get a hash so they stay distinguishable"""
+    if not key:
+        return "no key"
+    if len(key) > 15:
+        return f"{key[:7]}...{key[-4:]}"
+    return f"key#{hashlib.sha256(key.encode('utf-8')).hexdigest()[:6]}"
+
+
+class PoolMember:
+    """One API key at one base URL, with its live quota and per-key counters"""
+
+    def __init__(self, key, base_url):
+        self.key = key
+        self.base_url = base_url.rstrip("/")
+        self.label = f"{mask_key(key)}@{urlparse(self.base_url).netloc or self.base_url}"
+        self.remaining = None
+        self.in_flight = 0
+        self.cooling_until = 0.0
+        self.disabled = False
+        self.last_used = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency = 0.0
+
+    def usable(self, now):
+        return not self.disabled and now >= self.cooling_until
+
+    def score(self):
+        """Higher is better: quota left after the requests already running on this key"""
+        remaining = self.remaining if self.remaining is not None else UNKNOWN_REMAINING
+        return remaining - self.in_flight
+
+
+def pool_entries():
+    """(key, base_url) pairs from OPENAI_POOL, OPENAI_API_KEYS or the single OPENAI_API_KEY.
+
+    OPENAI_POOL lists entries "key@base_url" (the URL is optional; "none" for servers
+    without a key); OPENAI_API_KEYS lists keys for the backend's base URL. A local backend
+    needs no key, so without OPENAI_POOL it is called without one.
+    """
+    backend = active_backend()
+    base_url = backend.base_url
+    pool = os.environ.get('OPENAI_POOL', "").strip()
+    if pool:
+        entries = []
+        for item in filter(None, (part.strip() for part in pool.split(","))):
+            key, _, url = item.partition("@")
+            entries.append((None if key.lower() == "none" else key, url or base_url))
+        return entries
+    if not backend.needs_key:
+        return [(None, base_url)]
+    keys = [key.strip() for key in os.environ.get('OPENAI_API_KEYS', "").split(",") if key.strip()]
+    if not keys:
+        key = os.environ.get('OPENAI_API_KEY', "")
+        keys = [key] if key and key != "your_api_key" else []
+    return [(key, base_url) for key in keys]
+
+
+class KeyPool:
+    """Thread-safe choice of the key with the most quota left"""
+
+    def __init__(self, entries):
+        self.members = [PoolMember(key, url) for key, url in entries]
+        self._lock = threading.Lock()
+
+    def available(self, exclude=()):
+        """Whether a usable member is left outside `exclude` (members, not labels: two
+        keys can share a label)"""
+        now = time.monotonic()
+        return any(member.usable(now) and member not in exclude for member in self.members)
+
+    def acquire(self, exclude=()):
+        """The member to send the next request to, or None if every key was rejected.
+
+        While all keys are cooling down after a 429, this waits for the one that recovers
+        first instead of sending it another request that would be rate limited too.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [member for member in self.members if not member.disabled and member not in exclude]
+            if not candidates:
+                return None
+            ready = [member for member in candidates if member.usable(now)]
+            if ready:
+                member = max(ready, key=lambda member: (member.score(), -member.last_used))
+            else:
+                member = min(candidates, key=lambda member: member.cooling_until)
+            member.in_flight += 1
+            member.last_used = now
+            wait = member.cooling_until - now
+        # Sleep outside the lock so other threads can still pick keys that are ready
+        if wait > 0:
+            print(f"[POOL] Every key is rate limited - waiting {wait:.0f}s for {member.label}")
+            time.sleep(wait)
+        return member
+
+    def release(self, member, status, limits, latency):
+        """Record the outcome of a request and evict the key on 401/429"""
+        with self._lock:
+            member.in_flight -= 1
+            member.calls += 1
+            member.latency += latency
+            if 'remaining' in limits:
+                member.remaining = limits['remaining']
+            if status != 200:
+                member.errors += 1
+            if status == 401:
+                member.disabled = True
+                if len(self.members) > 1:
+                    print(f"[POOL] {member.label} was rejected (401) - removed from the pool")
+            elif status == 429:
+                member.rate_limited += 1
+                member.remaining = 0
+                member.cooling_until = time.monotonic() + limits.get('reset', RATE_LIMIT_COOLDOWN)
+                if len(self.members) > 1:
+                    print(f"[POOL] {member.label} is rate limited - resting it for "
+                          f"{limits.get('reset', RATE_LIMIT_COOLDOWN):.0f}s")
+            elif status == 200 and member.remaining is not None and 'remaining' not in limits:
+                member.remaining = max(0, member.remaining - 1)
+
+    def summary(self):
+        """One line per member for show_config and the end of batch runs"""
+        now = time.monotonic()
+        lines = []
+        for member in self.members:
+            state = ("rejected" if member.disabled else
+                     f"cooling {member.cooling_until - now:.0f}s" if not member.usable(now) else "ready")
+            average = f"{member.latency / member.calls:.1f}s" if member.calls else "-"
+            quota = member.remaining if member.remaining is not None else "?"
+            lines.append(f"  {member.label:<40} {state:<12} quota {quota:>5}  calls {member.calls:>4}  "
+                         f"errors {member.errors:>3}  429s {member.rate_limited:>3}  avg {average}")
+        return lines
+
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+
+
+def key_pool():
+    """The process-wide pool, rebuilt when the key/endpoint settings change"""
+    global _pool, _pool_config
+    config = tuple(pool_entries())
+    with _pool_lock:
+        if _pool is None or config != _pool_config:
+            _pool = KeyPool(config)
+            _pool_config = config
+        return _pool
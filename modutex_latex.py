@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - LaTeX Validator
+Fast in-process tokenizer that checks AI output before it is written to sections/
+"""
+
+import re
+from collections import namedtuple
+
+Token = namedtuple("Token", "kind value line")
+Issue = namedtuple("Issue", "kind line message")
+
+# Environments whose bodies are not LaTeX and must not be tokenized
+VERBATIM_ENVS = {"verbatim", "verbatim*", "lstlisting", "minted", "comment"}
+
+# Commands that belong in main.tex, never inside a section file
+PREAMBLE_COMMANDS = {"documentclass", "usepackage"}
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<env>\\(?:begin|end)\s*\{[^{}]*\})"
+    r"|(?P<verb>\\verb\*?(?P<delim>[^A-Za-z\s*]).*?(?P=delim))"
+    r"|(?P<command>\\(?:[A-Za-z@]+\*?|.))"
+    r"|(?P<comment>%[^\n]*)"
+    r"|(?P<display>\$\$)"
+    r"|(?P<math>\$)"
+    r"|(?P<brace>[{}])"
+    r"|(?P<par>\n[ \t]*\n)"
+    r"|(?P<fence>^[ \t]*```[^\n]*)",
+    re.MULTILINE
+)
+ENV_NAME = re.compile(r"\\(begin|end)\s*\{([^{}]*)\}")
+
+
+def tokenize(text):
+    """Split LaTeX source into structural tokens (plain text is skipped)"""
+    tokens = []
+    line = 1
+    position = 0
+    while True:
+        match = TOKEN_PATTERN.search(text, position)
+        if not match:
+            break
+        line += text.count("\n", position, match.start())
+        kind = match.lastgroup if match.lastgroup != "delim" else "verb"
+        value = match.group(0)
+        position = match.end()
+
+        if kind == "env":
+            action, name = ENV_NAME.match(value).groups()
+            kind, value = action, name.strip()
+        tokens.append(Token(kind, value, line))
+        line += match.group(0).count("\n")
+
+        if kind == "begin" and value in VERBATIM_ENVS:
+            # Jump straight to the matching \end without tokenizing the body
+            end = re.compile(r"\\end\s*\{" + re.escape(value) + r"\}").search(text, position)
+            stop = end.start() if end else len(text)
+            line += text.count("\n", position, stop)
+            position = stop
+    return tokens
+
+
+def validate_latex(text, forbid_sections=True):
+    """Return a list of Issues: unbalanced braces/math, mismatched environments,
+    markdown fences, preamble leakage and (optionally) forbidden section headers"""
+    issues = []
+    braces = []        # line numbers of open braces
+    environments = []  # (name, line) of open \begin
+    math_open = None   # line where an inline $ opened
+    display_open = None
+
+    for token in tokenize(text):
+        if token.kind == "par":
+            # A blank line ends the paragraph - inline math cannot span it
+            if math_open is not None:
+                issues.append(Issue("math", math_open, "Unclosed inline math '$'"))
+                math_open = None
+        elif token.kind == "fence":
+            issues.append(Issue("fence", token.line, "Markdown code fence in LaTeX output"))
+        elif token.kind == "brace":
+            if token.value == "{":
+                braces.append(token.line)
+            elif braces:
+                braces.pop()
+            else:
+                issues.append(Issue("brace", token.line, "Unmatched closing brace '}'"))
+        elif token.kind == "begin":
+            if token.value == "document":
+                issues.append(Issue("preamble", token.line, "\\begin{document} inside a section"))
+            else:
+                environments.append((token.value, token.line))
+        elif token.kind == "end":
+            if token.value == "document":
+                issues.append(Issue("preamble", token.line, "\\end{document} inside a section"))
+            elif environments and environments[-1][0] == token.value:
+                environments.pop()
+            elif any(name == token.value for name, _ in environments):
+                name, line = environments.pop()
+                issues.append(Issue("environment", token.line,
+                                    f"\\end{{{token.value}}} closes \\begin{{{name}}} from line {line}"))
+                while environments and environments[-1][0] != token.value:
+                    environments.pop()
+                if environments:
+                    environments.pop()
+            else:
+                issues.append(Issue("environment", token.line, f"\\end{{{token.value}}} without \\begin"))
+        elif token.kind == "display":
+            display_open = None if display_open is not None else token.line
+        elif token.kind == "math":
+            math_open = None if math_open is not None else token.line
+        elif token.kind == "command":
+            name = token.value[1:].rstrip("*")
+            if name in PREAMBLE_COMMANDS:
+                issues.append(Issue("preamble", token.line, f"\\{name} inside a section"))
+            elif forbid_sections and name == "section":
+                issues.append(Issue("section", token.line, "\\section header is not allowed here"))
+
+    for line in braces:
+        issues.append(Issue("brace", line, "Unclosed brace '{'"))
+    for name, line in environments:
+        issues.append(Issue("unclosed", line, f"\\begin{{{name}}} is never closed"))
+    if math_open is not None:
+        issues.append(Issue("math", math_open, "Unclosed inline math '$'"))
+    if display_open is not None:
+        issues.append(Issue("math", display_open, "Unclosed display math '$$'"))
+
+    return sorted(issues, key=lambda issue: issue.line)
+
+
+def strip_code_fences(text):
+    """Remove markdown code fences; keeps only the fenced block when there is one.
+    Returns (text, fix description or None)."""
+    fenced = re.search(r"^[ \t]*```[^\n]*\n(.*?)^[ \t]*```[ \t]*$", text, re.MULTILINE | re.DOTALL)
+    if fenced:
+        return fenced.group(1), "removed markdown code fence"
+    if re.search(r"^[ \t]*```", text, re.MULTILINE):
+        return re.sub(r"^[ \t]*```[^\n]*\n?", "", text, flags=re.MULTILINE), "removed stray code fence"
+    return text, None
+
+
+def repair_latex(text, forbid_sections=True):
+    """Apply cheap deterministic repairs. Returns (text, list of fix descriptions)."""
+    fixes = []
+
+    # Keep only the fenced block when the model wrapped its answer in markdown
+    text, fix = strip_code_fences(text)
+    if fix:
+        fixes.append(fix)
+
+    # Full documents: keep only the body
+    body = re.search(r"\\begin\s*\{document\}(.*?)(?:\\end\s*\{document\}|\Z)", text, re.DOTALL)
+    if body:
+        text = re.sub(r"^\s*\\maketitle\s*$", "", body.group(1), flags=re.MULTILINE)
+        fixes.append("stripped document preamble")
+    elif re.search(r"^\s*\\(?:documentclass|usepackage)\b", text, re.MULTILINE):
+        text = re.sub(r"^\s*\\(?:documentclass|usepackage)\b[^\n]*\n?", "", text, flags=re.MULTILINE)
+        fixes.append("removed preamble commands")
+
+    if forbid_sections:
+        text, count = re.subn(r"^[ \t]*\\section\*?\s*\{[^{}\n]*\}[ \t]*\n?", "", text, flags=re.MULTILINE)
+        if count:
+            fixes.append(f"removed {count} \\section header(s)")
+
+    # Environments left open at the very end: close them in reverse order
+    issues = validate_latex(text, forbid_sections)
+    open_envs = [issue for issue in issues if issue.kind == "unclosed"]
+    if open_envs and not any(issue.kind == "environment" for issue in issues):
+        names = [re.search(r"\\begin\{(.*)\}", issue.message).group(1) for issue in open_envs]
+        text = text.rstrip() + "\n" + "".join(f"\\end{{{name}}}\n" for name in reversed(names))
+        fixes.append(f"closed {len(names)} unclosed environment(s)")
+
+    return text.strip() + "\n", fixes
+
+
+def broken_regions(text, issues, max_lines=60):
+    """Group issue lines into small (start, end) line ranges (1-based, inclusive)
+    extended to the surrounding paragraph, so only those get re-sent to the model"""
+    lines = text.split("\n")
+    regions = []
+    for issue in issues:
+        start = end = min(max(issue.line, 1), len(lines))
+        # Environment problems span from their \begin
+        reference = re.search(r"from line (\d+)", issue.message)
+        if reference:
+            start = min(start, int(reference.group(1)))
+        while start > 1 and lines[start - 2].strip() and end - start < max_lines:
+            start -= 1
+        while end < len(lines) and lines[end].strip() and end - start < max_lines:
+            end += 1
+        if regions and start <= regions[-1][1] + 1:
+            regions[-1] = (min(start, regions[-1][0]), max(end, regions[-1][1]))
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def replace_lines(text, start, end, replacement):
+    """Replace lines start..end (1-based, inclusive) with the replacement text"""
+    lines = text.split("\n")
+    return "\n".join(lines[:start - 1] + replacement.rstrip("\n").split("\n") + lines[end:])
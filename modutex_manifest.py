@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Document Manifest
+document.json describes which sections main.tex includes, in what order, grouped
+into chapters or parts, with per-section options
+"""
+
+import json
+import re
+from pathlib import Path
+
+from modutex_index import SectionIndex
+
+MANIFEST_FILE = Path("document.json")
+
+# main.tex lines between these markers are owned by ModuTex
+BEGIN_MARKER = "% === Auto-generated section includes ==="
+END_MARKER = "% === End of section includes ==="
+
+# Used when there is no document.json (common academic order)
+DEFAULT_ORDER = [
+    'abstract', 'introduction', 'literature_review', 'related_work',
+    'methodology', 'method', 'approach', 'implementation',
+    'results', 'evaluation', 'experiments', 'analysis',
+    'discussion', 'conclusion', 'future_work', 'acknowledgments'
+]
+
+# A hand-written "\section{Title}" directly followed by "\input{sections/name}"
+TITLED_INCLUDE = re.compile(r"^[ \t]*\\section(\*?)\{([^}]*)\}[ \t]*\n(?:[ \t]*(?:%[^\n]*)?\n)*"
+                            r"[ \t]*\\(?:input|include)\{sections/([^}]*)\}[ \t]*$", re.MULTILINE)
+
+# Any hand-written section include, with its header and the comment line above it
+LEGACY_INCLUDE = re.compile(r"(?:^[ \t]*%[^\n]*\n)?(?:^[ \t]*\\section\*?\{[^}]*\}[ \t]*\n(?:[ \t]*(?:%[^\n]*)?\n)*)?"
+                            r"^[ \t]*\\(?:input|include)\{sections/[^}]*\}[ \t]*(?:\n|$)"
+                            r"|^[ \t]*%[^\n]*(?:Sections will be automatically inserted here|"
+                            + re.escape(BEGIN_MARKER[2:]) + r")[^\n]*(?:\n|$)", re.MULTILINE)
+
+# Classes that have \chapter; other classes group with \part
+CHAPTER_CLASSES = {"report", "book", "memoir", "scrbook", "scrreprt"}
+
+
+def section_names():
+    """Every section file as a name relative to sections/ (e.g. 'background/related_work')"""
+    index = SectionIndex()
+    return [path.relative_to(index.sections_dir).with_suffix("").as_posix()
+            for path in index.section_files()]
+
+
+def inline_titles(main_text):
+    """{name: (title, numbered)} for sections main.tex gives a hand-written \\section header"""
+    return {name: (title.strip(), not star) for star, title, name in TITLED_INCLUDE.findall(main_text)}
+
+
+def default_manifest(order=None, titles=None, only=False):
+    """Manifest equivalent to the old behaviour: known names first, then alphabetical.
+    `titles` (from inline_titles) become per-section title options; with `only`, just
+    the sections named in `order` are listed."""
+    def priority(name):
+        base = name.rsplit("/", 1)[-1].lower()
+        if order and base in order:
+            return order.index(base) - len(order)  # Explicit order wins
+        if base in DEFAULT_ORDER:
+            return DEFAULT_ORDER.index(base)
+        return 1000  # Unknown sections go at the end
+    titles = titles or {}
+    entries = []
+    names = section_names()
+    if only:
+        names = [name for name in names if name.rsplit("/", 1)[-1] in (order or [])]
+    for name in sorted(names, key=lambda name: (priority(name), name)):
+        if name in titles:
+            title, numbered = titles[name]
+            entries.append({'file': name, 'title': title} if numbered else
+                           {'file': name, 'title': title, 'numbered': False})
+        else:
+            entries.append(name)
+    return {'sections': entries}
+
+
+def load_manifest():
+    """The project's document.json, or None if it has none"""
+    if not MANIFEST_FILE.exists():
+        return None
+    try:
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding='utf-8'))
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] {MANIFEST_FILE} is not valid JSON: {e}")
+        return None
+    if isinstance(manifest, list):
+        manifest = {'sections': manifest}
+    return manifest
+
+
+def save_manifest(manifest):
+    MANIFEST_FILE.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding='utf-8')
+
+
+def _entries(items):
+    """Normalize manifest items: plain names become {'file': name}"""
+    for item in items:
+        yield {'file': item} if isinstance(item, str) else item
+
+
+def listed_sections(manifest):
+    """Section names the manifest includes, in document order"""
+    names = []
+    for entry in _entries(manifest.get('sections', [])):
+        if 'sections' in entry:
+            names.extend(listed_sections(entry))
+        elif entry.get('file') and entry.get('enabled', True):
+            names.append(entry['file'])
+    return names
+
+
+def mentioned_sections(items):
+    """Every file named anywhere in the manifest, enabled or not"""
+    names = set()
+    for entry in _entries(items):
+        names |= mentioned_sections(entry['sections']) if 'sections' in entry else {entry.get('file')}
+    return names
+
+
+def add_sections(manifest, names):
+    """Append sections the manifest does not mention yet; returns the names added"""
+    known = mentioned_sections(manifest.get('sections', []))
+    added = [name for name in names if name not in known]
+    manifest.setdefault('sections', []).extend(added)
+    return added
+
+
+def include_lines(manifest, use_include=False, document_class="article"):
+    """The effective include list: every line the manifest puts into main.tex"""
+    command = "\\include" if use_include else "\\input"
+    group_command = "\\chapter" if document_class in CHAPTER_CLASSES else "\\part"
+    existing = set(section_names())
+    lines = []
+
+    def walk(items):
+        for entry in _entries(items):
+            if 'sections' in entry:
+                title = entry.get('chapter') or entry.get('part') or entry.get('title')
+                if title and entry.get('enabled', True):
+                    level = "\\part" if 'part' in entry else group_command
+                    lines.append(f"{level}{{{title}}}")
+                if entry.get('enabled', True):
+                    walk(entry['sections'])
+                continue
+            name = entry.get('file')
+            if not name or not entry.get('enabled', True):
+                continue
+            if name not in existing:
+                print(f"[WARNING] {MANIFEST_FILE}: sections/{name}.tex not found - skipped")
+                continue
+            if entry.get('newpage'):
+                lines.append("\\clearpage")
+            if entry.get('title'):
+                if use_include:
+                    print(f"[WARNING] {name}: \\include starts a new page, so the title \"{entry['title']}\" "
+                          "ends up on its own page - move the \\section into the section file")
+                star = "" if entry.get('numbered', True) else "*"
+                lines.append(f"\\section{star}{{{entry['title']}}}")
+            lines.append(f"{command}{{sections/{name}}}")
+
+    walk(manifest.get('sections', []))
+    return lines
+
+
+def document_class(main_text):
+    match = re.search(r"\\documentclass\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}", main_text)
+    return match.group(1).strip() if match else "article"
+
+
+def uses_include(manifest, main_text):
+    """\\include or \\input: the manifest's "include" setting, else what main.tex uses now"""
+    default = "include" if "\\include{sections/" in main_text else "input"
+    return manifest.get('include', default) == "include"
+
+
+def current_block(main_text):
+    """Lines between the markers in main.tex, or None if it has no generated block"""
+    if BEGIN_MARKER not in main_text or END_MARKER not in main_text:
+        return None
+    block = main_text.split(BEGIN_MARKER, 1)[1].split(END_MARKER, 1)[0]
+    return [line for line in block.strip().splitlines() if line.strip()]
+
+
+def render_block(lines):
+    return BEGIN_MARKER + "\n" + "".join(f"{line}\n" for line in lines) + END_MARKER
+
+
+def insert_block(main_text, lines):
+    """main.tex with its generated block set to lines, or None if there is nowhere to put it"""
+    if current_block(main_text) is not None:
+        before, rest = main_text.split(BEGIN_MARKER, 1)
+        return before + render_block(lines) + rest.split(END_MARKER, 1)[1]
+    if "\\maketitle" not in main_text or "\\bibliographystyle" not in main_text:
+        return None
+
+    # First run: the block replaces the hand-written includes, where the first one was
+    head, body = main_text.split("\\maketitle", 1)
+    body, tail = body.split("\\bibliographystyle", 1)
+    placeholder = "\0"
+    body, count = LEGACY_INCLUDE.subn(placeholder, body)
+    if count:
+        body = body.replace(placeholder, render_block(lines) + "\n", 1).replace(placeholder, "")
+        body = re.sub(r"\n{3,}", "\n\n", body)
+    else:
+        body = body.rstrip() + "\n\n" + render_block(lines) + "\n\n"
+    return head + "\\maketitle" + body + "\\bibliographystyle" + tail
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Mock API Server
+Local stand-in for the OpenAI chat completions and CrossRef APIs with configurable
+latency, streaming, rate limiting and failure injection, for benchmarks and offline tests.
+
+Point ModuTex at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and
+CROSSREF_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+
+PARAGRAPH = ("Recent work has studied this problem from several angles~\\cite{mock2024survey}. "
+             "We summarise the main ideas and relate them to the setting of this paper, "
+             "where efficiency and reproducibility matter as much as accuracy. ")
+
+
+@dataclass
+class MockConfig:
+    """How the mock behaves; every rate is a probability per request"""
+    latency: float = 0.5            # Seconds until the first token
+    jitter: float = 0.1             # Uniform +/- noise on the latency
+    tokens_per_second: float = 400  # Generation speed after the first token
+    completion_tokens: int = 400    # Length of generated answers
+    slow_rate: float = 0.0          # Requests that take slow_factor times longer (tail latency)
+    slow_factor: float = 8.0
+    error_rate: float = 0.0         # HTTP 500
+    rate_limit_rate: float = 0.0    # HTTP 429 at random
+    rpm: int = 0                    # Requests per minute per API key (0 = unlimited)
+    valid_keys: list = field(default_factory=list)  # Empty: any key is accepted
+    models: list = field(default_factory=lambda: ["gpt-4", "gpt-4-turbo", "gpt-3.5-turbo"])
+    crossref_latency: float = 0.2
+    seed: int = None
+
+
+def mock_completion(system_prompt, user_prompt, tokens):
+    """An answer of about `tokens` tokens that passes ModuTex's output checks"""
+    if "JSON object" in system_prompt:
+        match = re.search(r"Plan (\d+)", user_prompt)
+        count = int(match.group(1)) if match else 5
+        return json.dumps({'sections': [{'name': f"mock_section_{index}", 'title': f"Mock Section {index}",
+                                         'prompt': "Describe one aspect of the topic."}
+                                        for index in range(1, count + 1)]})
+    if "syntax fixer" in system_prompt:
+        return user_prompt.split("Excerpt:\n", 1)[-1]
+    parts = ["\\subsection{Overview}"]
+    while sum(len(part) for part in parts) < tokens * 4:
+        parts.append(PARAGRAPH * 2)
+    parts.append("\\begin{equation}\n    y = f(x) + \\epsilon\n\\end{equation}")
+    return "\n\n".join(parts)
+
+
+def mock_bibtex(doi):
+    key = "mock" + re.sub(r"[^A-Za-z0-9]", "", doi)[-12:]
+    return (f"@article{{{key},\n  title={{Mock Article for {doi}}},\n  author={{Doe, Jane and Roe, Richard}},\n"
+            f"  journal={{Journal of Benchmarks}},\n  volume={{1}},\n  pages={{1--10}},\n  year={{2024}},\n"
+            f"  doi={{{doi}}}\n}}")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Quiet: benchmarks make thousands of requests
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, kind, headers=None):
+        self._send(status, json.dumps({'error': {'message': message, 'type': kind}}), headers=headers)
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        if path.rstrip("/").endswith("/models"):
+            data = [{'id': name, 'object': "model", 'owned_by': "mock"} for name in server.config.models]
+            self._send(200, json.dumps({'object': "list", 'data': data}))
+            return
+        match = re.match(r"^/works/(.+)/transform/application/x-bibtex$", path)
+        if not match:
+            self._send(404, "Not found", "text/plain")
+            return
+        server.count("crossref")
+        time.sleep(max(0.0, server.config.crossref_latency))
+        doi = match.group(1)
+        if "missing" in doi or server.roll(server.config.error_rate):
+            self._send(404, "Resource not found.", "text/plain")
+            return
+        self._send(200, mock_bibtex(doi), "application/x-bibtex")
+
+    def do_POST(self):
+        server = self.server
+        config = server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._error(400, "Invalid JSON body", "invalid_request_error")
+            return
+        if not self.path.split("?", 1)[0].rstrip("/").endswith("/chat/completions"):
+            self._send(404, "Not found", "text/plain")
+            return
+
+        key = re.sub(r"^Bearer\s+", "", self.headers.get("Authorization", "")).strip()
+        server.count("chat")
+        if config.valid_keys and key not in config.valid_keys:
+            self._error(401, "Incorrect API key provided", "invalid_request_error")
+            return
+        remaining = server.take_quota(key)
+        limit_headers = {}
+        if config.rpm:
+            limit_headers = {"x-ratelimit-limit-requests": config.rpm,
+                             "x-ratelimit-remaining-requests": max(remaining, 0)}
+        if remaining < 0 or server.roll(config.rate_limit_rate):
+            server.count("429")
+            self._error(429, "Rate limit reached", "requests", headers={"Retry-After": 1, **limit_headers})
+            return
+        if request.get('model') not in config.models:
+            self._error(404, f"The model '{request.get('model')}' does not exist", "invalid_request_error")
+            return
+
+        delay = config.latency + server.uniform(-config.jitter, config.jitter)
+        if server.roll(config.slow_rate):
+            delay *= config.slow_factor
+        if server.roll(config.error_rate):
+            time.sleep(max(0.0, delay))
+            server.count("500")
+            self._error(500, "The server had an error while processing your request", "server_error")
+            return
+
+        messages = request.get('messages', [])
+        system_prompt = next((m['content'] for m in messages if m.get('role') == "system"), "")
+        user_prompt = next((m['content'] for m in reversed(messages) if m.get('role') == "user"), "")
+        content = mock_completion(system_prompt, user_prompt,
+                                  min(config.completion_tokens, request.get('max_tokens') or config.completion_tokens))
+        usage = {'prompt_tokens': (len(system_prompt) + len(user_prompt)) // 4 + 1,
+                 'completion_tokens': len(content) // 4 + 1}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        generation = usage['completion_tokens'] / config.tokens_per_second if config.tokens_per_second else 0
+        headers = {"openai-processing-ms": int((max(0.0, delay) + generation) * 1000), **limit_headers}
+
+        time.sleep(max(0.0, delay))
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self._stream(request.get('model'), content, generation, headers, usage if include_usage else None)
+        else:
+            time.sleep(generation)
+            body = {'id': f"chatcmpl-mock{server.count('ok')}", 'object': "chat.completion",
+                    'created': int(time.time()), 'model': request.get('model'),
+                    'choices': [{'index': index, 'message': {'role': "assistant", 'content': content},
+                                 'finish_reason': "stop"} for index in range(max(1, request.get('n') or 1))],
+                    'usage': usage}
+            self._send(200, json.dumps(body), headers=headers)
+
+    def _stream(self, model, content, generation, headers, usage=None):
+        """Server-sent events, one chunk per ~20 characters, paced at tokens_per_second;
+        with stream_options.include_usage a last chunk carries the token usage"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        pieces = [content[index:index + 20] for index in range(0, len(content), 20)]
+        pause = generation / len(pieces) if pieces else 0
+        identifier = f"chatcmpl-mock{self.server.count('ok')}"
+        try:
+            for piece in pieces:
+                chunk = {'id': identifier, 'object': "chat.completion.chunk", 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                time.sleep(pause)
+            if usage:
+                chunk = {'id': identifier, 'object': "chat.completion.chunk", 'model': model,
+                         'choices': [], 'usage': usage}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client cancelled (e.g. a hedged request that lost)
+
+    def _chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    """The mock API on 127.0.0.1; use start()/stop() to run it inside another program"""
+    daemon_threads = True
+
+    def __init__(self, config=None, port=DEFAULT_PORT):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.config = config or MockConfig()
+        self.counts = defaultdict(int)
+        self._requests = defaultdict(deque)  # API key -> recent request times
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up early (cancelled hedges, timeouts) are expected
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def roll(self, rate):
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def uniform(self, low, high):
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+            return self.counts[name]
+
+    def take_quota(self, key):
+        """Requests left for this key in the current minute (negative: over the limit)"""
+        if not self.config.rpm:
+            return 1
+        now = time.monotonic()
+        with self._lock:
+            window = self._requests[key]
+            while window and now - window[0] > 60:
+                window.popleft()
+            window.append(now)
+            return self.config.rpm - len(window)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ModuTex mock OpenAI/CrossRef server")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds to first token (default: 0.5)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Latency noise in seconds (default: 0.1)')
+    parser.add_argument('--tokens-per-second', type=float, default=400, help='Generation speed (default: 400)')
+    parser.add_argument('--completion-tokens', type=int, default=400, help='Answer length (default: 400)')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of requests that are very slow')
+    parser.add_argument('--slow-factor', type=float, default=8.0, help='How much slower those are (default: 8)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of HTTP 500 answers')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of random HTTP 429 answers')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute per key, then 429 (default: unlimited)')
+    parser.add_argument('--keys', help='Comma-separated accepted API keys (others get 401)')
+    parser.add_argument('--models', help='Comma-separated model names to serve')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible failure injection')
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                        completion_tokens=args.completion_tokens, slow_rate=args.slow_rate,
+                        slow_factor=args.slow_factor, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, rpm=args.rpm,
+                        valid_keys=args.keys.split(",") if args.keys else [], seed=args.seed)
+    if args.models:
+        config.models = [name.strip() for name in args.models.split(",")]
+    server = MockServer(config, args.port)
+    print(f"[MOCK] Serving on {server.url} - set OPENAI_BASE_URL={server.url}/v1 and CROSSREF_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[MOCK] Stopped")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
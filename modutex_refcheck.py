@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Reference Check
+Static check of labels, references and citations across the indexed sections,
+main.tex and the .bib files, without running LaTeX
+"""
+
+from pathlib import Path
+
+from modutex_bib import bib_files_for, load_bibliography
+from modutex_index import load_index, scan_section
+
+
+def check_document(main_file="main.tex", index=None):
+    """Static reference/citation check over the indexed sections, main.tex and the .bib files.
+
+    Returns {'errors': [...], 'warnings': [...]} of human-readable messages.
+    """
+    index = index or load_index()
+    main_path = Path(main_file)
+    main_scan = scan_section(main_path.read_text(encoding='utf-8', errors='replace')) if main_path.exists() else None
+
+    labels = index.labels()
+    refs = {}
+    cites = {}
+    for entry in index.sections():
+        for key in entry['refs']:
+            refs.setdefault(key, []).append(entry['name'])
+        for key in entry['cites']:
+            cites.setdefault(key, []).append(entry['name'])
+    if main_scan:
+        for label in main_scan['labels']:
+            labels.setdefault(label, []).append(main_path.stem)
+        for key in main_scan['refs']:
+            refs.setdefault(key, []).append(main_path.stem)
+        for key in main_scan['cites']:
+            cites.setdefault(key, []).append(main_path.stem)
+
+    bib_entries = {}
+    errors = []
+    warnings = []
+    for path in bib_files_for(main_file):
+        if not path.exists():
+            errors.append(f"Bibliography file not found: {path}")
+    for entry in load_bibliography(bib_files_for(main_file)):
+        if entry.key in bib_entries:
+            first = bib_entries[entry.key]
+            errors.append(f"Duplicate bib key '{entry.key}' ({first.file}:{first.line} and {entry.file}:{entry.line})")
+        else:
+            bib_entries[entry.key] = entry
+
+    for label, names in sorted(labels.items()):
+        if len(names) > 1:
+            errors.append(f"Duplicate label '{label}' in {', '.join(names)}")
+    for key, names in sorted(refs.items()):
+        if key not in labels:
+            errors.append(f"Undefined reference '{key}' in {', '.join(sorted(set(names)))}")
+    for key, names in sorted(cites.items()):
+        if key != "*" and key not in bib_entries:
+            errors.append(f"Undefined citation '{key}' in {', '.join(sorted(set(names)))}")
+
+    if "*" not in cites:
+        for key, entry in bib_entries.items():
+            if key not in cites:
+                warnings.append(f"Unused bib entry '{key}' ({entry.file}:{entry.line})")
+
+    return {'errors': errors, 'warnings': warnings}
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Context Retrieval
+Local BM25 index over section paragraphs and bibliography entries, so AI calls get
+the few most relevant passages of the rest of the document instead of all of it
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+from modutex_bib import bib_files_for, load_bib_file
+from modutex_index import load_index, COMMENT, COMMAND
+from modutex_jobs import STATE_DIR
+
+RETRIEVAL_FILE = STATE_DIR / "retrieval.json"
+RETRIEVAL_VERSION = 1
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Shared by every RetrievalIndex, since retrieve_context() creates one per call
+_lock = threading.Lock()
+
+MIN_PARAGRAPH_WORDS = 8
+TERM = re.compile(r"\w{2,}", re.UNICODE)
+STOP_WORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+which with we our can these those their than then also such into using used use may not
+""".split())
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def terms(text):
+    """Lower-cased index terms of a piece of LaTeX, without commands and stop words"""
+    text = COMMAND.sub(" ", COMMENT.sub("", text)).lower()
+    return [term for term in TERM.findall(text) if term not in STOP_WORDS and not term.isdigit()]
+
+
+def section_chunks(text):
+    """Paragraphs of a section worth retrieving"""
+    chunks = []
+    for paragraph in re.split(r"\n[ \t]*\n", COMMENT.sub("", text)):
+        paragraph = paragraph.strip()
+        counts = Counter(terms(paragraph))
+        if sum(counts.values()) >= MIN_PARAGRAPH_WORDS:
+            chunks.append({'text': paragraph, 'terms': dict(counts)})
+    return chunks
+
+
+def bib_chunk(entry):
+    """One bibliography entry as a short retrievable line"""
+    parts = [entry.get('title'), entry.get('author'), entry.get('year')]
+    text = f"{entry.key}: " + " | ".join(part for part in parts if part)
+    searchable = " ".join([text, entry.get('keywords'), entry.get('abstract')])
+    return {'text': text, 'key': entry.key, 'terms': dict(Counter(terms(searchable)))}
+
+
+class RetrievalIndex:
+    """Persistent chunk store keyed by source file, refreshed from content hashes"""
+
+    def __init__(self, index_file=RETRIEVAL_FILE):
+        self.index_file = Path(index_file)
+        self.sources = {}
+        try:
+            data = json.loads(self.index_file.read_text(encoding='utf-8'))
+            if data.get('version') == RETRIEVAL_VERSION:
+                self.sources = data.get('sources', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.sources = {}
+
+    def _save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp file, so parallel commands never rename each other's half-written index
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.index_file.parent,
+                                         suffix=".tmp", delete=False) as partial:
+            json.dump({'version': RETRIEVAL_VERSION, 'sources': self.sources}, partial, ensure_ascii=False)
+        os.replace(partial.name, self.index_file)
+
+    def refresh(self, main_file="main.tex"):
+        """Re-chunk only sections and .bib files that changed; returns how many were updated"""
+        with _lock:
+            current = {}
+            for entry in load_index().sections():
+                current[f"sections/{entry['name']}.tex"] = ('section', entry['name'], entry['hash'])
+            for path in bib_files_for(main_file):
+                if path.exists():
+                    stat = path.stat()
+                    current[path.as_posix()] = ('bib', path.as_posix(), f"{stat.st_mtime}:{stat.st_size}")
+
+            updated = 0
+            for source, (kind, name, stamp) in current.items():
+                stored = self.sources.get(source)
+                if stored and stored['stamp'] == stamp:
+                    continue
+                if kind == 'section':
+                    chunks = section_chunks(Path(source).read_text(encoding='utf-8', errors='replace'))
+                else:
+                    chunks = [bib_chunk(entry) for entry in load_bib_file(source)]
+                self.sources[source] = {'kind': kind, 'name': name, 'stamp': stamp, 'chunks': chunks}
+                updated += 1
+
+            removed = [source for source in self.sources if source not in current]
+            for source in removed:
+                del self.sources[source]
+            if updated or removed:
+                self._save()
+            return updated
+
+    def search(self, query, kind, exclude=None, top_k=5):
+        """BM25 ranking of one kind of chunk ('section' or 'bib'); returns (score, name, chunk)"""
+        candidates = [(source['name'], chunk) for source in self.sources.values()
+                      if source['kind'] == kind and source['name'] != exclude
+                      for chunk in source['chunks']]
+        query_terms = set(terms(query))
+        if not candidates or not query_terms:
+            return []
+
+        lengths = [sum(chunk['terms'].values()) for _, chunk in candidates]
+        average = sum(lengths) / len(lengths)
+        frequency = Counter(term for _, chunk in candidates for term in chunk['terms'] if term in query_terms)
+        scored = []
+        for (name, chunk), length in zip(candidates, lengths):
+            score = 0.0
+            for term in query_terms & chunk['terms'].keys():
+                idf = math.log(1 + (len(candidates) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                count = chunk['terms'][term]
+                score += idf * count * (K1 + 1) / (count + K1 * (1 - B + B * length / average))
+            if score > 0:
+                scored.append((score, name, chunk))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:top_k]
+
+
+def retrieve_context(query, exclude=None, token_budget=600, top_k=6, main_file="main.tex"):
+    """Most relevant paragraphs from other sections and bib entries, within a token budget"""
+    index = RetrievalIndex()
+    index.refresh(main_file)
+
+    lines = []
+    used = 0
+    passages = index.search(query, 'section', exclude=exclude, top_k=top_k)
+    entries = index.search(query, 'bib', top_k=top_k)
+    # Bibliography lines are short; give them at most a quarter of the budget
+    bib_budget = token_budget // 4
+
+    bib_lines = []
+    for _, _, chunk in entries:
+        line = f"- {chunk['text']}"
+        if used + estimate_tokens(line) > bib_budget:
+            break
+        bib_lines.append(line)
+        used += estimate_tokens(line)
+
+    passage_lines = []
+    for _, name, chunk in passages:
+        text = f"[{name}] {chunk['text']}"
+        if used + estimate_tokens(text) > token_budget:
+            continue
+        passage_lines.append(text)
+        used += estimate_tokens(text)
+
+    if passage_lines:
+        lines.append("Relevant passages from other sections (keep terminology and notation consistent):")
+        lines.extend(passage_lines)
+    if bib_lines:
+        lines.append("Relevant bibliography entries (cite with these keys):")
+        lines.extend(bib_lines)
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Model Routing
+Picks the fastest adequate model for each AI call from the task type, the prompt size
+and the latency/error rates observed in the usage statistics
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from modutex_stats import model_health
+
+# tier: relative quality (higher is better); context: prompt + completion tokens;
+# speed: expected latency rank before any calls have been measured (lower is faster)
+MODEL_PROFILES = {
+    "gpt-3.5-turbo": {'tier': 1, 'context': 16385, 'speed': 1},
+    "gpt-4-turbo": {'tier': 2, 'context': 128000, 'speed': 2},
+    "gpt-4": {'tier': 3, 'context': 8192, 'speed': 3},
+}
+UNKNOWN_PROFILE = {'tier': 2, 'context': 8192, 'speed': 2}
+
+# Lowest tier each task needs: mechanical formatting/repairs vs. writing and planning
+TASK_TIERS = {
+    'fix_syntax': 1,
+    'text_to_latex': 1,
+    'outline': 2,
+    'autofix': 2,
+    'add_section': 2,
+    'edit_section': 2,
+}
+ROUTED_TASKS = tuple(TASK_TIERS)
+
+# Prompts above this size need at least tier 2, even for formatting tasks
+LARGE_PROMPT_TOKENS = 3000
+
+# A model with fewer recent samples is ranked by its speed prior
+MIN_SAMPLES = 5
+# Models failing more often than this recently are skipped while others are adequate
+MAX_ERROR_RATE = 0.3
+# How long observed statistics are reused before the store is read again
+HEALTH_TTL = 60
+
+_health = {'expires': 0.0, 'data': {}}
+_health_lock = threading.Lock()
+
+
+def routing_enabled():
+    """MODUTEX_ROUTING=on turns routing on; otherwise every call not forced per task goes
+    to OPENAI_MODEL, so an existing model choice is never overridden silently"""
+    return os.environ.get('MODUTEX_ROUTING', 'off').lower() in ('on', 'auto', '1', 'true', 'yes')
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def override_key(task):
+    return f"MODUTEX_MODEL_{task.upper()}"
+
+
+def task_override(task):
+    """Model forced for a task in .env (MODUTEX_MODEL_ADD_SECTION=gpt-4), or None"""
+    model = os.environ.get(override_key(task), "").strip()
+    return model if model and model.lower() != "auto" else None
+
+
+def recent_health():
+    """{model: {'samples', 'p50', 'error_rate'}}, cached for HEALTH_TTL seconds"""
+    with _health_lock:
+        if time.monotonic() >= _health['expires']:
+            try:
+                _health['data'] = model_health()
+            except Exception:
+                _health['data'] = {}
+            _health['expires'] = time.monotonic() + HEALTH_TTL
+        return _health['data']
+
+
+def route_model(task, prompt_tokens, models, default, max_tokens=2500):
+    """(model, reason) for one call of `task` with a prompt of about `prompt_tokens` tokens.
+
+    Candidates are the models that reach the task's tier and fit the prompt; among
+    them the one with the lowest recent median latency wins (speed prior without data),
+    skipping models whose recent error rate is high while another candidate is healthy.
+    """
+    override = task_override(task) if task else None
+    if override:
+        if override in models:
+            return override, f"{override_key(task)} in .env"
+        print(f"[WARNING] {override_key(task)}={override} is not an available model - routing instead")
+    if task not in TASK_TIERS or not routing_enabled():
+        return default, "OPENAI_MODEL"
+
+    tier = TASK_TIERS[task]
+    if prompt_tokens > LARGE_PROMPT_TOKENS:
+        tier = max(tier, 2)
+    profiles = {model: MODEL_PROFILES.get(model, UNKNOWN_PROFILE) for model in models}
+    fitting = [model for model in models if prompt_tokens + max_tokens <= profiles[model]['context']]
+    if not fitting:
+        return max(models, key=lambda model: profiles[model]['context']), "largest context window"
+    adequate = [model for model in fitting if profiles[model]['tier'] >= tier]
+    if not adequate:
+        return max(fitting, key=lambda model: profiles[model]['tier']), "best model that fits the prompt"
+
+    health = recent_health()
+
+    def measured(model):
+        stats = health.get(model)
+        return stats if stats and stats['samples'] >= MIN_SAMPLES else None
+
+    healthy = [model for model in adequate
+               if not measured(model) or measured(model)['error_rate'] <= MAX_ERROR_RATE]
+    candidates = healthy or adequate
+    # Measured models compare by median latency; unmeasured ones keep their prior order
+    if all(measured(model) for model in candidates):
+        chosen = min(candidates, key=lambda model: measured(model)['p50'])
+        reason = f"fastest of {len(candidates)} adequate, p50 {measured(chosen)['p50']:.1f}s"
+    else:
+        chosen = min(candidates, key=lambda model: (profiles[model]['speed'], profiles[model]['tier']))
+        reason = f"fastest adequate for tier {tier}"
+    if len(candidates) < len(adequate):
+        reason += f", skipped {len(adequate) - len(candidates)} failing"
+    return chosen, reason
+
+
+def save_env_value(key, value, env_file=".env"):
+    """Write KEY=value to .env (removing the line for an empty value) and apply it now"""
+    env_file = Path(env_file)
+    lines = env_file.read_text(encoding='utf-8').splitlines() if env_file.exists() else []
+    lines = [line for line in lines if line.split("=", 1)[0].strip() != key]
+    if value:
+        lines.append(f"{key}={value}")
+        os.environ[key] = value
+    else:
+        os.environ.pop(key, None)
+    env_file.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    return True
+
+
+def save_override(task, model, env_file=".env"):
+    """Write MODUTEX_MODEL_<TASK> to .env (removing it for 'auto') and apply it now"""
+    return save_env_value(override_key(task), model if model != "auto" else None, env_file)
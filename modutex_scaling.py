@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Compile Scaling Benchmark
+Generates synthetic projects of increasing size and times update_main_tex, each build
+phase and the sum of all phases at every size, so the cost of a 500-section paper or a
+50,000-entry bibliography is known before a user hits it
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from modutex_bbl import format_bbl
+from modutex_bench import MemoryWatch, git_commit
+from modutex_bib import clear_cache
+from modutex_build import BUILD_DIR, build_pdf, find_engine
+from modutex_index import load_index
+from modutex_refcheck import check_document
+from modutex_jobs import STATE_DIR
+
+RESULTS_FILE = STATE_DIR / "bench" / "scaling.jsonl"
+
+DEFAULT_SECTIONS = (5, 50, 500)
+DEFAULT_BIB_ENTRIES = (100, 5000, 50000)
+
+MAIN_TEMPLATE = """\\documentclass[11pt,a4paper]{article}
+\\usepackage[utf8]{inputenc}
+\\usepackage[T1]{fontenc}
+\\usepackage{amsmath}
+\\usepackage{graphicx}
+\\usepackage{cite}
+
+\\title{Synthetic Scaling Document}
+\\author{ModuTex Benchmark}
+\\date{}
+
+\\begin{document}
+
+\\maketitle
+
+\\bibliographystyle{ieeetr}
+\\bibliography{bib/references}
+
+\\end{document}
+"""
+
+WORDS = ("model", "data", "method", "result", "system", "analysis", "network", "signal", "process",
+         "theory", "design", "control", "sample", "error", "measure", "structure", "estimate", "field")
+SURNAMES = ("Smith", "Nguyen", "Garcia", "Mueller", "Khan", "Rossi", "Tanaka", "Novak", "Silva", "Cohen",
+            "Johansson", "Okafor", "Dubois", "Kowalski", "Haddad", "Larsen")
+GIVEN = ("Alice", "Bo", "Carlos", "Dana", "Emil", "Fatima", "Gao", "Hana", "Ivan", "Julia", "Kofi", "Lena")
+JOURNALS = ("IEEE Transactions on Signal Processing", "Journal of Applied Physics", "Pattern Recognition",
+            "Neural Computation", "Automatica")
+
+
+def _sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _png(width=64, height=48, shade=128):
+    """A small grey PNG, written without Pillow"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes([shade]) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def bib_entry(index, rng):
+    """One synthetic entry of a type the built-in ieeetr formatter handles (ASCII names)"""
+    authors = " and ".join(f"{rng.choice(SURNAMES)}, {rng.choice(GIVEN)}"
+                           for _ in range(rng.randint(1, 4)))
+    title = _sentence(rng, rng.randint(4, 9)).rstrip(".")
+    year = rng.randint(1990, 2025)
+    kind = ("article", "inproceedings", "book")[index % 3]
+    first_page = rng.randint(1, 900)
+    fields = {'author': authors, 'title': title, 'year': year}
+    if kind == "article":
+        fields.update(journal=rng.choice(JOURNALS), volume=rng.randint(1, 80), number=rng.randint(1, 12),
+                      pages=f"{first_page}--{first_page + rng.randint(5, 20)}")
+    elif kind == "inproceedings":
+        fields.update(booktitle=f"Proceedings of the {rng.choice(WORDS).title()} Conference",
+                      address="Boston, MA", pages=f"{first_page}--{first_page + 8}")
+    else:
+        fields.update(publisher="Springer", address="New York")
+    body = ",\n".join(f"  {name} = {{{value}}}" for name, value in fields.items())
+    return f"@{kind}{{synthetic{index},\n{body}\n}}\n"
+
+
+def section_text(index, rng, equations, figures, citations, bib_entries, figure_count):
+    """A section with paragraphs, numbered equations, figures and citations"""
+    parts = [f"\\subsection{{Part {index + 1}}}\n\\label{{sec:synthetic{index}}}\n"]
+    for item in range(max(equations, figures, citations, 1)):
+        paragraph = " ".join(_sentence(rng) for _ in range(3))
+        if item < citations and bib_entries:
+            paragraph += f" See \\cite{{synthetic{rng.randrange(bib_entries)}}}."
+        parts.append(paragraph + "\n")
+        if item < equations:
+            parts.append(f"\\begin{{equation}}\n  x_{{{item}}} = \\sum_{{k=1}}^{{n}} \\frac{{a_k}}{{k^{{{item + 2}}}}}"
+                         f"\n  \\label{{eq:s{index}e{item}}}\n\\end{{equation}}\n")
+        if item < figures and figure_count:
+            figure = (index * figures + item) % figure_count
+            parts.append(f"\\begin{{figure}}[h]\n  \\centering\n"
+                         f"  \\includegraphics[width=0.5\\textwidth]{{figures/synthetic_{figure}.png}}\n"
+                         f"  \\caption{{Synthetic figure {figure}.}}\n\\end{{figure}}\n")
+    if index:
+        parts.append(f"As shown in Section~\\ref{{sec:synthetic{index - 1}}}, the trend holds.\n")
+    return "\n".join(parts)
+
+
+def generate_project(directory, sections=5, bib_entries=100, equations=2, figures=1, citations=3,
+                     figure_files=10, seed=1):
+    """Write a synthetic ModuTex project (main.tex, sections/, bib/, figures/) into directory.
+
+    main.tex has no includes yet, so update_main_tex does the real work on the first run.
+    """
+    rng = random.Random(seed)
+    directory = Path(directory)
+    for name in ("sections", "bib", "figures"):
+        (directory / name).mkdir(parents=True, exist_ok=True)
+    (directory / "main.tex").write_text(MAIN_TEMPLATE, encoding='utf-8')
+
+    figure_count = figure_files if figures else 0
+    for figure in range(figure_count):
+        (directory / "figures" / f"synthetic_{figure}.png").write_bytes(_png(shade=40 + figure * 7 % 200))
+    for index in range(sections):
+        (directory / "sections" / f"part_{index:04d}.tex").write_text(
+            section_text(index, rng, equations, figures, citations, bib_entries, figure_count), encoding='utf-8')
+    with open(directory / "bib" / "references.bib", 'w', encoding='utf-8') as f:
+        for index in range(bib_entries):
+            f.write(bib_entry(index, rng) + "\n")
+    return directory
+
+
+def write_aux(aux_file, index):
+    """The citation part of the .aux LaTeX would write, so the .bbl can be timed without LaTeX"""
+    cited = []
+    for entry in index.sections():
+        cited.extend(key for key in entry['cites'] if key not in cited)
+    aux_file.parent.mkdir(parents=True, exist_ok=True)
+    aux_file.write_text("\\relax\n" + "".join(f"\\citation{{{key}}}\n" for key in cited)
+                        + "\\bibstyle{ieeetr}\n\\bibdata{bib/references}\n", encoding='utf-8')
+
+
+def _timed(timings, phase, function, *args, **kwargs):
+    # Every phase parses the bibliography itself, as it would in a separate command
+    clear_cache()
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+    return value
+
+
+def measure_point(texchat, engine, build=True):
+    """Time every phase on the project in the current directory; returns {phase: seconds}.
+
+    "all phases" is the sum of this harness's steps, not a run_pipeline call.
+    """
+    timings = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not _timed(timings, "update_main", texchat.update_main_tex):
+            raise RuntimeError("update_main_tex failed")
+        _timed(timings, "update_main (no change)", texchat.update_main_tex)
+        index = _timed(timings, "index (cold)", load_index)
+        _timed(timings, "index (warm)", load_index)
+        _timed(timings, "check references", check_document, index=index)
+        write_aux(BUILD_DIR / "scaling" / "main.aux", index)
+        if _timed(timings, "bbl (in-process)", format_bbl, BUILD_DIR / "scaling" / "main.aux") is None:
+            print("[WARNING] The built-in formatter declined the synthetic bibliography")
+        if build:
+            result = _timed(timings, "build (total)", build_pdf, engine=engine, copy_pdf=False, cache=False)
+            for phase, seconds in result.timings:
+                timings[f"build: {phase}"] = timings.get(f"build: {phase}", 0.0) + seconds
+            if not result.success:
+                raise RuntimeError("build failed")
+            _timed(timings, "rebuild (no change)", build_pdf, engine=engine, copy_pdf=False, cache=False)
+    timings["all phases"] = time.perf_counter() - start
+    return {phase: round(seconds, 4) for phase, seconds in timings.items()}
+
+
+def scaling_exponent(points, phase, axis):
+    """Least-squares slope of log(time) over log(size): ~1 is linear, ~2 quadratic"""
+    pairs = [(math.log(point[axis]), math.log(point['phases'][phase])) for point in points
+             if point['phases'].get(phase, 0) > 0 and point[axis] > 0]
+    if len(pairs) < 2:
+        return None
+    mean_x = sum(x for x, _ in pairs) / len(pairs)
+    mean_y = sum(y for _, y in pairs) / len(pairs)
+    spread = sum((x - mean_x) ** 2 for x, _ in pairs)
+    if not spread:
+        return None
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in pairs) / spread, 2)
+
+
+def print_curve(points, axis):
+    """One row per phase with the time at each size, the growth exponent and a bar for the largest size"""
+    phases = list(dict.fromkeys(phase for point in points for phase in point['phases']))
+    sizes = [point[axis] for point in points]
+    largest = max((point['phases'].get(phase, 0) for point in points for phase in phases), default=0)
+    width = max(len(phase) for phase in phases)
+    print(f"\n[SCALING] {axis}: {', '.join(str(size) for size in sizes)}")
+    print(f"  {'phase':<{width}}  " + "  ".join(f"{size:>9}" for size in sizes) + "  exponent")
+    for phase in phases:
+        times = [point['phases'].get(phase) for point in points]
+        exponent = scaling_exponent(points, phase, axis)
+        bar = "#" * round(30 * (times[-1] or 0) / largest) if largest else ""
+        print(f"  {phase:<{width}}  " + "  ".join(f"{seconds:8.3f}s" if seconds is not None else "        -"
+                                               for seconds in times)
+              + f"  {exponent if exponent is not None else '-':>8}  {bar}")
+
+
+def save_plot(report, path):
+    """Log-log scaling curves per axis as an image (needs matplotlib)"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("[WARNING] matplotlib not installed - skipping the plot (pip install matplotlib)")
+        return False
+    axes = [axis for axis in ("sections", "bib_entries") if report['curves'].get(axis)]
+    figure, plots = plt.subplots(1, len(axes), figsize=(6 * len(axes), 4.5), squeeze=False)
+    for plot, axis in zip(plots[0], axes):
+        points = report['curves'][axis]
+        for phase in dict.fromkeys(phase for point in points for phase in point['phases']):
+            series = [(point[axis], point['phases'][phase]) for point in points if point['phases'].get(phase)]
+            if series:
+                plot.plot(*zip(*series), marker="o", label=phase)
+        plot.set_xscale("log")
+        plot.set_yscale("log")
+        plot.set_xlabel(axis.replace("_", " "))
+        plot.set_ylabel("seconds")
+        plot.legend(fontsize=7)
+    figure.tight_layout()
+    figure.savefig(path, dpi=120)
+    print(f"[INFO] Scaling curve saved to {path}")
+    return True
+
+
+def run_scaling(sections=DEFAULT_SECTIONS, bib_entries=DEFAULT_BIB_ENTRIES, equations=2, figures=1,
+                citations=3, engine="pdflatex", build=True, seed=1, label=None, save=True,
+                output=None, plot=None):
+    """Sweep the section count (smallest bibliography) and the bibliography size (fewest sections).
+
+    Each size runs in a fresh scratch project. The report holds one curve per axis and
+    the fitted growth exponent of every phase; it is appended to .modutex/bench/scaling.jsonl.
+    """
+    if build and not find_engine(engine):
+        print(f"[WARNING] {engine} not found - timing update_main, index and bibliography only")
+        build = False
+    project = Path.cwd()
+    # Imported after the working directory is known, like the command-line entry point
+    import texchat
+
+    sweeps = {'sections': [(count, min(bib_entries)) for count in sections],
+              'bib_entries': [(min(sections), count) for count in bib_entries]}
+    report = {'timestamp': time.time(), 'commit': git_commit(project), 'label': label,
+              'settings': {'equations': equations, 'figures': figures, 'citations': citations,
+                           'engine': engine if build else None, 'seed': seed},
+              'curves': {}, 'exponents': {}}
+    measured = {}
+    print(f"[BENCH] Sections {', '.join(map(str, sections))}; bib entries {', '.join(map(str, bib_entries))}"
+          f"{f'; building with {engine}' if build else ''}")
+    for axis, sizes in sweeps.items():
+        points = []
+        for section_count, entry_count in sizes:
+            if (section_count, entry_count) not in measured:
+                workspace = Path(tempfile.mkdtemp(prefix="modutex-scaling-"))
+                memory = MemoryWatch()
+                try:
+                    generate_project(workspace, section_count, entry_count, equations, figures, citations,
+                                     seed=seed)
+                    os.chdir(workspace)
+                    with memory:
+                        phases = measure_point(texchat, engine, build)
+                except RuntimeError as e:
+                    print(f"[ERROR] {section_count} sections / {entry_count} entries: {e}")
+                    phases = {}
+                finally:
+                    os.chdir(project)
+                    shutil.rmtree(workspace, ignore_errors=True)
+                measured[(section_count, entry_count)] = phases
+                memory = memory.stats()
+                print(f"  {section_count:>5} sections  {entry_count:>6} entries  "
+                      f"all phases {phases.get('all phases', 0):7.2f}s"
+                      + (f"  peak RSS {memory['peak_rss_mb']} MB (+{memory['rss_growth_mb']})"
+                         if memory['peak_rss_mb'] is not None else ""))
+            points.append({'sections': section_count, 'bib_entries': entry_count,
+                           'phases': measured[(section_count, entry_count)]})
+        report['curves'][axis] = points
+        report['exponents'][axis] = {phase: scaling_exponent(points, phase, axis)
+                                     for phase in dict.fromkeys(p for point in points for p in point['phases'])}
+
+    for axis, points in report['curves'].items():
+        if len(points) > 1 and any(point['phases'] for point in points):
+            print_curve(points, axis)
+
+    if output:
+        Path(output).write_text(json.dumps(report, indent=1), encoding='utf-8')
+        print(f"[INFO] Report written to {output}")
+    if plot:
+        save_plot(report, plot)
+    if save:
+        RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"[INFO] Results appended to {RESULTS_FILE}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ModuTex compile scaling benchmark on synthetic documents")
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    def content_options(command):
+        command.add_argument('--equations', type=int, default=2, help='Equations per section (default: 2)')
+        command.add_argument('--figures', type=int, default=1, help='Figures per section (default: 1)')
+        command.add_argument('--citations', type=int, default=3, help='Citations per section (default: 3)')
+        command.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+
+    generate_parser = subparsers.add_parser('generate', help='Write one synthetic project')
+    generate_parser.add_argument('directory', help='Target directory')
+    generate_parser.add_argument('--sections', type=int, default=50, help='Number of sections (default: 50)')
+    generate_parser.add_argument('--bib-entries', type=int, default=1000, help='Bibliography size (default: 1000)')
+    content_options(generate_parser)
+
+    run_parser = subparsers.add_parser('run', help='Time every phase across project sizes')
+    run_parser.add_argument('--sections', type=int, nargs='+', default=list(DEFAULT_SECTIONS),
+                            help='Section counts to sweep (default: 5 50 500)')
+    run_parser.add_argument('--bib-entries', type=int, nargs='+', default=list(DEFAULT_BIB_ENTRIES),
+                            help='Bibliography sizes to sweep (default: 100 5000 50000)')
+    content_options(run_parser)
+    run_parser.add_argument('--engine', default="pdflatex", help='LaTeX engine (default: pdflatex)')
+    run_parser.add_argument('--no-build', action='store_true', help='Skip the LaTeX build phases')
+    run_parser.add_argument('--output', help='Also write the report to this JSON file')
+    run_parser.add_argument('--plot', help='Save the scaling curves as an image (needs matplotlib)')
+    run_parser.add_argument('--label', help='Free-form note stored with the results')
+    run_parser.add_argument('--no-save', action='store_true', help=f'Do not append to {RESULTS_FILE}')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        if Path(args.directory).exists() and any(Path(args.directory).iterdir()):
+            print(f"[ERROR] {args.directory} is not empty")
+            sys.exit(1)
+        generate_project(args.directory, args.sections, args.bib_entries, args.equations, args.figures,
+                         args.citations, seed=args.seed)
+        print(f"[SUCCESS] Synthetic project with {args.sections} sections and {args.bib_entries} "
+              f"bib entries written to {args.directory}")
+        sys.exit(0)
+    elif args.command == 'run':
+        report = run_scaling(args.sections, args.bib_entries, args.equations, args.figures, args.citations,
+                             args.engine, not args.no_build, args.seed, args.label, not args.no_save,
+                             args.output, args.plot)
+        sys.exit(0 if report else 1)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
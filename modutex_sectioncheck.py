@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Section Check
+Compiles every section on its own, wrapped in the document preamble, across a process
+pool, so a failing full build can be traced to the sections that break it in seconds
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from modutex_build import BUILD_DIR, detect_engine, find_engine, parse_log_errors
+from modutex_index import load_index
+from modutex_jobs import STATE_DIR
+
+CHECK_DIR = BUILD_DIR / "section-check"
+CHECK_FILE = STATE_DIR / "section_checks.json"
+
+# Bump when the wrapper document changes so every section is checked again
+CHECK_VERSION = 1
+
+# Typeset without writing a PDF: a check only needs the errors
+NO_PDF_FLAGS = {'pdflatex': ["-draftmode"], 'lualatex': ["-draftmode"], 'xelatex': ["-no-pdf"]}
+
+
+def wrapper_source(name, preamble):
+    """A document with main.tex's preamble and a single section"""
+    return f"{preamble}\\begin{{document}}\n\\input{{sections/{name}}}\n\\end{{document}}\n"
+
+
+def check_key(section_hash, preamble, engine):
+    """Changes when the section, the preamble or the engine does"""
+    digest = hashlib.sha256(f"{CHECK_VERSION}|{engine}|{section_hash}\n{preamble}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def check_section(name, source, engine="pdflatex"):
+    """Compile one wrapped section (runs inside a worker process); errors point at the section file"""
+    start = time.perf_counter()
+    job = name.replace("/", "__")
+    work_dir = CHECK_DIR / job
+    work_dir.mkdir(parents=True, exist_ok=True)
+    wrapper = work_dir / f"{job}.tex"
+    wrapper.write_text(source, encoding='utf-8')
+    # Run from the project root so \input{sections/...} and figure paths resolve as in main.tex
+    process = subprocess.run(
+        [engine, "-interaction=nonstopmode", "-halt-on-error", "-file-line-error",
+         *NO_PDF_FLAGS.get(engine, []), f"-output-directory={work_dir}", str(wrapper)],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    report = {'name': name, 'ok': process.returncode == 0, 'seconds': time.perf_counter() - start, 'error': ""}
+    if not report['ok']:
+        log = work_dir / f"{job}.log"
+        errors = parse_log_errors(log.read_text(encoding='utf-8', errors='replace') if log.exists() else process.stdout)
+        if errors:
+            report['error'] = f"{errors[0].file}:{errors[0].line}: {errors[0].message}"
+        else:
+            report['error'] = next((line for line in process.stdout.splitlines() if line.startswith("!")),
+                                   f"{engine} exited with code {process.returncode}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def check_sections(names=None, main_file="main.tex", engine=None, max_workers=None, force=False):
+    """Compile sections standalone in parallel and print a pass/fail table.
+
+    A section is skipped when neither it nor the preamble changed since its last
+    successful check (hashes in .modutex/section_checks.json). Returns the reports.
+    """
+    main_file = Path(main_file)
+    if not main_file.exists():
+        print(f"[ERROR] {main_file} not found!")
+        return []
+    engine = engine or detect_engine(main_file)
+    if not find_engine(engine):
+        print(f"[ERROR] {engine} not found! Please install TeX Live or MiKTeX.")
+        return []
+
+    main_text = main_file.read_text(encoding='utf-8', errors='replace')
+    if "\\begin{document}" not in main_text:
+        print(f"[ERROR] {main_file} has no \\begin{{document}}")
+        return []
+    preamble = main_text.split("\\begin{document}", 1)[0]
+
+    sections = {entry['name']: entry['hash'] for entry in load_index().sections()}
+    if names:
+        unknown = [name for name in names if name not in sections]
+        if unknown:
+            print(f"[ERROR] Unknown section(s): {', '.join(unknown)}")
+            return []
+        sections = {name: sections[name] for name in names}
+    if not sections:
+        print("[INFO] No sections to check")
+        return []
+
+    try:
+        passed = json.loads(CHECK_FILE.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        passed = {}
+    keys = {name: check_key(section_hash, preamble, engine) for name, section_hash in sections.items()}
+    todo = [name for name in sorted(sections) if force or passed.get(name) != keys[name]]
+    reports = {name: {'name': name, 'ok': True, 'skipped': True, 'seconds': 0.0, 'error': ""}
+               for name in sections if name not in todo}
+
+    print(f"[CHECK] Compiling {len(todo)} of {len(sections)} section(s) standalone with {engine}")
+    start = time.perf_counter()
+    if todo:
+        CHECK_DIR.mkdir(parents=True, exist_ok=True)
+        workers = max_workers or min(len(todo), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sources = [wrapper_source(name, preamble) for name in todo]
+            for report in pool.map(check_section, todo, sources, [engine] * len(todo)):
+                reports[report['name']] = report
+    wall_clock = time.perf_counter() - start
+
+    for name in todo:
+        if reports[name]['ok']:
+            passed[name] = keys[name]
+        else:
+            passed.pop(name, None)
+    if not names:
+        # Forget sections that were deleted
+        passed = {name: key for name, key in passed.items() if name in keys}
+    CHECK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CHECK_FILE.write_text(json.dumps(passed, indent=1), encoding='utf-8')
+
+    failed = [report for report in reports.values() if not report['ok']]
+    print(f"\n[SUMMARY] {len(sections) - len(failed)} passed ({len(sections) - len(todo)} unchanged), "
+          f"{len(failed)} failed in {wall_clock:.1f}s")
+    width = max(len(name) for name in sections)
+    for name in sorted(sections):
+        report = reports[name]
+        if report.get('skipped'):
+            print(f"  SKIP  {name:<{width}}      -  unchanged since it last passed")
+        else:
+            status = "PASS" if report['ok'] else "FAIL"
+            print(f"  {status}  {name:<{width}}  {report['seconds']:5.1f}s  {report['error']}".rstrip())
+    return list(reports.values())
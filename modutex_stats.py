@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Usage Statistics
+Every AI call (model, tokens, latency) and every build phase is kept in a small SQLite
+store so latency, token throughput, cost and compile times can be followed over weeks
+"""
+
+import functools
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from modutex_jobs import STATE_DIR
+
+STATS_DB = STATE_DIR / "stats.db"
+
+# Approximate list prices in USD per 1K tokens (prompt, completion), for cost estimates only
+PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets
+HISTOGRAM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_calls (
+    ts                REAL NOT NULL,
+    task              TEXT,
+    model             TEXT NOT NULL,
+    status            INTEGER,
+    latency           REAL NOT NULL,
+    server_ms         INTEGER,
+    prompt_tokens     INTEGER,
+    completion_tokens INTEGER,
+    retries           INTEGER NOT NULL DEFAULT 0,
+    attempt           INTEGER NOT NULL DEFAULT 1,
+    first_byte        REAL,
+    endpoint          TEXT
+);
+CREATE INDEX IF NOT EXISTS ai_calls_ts ON ai_calls (ts);
+CREATE TABLE IF NOT EXISTS build_phases (
+    ts      REAL NOT NULL,
+    build   INTEGER NOT NULL,
+    phase   TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS build_phases_ts ON build_phases (ts);
+CREATE TABLE IF NOT EXISTS builds (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts      REAL NOT NULL,
+    engine  TEXT,
+    seconds REAL NOT NULL,
+    passes  INTEGER NOT NULL,
+    success INTEGER NOT NULL,
+    cached  INTEGER NOT NULL
+);
+"""
+
+
+def recording():
+    """MODUTEX_STATS=0 in .env turns the store off"""
+    return os.environ.get('MODUTEX_STATS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1000
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class StatsStore:
+    """Append-only record of AI calls and builds"""
+
+    def __init__(self, db_path=STATS_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(ai_calls)")}
+            # Stores created before time-to-first-byte / the key pool / key retries were recorded
+            # (their unused cache_hit column is left in place)
+            for column, kind in (('first_byte', 'REAL'), ('endpoint', 'TEXT'),
+                                 ('attempt', 'INTEGER NOT NULL DEFAULT 1')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE ai_calls ADD COLUMN {column} {kind}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record_call(self, model, latency, status=None, task=None, server_ms=None, prompt_tokens=None,
+                    completion_tokens=None, retries=0, attempt=1, first_byte=None, endpoint=None):
+        """Store one request to one key. `retries` counts the hedged duplicates sent with it;
+        `attempt` numbers the keys tried for the same call (2+ = retried after a 401/429);
+        `endpoint` is the masked key"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ai_calls (ts, task, model, status, latency, server_ms, prompt_tokens, "
+                "completion_tokens, retries, attempt, first_byte, endpoint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), task, model, status, latency, server_ms, prompt_tokens, completion_tokens,
+                 retries, attempt, first_byte, endpoint)
+            )
+
+    def record_build(self, result, engine=None):
+        """Store a BuildResult: one row per build plus one per phase"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            build = conn.execute(
+                "INSERT INTO builds (ts, engine, seconds, passes, success, cached) VALUES (?, ?, ?, ?, ?, ?)",
+                (now, engine, result.total_time, result.passes, int(result.success),
+                 int(result.success and result.passes == 0))
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO build_phases (ts, build, phase, seconds) VALUES (?, ?, ?, ?)",
+                [(now, build, phase, seconds) for phase, seconds in result.timings]
+            )
+
+    def calls(self, since=0):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM ai_calls WHERE ts >= ? ORDER BY ts", (since,))]
+
+    def first_bytes(self, model, limit=100):
+        """Latest time-to-first-byte readings of a model, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT first_byte FROM ai_calls WHERE model = ? AND first_byte IS NOT NULL "
+                                "ORDER BY ts DESC LIMIT ?", (model, limit)).fetchall()
+        return [row['first_byte'] for row in reversed(rows)]
+
+    def request_counts(self, since=0):
+        """(requests, hedged duplicates) since a time, for the hedging budget"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) AS calls, COALESCE(SUM(retries), 0) AS extra FROM ai_calls "
+                               "WHERE ts >= ?", (since,)).fetchone()
+        return row['calls'], row['extra']
+
+    def builds(self, since=0):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM builds WHERE ts >= ? ORDER BY ts", (since,))]
+
+    def phases(self, since=0):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM build_phases WHERE ts >= ? ORDER BY ts",
+                                                      (since,))]
+
+
+_store = None
+_store_lock = threading.Lock()
+_depth = threading.local()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StatsStore()
+        return _store
+
+
+def record_call(model, latency, **fields):
+    """Store one AI call; statistics never make a command fail"""
+    if not recording():
+        return
+    try:
+        get_store().record_call(model, latency, **fields)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[WARNING] Could not record usage statistics: {e}")
+
+
+def recorded_build(function):
+    """Decorator for build_pdf: stores the outermost build's result and phases"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_depth, 'value', 0)
+        _depth.value = depth + 1
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            _depth.value = depth
+        # Nested builds (the full build behind a partial one) are part of the outer result
+        if depth == 0 and result.timings and recording():
+            try:
+                get_store().record_build(result, result.engine)
+            except (sqlite3.Error, OSError) as e:
+                print(f"[WARNING] Could not record build statistics: {e}")
+        return result
+    return wrapper
+
+
+def model_health(hours=24, limit=50, store=None):
+    """{model: {'samples', 'p50', 'error_rate'}} over each model's latest calls"""
+    if not recording():
+        return {}
+    calls = (store or get_store()).calls(time.time() - hours * 3600)
+    health = {}
+    for model in {call['model'] for call in calls}:
+        recent = [call for call in calls if call['model'] == model][-limit:]
+        latencies = [call['latency'] for call in recent if call['status'] == 200]
+        health[model] = {
+            'samples': len(recent),
+            'p50': percentile(latencies, 0.5) if latencies else float('inf'),
+            'error_rate': 1 - len(latencies) / len(recent),
+        }
+    return health
+
+
+def _phase_group(phase):
+    """'pdflatex pass 3' and 'pdflatex pass 1' are reported together"""
+    return re.sub(r" pass \d+$", " pass", phase)
+
+
+def _seconds(value):
+    return f"{value:6.2f}s" if value is not None else "     - "
+
+
+def stats_report(days=7, model=None, store=None):
+    """The statistics of the last `days` days (0 = everything) as printable lines"""
+    store = store or get_store()
+    since = time.time() - days * 86400 if days else 0
+    calls = [call for call in store.calls(since) if model is None or call['model'] == model]
+    builds = store.builds(since)
+    phases = store.phases(since)
+    window = f"last {days} day(s)" if days else "all time"
+    lines = [f"[STATS] {window}: {len(calls)} AI call(s), {len(builds)} build(s)"]
+
+    if calls:
+        lines += ["", "AI calls per model",
+                  f"  {'model':<16}{'calls':>6}{'errors':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+                  f"{'tok/s':>8}{'tokens in/out':>17}{'est. cost':>11}"]
+        total_cost = 0.0
+        for name in sorted({call['model'] for call in calls}):
+            rows = [call for call in calls if call['model'] == name]
+            ok = [call for call in rows if call['status'] == 200]
+            latencies = [call['latency'] for call in ok]
+            prompt = sum(call['prompt_tokens'] or 0 for call in ok)
+            completion = sum(call['completion_tokens'] or 0 for call in ok)
+            busy = sum(call['latency'] for call in ok if call['completion_tokens'])
+            cost = estimate_cost(name, prompt, completion)
+            total_cost += cost
+            lines.append(f"  {name:<16}{len(rows):>6}{len(rows) - len(ok):>7}"
+                         f"{_seconds(percentile(latencies, 0.5)):>9}{_seconds(percentile(latencies, 0.95)):>9}"
+                         f"{_seconds(percentile(latencies, 0.99)):>9}"
+                         f"{(completion / busy if busy else 0):>8.1f}{f'{prompt}/{completion}':>17}{f'${cost:.2f}':>11}")
+        lines.append(f"  {'total':<16}{len(calls):>6}{'':>58}{f'${total_cost:.2f}':>11}")
+
+        tasks = sorted({call['task'] or "other" for call in calls})
+        if tasks != ["other"]:
+            lines += ["", "AI calls per task"]
+            for task in tasks:
+                rows = [call for call in calls if (call['task'] or "other") == task]
+                latencies = [call['latency'] for call in rows if call['status'] == 200]
+                cost = sum(estimate_cost(call['model'], call['prompt_tokens'], call['completion_tokens'])
+                           for call in rows)
+                hedged = sum(1 for call in rows if call['retries'])
+                retried = sum(1 for call in rows if call['attempt'] > 1)
+                lines.append(f"  {task:<16}{len(rows):>6}  p50 {_seconds(percentile(latencies, 0.5))}  "
+                             f"p95 {_seconds(percentile(latencies, 0.95))}  ${cost:.2f}"
+                             + (f"  {hedged} hedged" if hedged else "")
+                             + (f"  {retried} on another key" if retried else ""))
+
+        endpoints = sorted({call['endpoint'] for call in calls if call['endpoint']})
+        if len(endpoints) > 1:
+            lines += ["", "AI calls per key", f"  {'key':<40}{'calls':>6}{'errors':>7}{'401':>5}{'429':>5}{'p50':>9}"]
+            for endpoint in endpoints:
+                rows = [call for call in calls if call['endpoint'] == endpoint]
+                latencies = [call['latency'] for call in rows if call['status'] == 200]
+                lines.append(f"  {endpoint:<40}{len(rows):>6}{len(rows) - len(latencies):>7}"
+                             f"{sum(1 for call in rows if call['status'] == 401):>5}"
+                             f"{sum(1 for call in rows if call['status'] == 429):>5}"
+                             f"{_seconds(percentile(latencies, 0.5)):>9}")
+
+        latencies = [call['latency'] for call in calls if call['status'] == 200]
+        if latencies:
+            lines += ["", "Latency histogram"]
+            counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+            for latency in latencies:
+                counts[next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if latency <= bound),
+                            len(HISTOGRAM_BUCKETS))] += 1
+            labels = [f"<= {bound:g}s" for bound in HISTOGRAM_BUCKETS] + [f"> {HISTOGRAM_BUCKETS[-1]:g}s"]
+            for label, count in zip(labels, counts):
+                lines.append(f"  {label:>8}  {count:>5}  {'#' * round(40 * count / max(counts))}")
+
+    if builds:
+        cached = sum(1 for build in builds if build['cached'])
+        failed = sum(1 for build in builds if not build['success'])
+        totals = [build['seconds'] for build in builds if build['success'] and not build['cached']]
+        lines += ["", f"Builds: {len(builds)} ({cached} from cache, {failed} failed), "
+                      f"full build p50 {_seconds(percentile(totals, 0.5)).strip()} "
+                      f"p95 {_seconds(percentile(totals, 0.95)).strip()}",
+                  f"  {'phase':<22}{'count':>6}{'p50':>9}{'p95':>9}{'max':>9}"]
+        groups = {}
+        for row in phases:
+            groups.setdefault(_phase_group(row['phase']), []).append(row['seconds'])
+        for phase, values in sorted(groups.items(), key=lambda item: -sum(item[1])):
+            lines.append(f"  {phase:<22}{len(values):>6}{_seconds(percentile(values, 0.5)):>9}"
+                         f"{_seconds(percentile(values, 0.95)):>9}{_seconds(max(values)):>9}")
+
+    if calls or builds:
+        lines += ["", "Per day", f"  {'date':<12}{'calls':>6}{'p50':>9}{'cost':>9}{'builds':>8}{'build p50':>11}"]
+        days_seen = sorted({time.strftime('%Y-%m-%d', time.localtime(row['ts'])) for row in calls + builds})
+        for day in days_seen[-14:]:
+            day_calls = [call for call in calls if time.strftime('%Y-%m-%d', time.localtime(call['ts'])) == day]
+            day_builds = [build['seconds'] for build in builds
+                          if time.strftime('%Y-%m-%d', time.localtime(build['ts'])) == day and not build['cached']]
+            cost = sum(estimate_cost(call['model'], call['prompt_tokens'], call['completion_tokens'])
+                       for call in day_calls)
+            latencies = [call['latency'] for call in day_calls if call['status'] == 200]
+            lines.append(f"  {day:<12}{len(day_calls):>6}{_seconds(percentile(latencies, 0.5)):>9}"
+                         f"{f'${cost:.2f}':>9}{len(day_builds):>8}{_seconds(percentile(day_builds, 0.5)):>11}")
+    else:
+        lines.append("[INFO] Nothing recorded in this window yet")
+    return lines
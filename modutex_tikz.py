@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - TikZ Externalization
+Compiles each tikzpicture once to a standalone PDF, cached by a hash of its source
+and the document preamble, so LaTeX passes only place images instead of re-drawing plots
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+TIKZ_CACHE = Path("build") / "tikz"
+# Per-build folder (inside the build's output directory) with the rewritten sections
+TIKZ_SOURCES = "tikz-src"
+
+# Bump when the standalone wrapper changes so old PDFs are rebuilt
+PIPELINE_VERSION = 1
+
+TIKZ_PICTURE = re.compile(r"\\begin\{tikzpicture\}.*?\\end\{tikzpicture\}", re.DOTALL)
+PREAMBLE_METADATA = re.compile(r"^\s*\\(?:title|author|date|documentclass)\b.*$", re.MULTILINE)
+
+
+def document_preamble(main_file):
+    """The preamble the standalone pictures share with main.tex (without class and metadata)"""
+    text = Path(main_file).read_text(encoding='utf-8', errors='replace')
+    preamble = text.split("\\begin{document}", 1)[0]
+    return PREAMBLE_METADATA.sub("", preamble).strip()
+
+
+def picture_key(picture, preamble, engine):
+    digest = hashlib.sha256(f"{PIPELINE_VERSION}|{engine}\n{preamble}\n".encode('utf-8'))
+    digest.update(picture.encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def standalone_source(picture, preamble):
+    """A minimal document that typesets one picture cropped to its bounding box"""
+    extra = ""
+    if "pgfplots" not in preamble and re.search(r"\\begin\{(?:axis|semilogxaxis|semilogyaxis|loglogaxis)\}", picture):
+        extra = "\\usepackage{pgfplots}\n\\pgfplotsset{compat=newest}\n"
+    return (f"\\documentclass[tikz]{{standalone}}\n{preamble}\n{extra}"
+            f"\\begin{{document}}\n{picture}\n\\end{{document}}\n")
+
+
+def compile_picture(key, source, engine="pdflatex"):
+    """Typeset one standalone picture into the cache (runs inside a worker process)"""
+    work_dir = TIKZ_CACHE / key
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (work_dir / f"{key}.tex").write_text(source, encoding='utf-8')
+    process = subprocess.run(
+        [engine, "-interaction=nonstopmode", "-halt-on-error", "-file-line-error",
+         f"-output-directory={work_dir}", str(work_dir / f"{key}.tex")],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    pdf = work_dir / f"{key}.pdf"
+    if process.returncode != 0 or not pdf.exists():
+        error = next((line for line in process.stdout.splitlines() if line.startswith(("!", str(work_dir)))),
+                     "unknown error")
+        return {'key': key, 'ok': False, 'error': error}
+    os.replace(pdf, TIKZ_CACHE / f"{key}.pdf")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {'key': key, 'ok': True}
+
+
+def _placeholder(key, picture):
+    """\\includegraphics for a cached picture, padded to the same number of lines
+    so LaTeX error line numbers still match the real section file"""
+    return f"\\includegraphics{{{(TIKZ_CACHE / key).as_posix()}.pdf}}%" + "\n%" * picture.count("\n")
+
+
+def externalize_tikz(section_files, main_file="main.tex", out_dir=Path("build"), engine="pdflatex",
+                     max_workers=None):
+    """Compile changed tikzpictures and write image-only copies of the sections that use them.
+
+    Returns the directory holding those copies (to go first on TEXINPUTS), or None
+    when there is nothing to externalize.
+    """
+    source_dir = Path(out_dir) / TIKZ_SOURCES
+    preamble = document_preamble(main_file)
+
+    sections = {}
+    pending = {}
+    for path in section_files:
+        text = Path(path).read_text(encoding='utf-8', errors='replace')
+        pictures = TIKZ_PICTURE.findall(text)
+        if not pictures:
+            continue
+        sections[Path(path)] = (text, pictures)
+        for picture in pictures:
+            key = picture_key(picture, preamble, engine)
+            if not (TIKZ_CACHE / f"{key}.pdf").exists():
+                pending[key] = standalone_source(picture, preamble)
+
+    # Copies from an earlier build would shadow sections that no longer need one
+    if source_dir.exists():
+        shutil.rmtree(source_dir)
+    if not sections or "graphicx" not in preamble:
+        # Nothing to do, or the placeholders' \includegraphics would be undefined
+        return None
+
+    failed = set()
+    if pending:
+        print(f"[TIKZ] Externalizing {len(pending)} changed picture(s)")
+        keys = list(pending)
+        if len(keys) == 1:
+            results = [compile_picture(keys[0], pending[keys[0]], engine)]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers or min(len(keys), os.cpu_count() or 1)) as pool:
+                results = list(pool.map(compile_picture, keys, [pending[k] for k in keys], [engine] * len(keys)))
+        for outcome in results:
+            if not outcome['ok']:
+                # Left inline, so the main build reports the error at its real location
+                failed.add(outcome['key'])
+                print(f"[WARNING] TikZ picture {outcome['key']} failed: {outcome['error']}")
+
+    for path, (text, pictures) in sections.items():
+        for picture in pictures:
+            key = picture_key(picture, preamble, engine)
+            if key not in failed:
+                text = text.replace(picture, _placeholder(key, picture), 1)
+        target = source_dir / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text, encoding='utf-8')
+    return source_dir
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+ModuTex v1.0 - Tracing
+Lightweight timing spans around the AI commands, DOI lookups and builds, written as
+JSON lines (and optionally OpenTelemetry JSON) so a slow run can be broken down into
+prompt building, network, server time, file I/O and LaTeX passes
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from modutex_jobs import STATE_DIR
+
+TRACE_DIR = STATE_DIR / "trace"
+SPANS_FILE = TRACE_DIR / "spans.jsonl"
+
+# Set by a traced process for the processes it starts, so their spans join the same trace
+PARENT_ENV = "MODUTEX_TRACE_PARENT"
+
+_current = contextvars.ContextVar("modutex_span", default=None)
+_write_lock = threading.Lock()
+# Finished spans per trace, kept until the trace's local root ends (OTLP export only)
+_pending = {}
+
+
+def enabled():
+    """MODUTEX_TRACE=1 in the environment or .env turns tracing on"""
+    return os.environ.get('MODUTEX_TRACE', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class Span:
+    """One timed stage; attributes are free-form JSON values"""
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self.end_ns = None
+        # No span of this process encloses it: its end completes the trace here
+        self.local_root = _current.get() is None
+
+    def set(self, **attributes):
+        self.attributes.update((key, value) for key, value in attributes.items() if value is not None)
+
+    def fail(self, message=None):
+        self.status = "error"
+        if message:
+            self.attributes['error'] = message
+
+    def finish(self, end=None):
+        self.end_ns = self.start_ns + ((end or time.perf_counter_ns()) - self._start)
+        _export(self)
+
+    def record(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+        }
+
+
+class _NoSpan:
+    """Returned while tracing is off; accepts and drops everything"""
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, message=None):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def _parent():
+    """(trace_id, parent span_id) from the current span, the parent process, or a new trace"""
+    current = _current.get()
+    if current is not None:
+        return current.trace_id, current.span_id
+    inherited = os.environ.get(PARENT_ENV, "")
+    if "-" in inherited:
+        trace_id, span_id = inherited.split("-", 1)
+        return trace_id, span_id
+    return secrets.token_hex(16), None
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    if not enabled():
+        yield NO_SPAN
+        return
+    trace_id, parent_id = _parent()
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except SystemExit as e:
+        if e.code not in (0, None):
+            current.fail()
+        raise
+    except BaseException as e:
+        current.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+def traced(name):
+    """Decorator form of span(); returning False/None (or a result with success=False) fails the span"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return function(*args, **kwargs)
+            with span(name) as current:
+                result = function(*args, **kwargs)
+                if result is False or result is None or getattr(result, 'success', True) is False:
+                    current.fail()
+                return result
+        return wrapper
+    return decorate
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, if any"""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def record(name, start, end=None, **attributes):
+    """Add an already finished child span from time.perf_counter() readings"""
+    if not enabled():
+        return
+    trace_id, parent_id = _parent()
+    end = end if end is not None else time.perf_counter()
+    finished = Span(name, trace_id, parent_id, attributes)
+    finished.start_ns -= finished._start - int(start * 1e9)
+    finished._start = int(start * 1e9)
+    finished.finish(int(end * 1e9))
+
+
+def propagate(function):
+    """Bind the current span to function so spans it opens in a worker thread nest under it"""
+    parent = _current.get()
+    if parent is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def child_env(env=None):
+    """Environment for a subprocess whose spans should join the current trace"""
+    env = dict(os.environ if env is None else env)
+    current = _current.get()
+    if current is not None:
+        env[PARENT_ENV] = f"{current.trace_id}-{current.span_id}"
+    return env
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_span(finished):
+    """A span in the OTLP/JSON layout (as read by the OpenTelemetry collector's file receiver)"""
+    data = {
+        'traceId': finished.trace_id,
+        'spanId': finished.span_id,
+        'name': finished.name,
+        'kind': 1,
+        'startTimeUnixNano': str(finished.start_ns),
+        'endTimeUnixNano': str(finished.end_ns),
+        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in finished.attributes.items()],
+        'status': {'code': 1 if finished.status == "ok" else 2},
+    }
+    if finished.parent_id:
+        data['parentSpanId'] = finished.parent_id
+    return data
+
+
+def _export(finished):
+    """Append the span to spans.jsonl; with MODUTEX_TRACE_OTLP, write each finished trace there too"""
+    otlp_file = os.environ.get('MODUTEX_TRACE_OTLP')
+    with _write_lock:
+        try:
+            TRACE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(SPANS_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(finished.record(), default=str) + "\n")
+            if not otlp_file:
+                return
+            spans = _pending.setdefault(finished.trace_id, [])
+            spans.append(otlp_span(finished))
+            if finished.local_root:
+                del _pending[finished.trace_id]
+                request = {'resourceSpans': [{
+                    'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'modutex'}}]},
+                    'scopeSpans': [{'scope': {'name': 'modutex'}, 'spans': spans}],
+                }]}
+                with open(otlp_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(request) + "\n")
+        except OSError as e:
+            print(f"[WARNING] Could not write trace: {e}")
+
+
+def load_spans():
+    try:
+        lines = SPANS_FILE.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return []
+    spans = []
+    for line in lines:
+        try:
+            spans.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return spans
+
+
+def print_traces(count=1):
+    """Print the last `count` traces as indented span trees with durations"""
+    spans = load_spans()
+    if not spans:
+        print("[INFO] No spans recorded - set MODUTEX_TRACE=1 in .env to enable tracing")
+        return False
+    traces = list(dict.fromkeys(data['trace_id'] for data in reversed(spans)))[:count]
+    for trace_id in reversed(traces):
+        members = sorted((data for data in spans if data['trace_id'] == trace_id), key=lambda data: data['start'])
+        ids = {data['span_id'] for data in members}
+        children = {}
+        for data in members:
+            parent = data['parent_id'] if data['parent_id'] in ids else None
+            children.setdefault(parent, []).append(data)
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(members[0]['start']))
+        print(f"\n[TRACE] {trace_id[:12]} started {started}")
+
+        def show(parent, depth):
+            for data in children.get(parent, []):
+                details = "  ".join(f"{key}={value}" for key, value in data['attributes'].items())
+                mark = "" if data['status'] == "ok" else "  [FAILED]"
+                print(f"  {data['duration_ms']:10.1f} ms  {'  ' * depth}{data['name']}{mark}  {details}".rstrip())
+                show(data['span_id'], depth + 1)
+        show(None, 0)
+    return True
@@ -193,7 +193,7 @@ if %errorlevel% == 0 (
 echo.
 echo 📦 Installing Python dependencies...
 python -m pip install --upgrade pip --quiet
-python -m pip install requests pathlib --quiet
+python -m pip install requests pathlib pillow --quiet
 if %errorlevel% == 0 (
     echo ✅ Python packages installed successfully
 ) else (
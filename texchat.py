@@ -11,6 +11,30 @@ import requests
 import json
 from pathlib import Path
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from modutex_jobs import JobStore, hash_file, STATE_DIR, MAX_ATTEMPTS
+from modutex_latex import (
+    validate_latex, repair_latex, strip_code_fences, broken_regions, replace_lines
+)
+from modutex_build import build_pdf, build_matrix, BUILD_DIR
+from modutex_sectioncheck import check_sections
+from modutex_trace import span, traced, propagate, print_traces
+from modutex_stats import record_call, stats_report
+from modutex_hedge import hedged_chat, hedging_enabled
+from modutex_keypool import key_pool, rate_limits
+from modutex_backend import active_backend, CAPABILITIES
+from modutex_routing import route_model, estimate_tokens, routing_enabled, task_override, ROUTED_TASKS
+from modutex_index import load_index
+from modutex_refcheck import check_document
+from modutex_retrieval import retrieve_context
+from modutex_convert import convert_text, plain_block
+from modutex_manifest import (
+    MANIFEST_FILE, load_manifest, save_manifest, default_manifest,
+    add_sections, listed_sections, section_names, include_lines, document_class,
+    mentioned_sections, uses_include, current_block, insert_block, inline_titles
+)
 
 # Load environment variables from .env file
 try:
@@ -32,46 +56,45 @@ if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-# Available OpenAI models
-MODELS = {
-    "gpt-4": "GPT-4 (Best Quality - Expensive)",
-    "gpt-4-turbo": "GPT-4 Turbo (Recommended)",
-    "gpt-3.5-turbo": "GPT-3.5 Turbo (Fast & Cheap)"
-}
+# API endpoints; OPENAI_BASE_URL / CROSSREF_URL in .env point them elsewhere (e.g. modutex_mockserver.py).
+# The OpenAI base URL and keys are resolved per request by the key pool (modutex_keypool.py)
+CROSSREF_URL = "https://api.crossref.org"
+
+# Answers requested per syntax-fix call on backends that support n > 1
+FIX_CANDIDATES = 2
 
 def get_openai_key():
-    """Get OpenAI API key from environment"""
-    api_key = os.environ.get('OPENAI_API_KEY', 'your_api_key')
-    if api_key == 'your_api_key' or not api_key:
+    """Get OpenAI API key from environment (the first one when OPENAI_API_KEYS/OPENAI_POOL list several)"""
+    members = key_pool().members
+    if not members:
         print("[ERROR] OpenAI API key not configured!")
         print("Please get your API key from: https://platform.openai.com/api-keys")
         print("Then edit .env file and add:")
         print("   OPENAI_API_KEY=sk-proj-your_actual_key_here")
         print("")
         return None
-    return api_key
+    # Keyless local endpoints in the pool still count as configured
+    return members[0].key or "none"
 
 def select_model():
-    """Select OpenAI model"""
-    model = os.environ.get('OPENAI_MODEL', 'gpt-4-turbo')
-    if model in MODELS:
-        return model
-    return 'gpt-4-turbo'
-
-def call_openai_api(system_prompt, user_prompt, temperature=0.7):
-    """Common function to call OpenAI API"""
+    """Select the model: OPENAI_MODEL if the active backend serves it, else its default"""
+    return active_backend().default_model
+
+def call_openai_api(system_prompt, user_prompt, temperature=0.7, task=None, json_mode=False, n=1):
+    """Common function to call the AI backend; `task` names the command in the usage statistics.
+    
+    json_mode asks for a JSON object where the backend supports it; with n > 1 a list of
+    answers is returned (a single one on backends without n > 1).
+    """
     api_key = get_openai_key()
     if not api_key:
         return None
     
+    backend = active_backend()
     model = select_model()
-    url = "https://api.openai.com/v1/chat/completions"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
+    if task:
+        model, reason = route_model(task, estimate_tokens(system_prompt + user_prompt), backend.models, model)
+        print(f"[ROUTE] {task} -> {model} ({reason})")
     data = {
         "model": model,
         "messages": [
@@ -81,26 +104,173 @@ def call_openai_api(system_prompt, user_prompt, temperature=0.7):
         "max_tokens": 2500,
         "temperature": temperature
     }
+    if json_mode and backend.supports('json_mode'):
+        data["response_format"] = {"type": "json_object"}
+    if n > 1 and backend.supports('n'):
+        data["n"] = n
     
+    # Each request goes to the pooled key with the most quota left; a key rejected
+    # with 401/429 leaves the rotation and the request moves on to the next one
+    pool = key_pool()
+    tried = set()
+    while True:
+        member = pool.acquire(exclude=tried)
+        if member is None:
+            print("[ERROR] Every API key in the pool was rejected - check OPENAI_API_KEY(S) in .env")
+            return None
+        tried.add(member)
+        url = f"{member.base_url}/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        if member.key:
+            headers["Authorization"] = f"Bearer {member.key}"
+        
+        with span("openai", model=model, task=task, key=member.label,
+                  prompt_chars=len(system_prompt) + len(user_prompt)) as current:
+            start = time.perf_counter()
+            content, info = _post_chat(url, headers, data)
+            limits = info.pop('limits', {})
+            current.set(**info)
+            if content is None:
+                current.fail()
+        latency = time.perf_counter() - start
+        pool.release(member, info['status'], limits, latency)
+        record_call(model, latency, task=task, endpoint=member.label, attempt=len(tried), **info)
+        if content is None and info['status'] in (401, 429) and pool.available(exclude=tried):
+            print("[POOL] Retrying with another API key")
+            continue
+        if n > 1 and isinstance(content, str):
+            return [content]
+        return content
+
+def _post_chat(url, headers, data):
+    """POST a chat completion; returns (text, or a list of texts when data asks for n > 1, or None,
+    status/server time/token usage/rate limits)"""
+    if hedging_enabled() and active_backend().supports('stream') and data.get('n', 1) == 1:
+        content, info, details = hedged_chat(url, headers, data)
+        if content is None:
+            _report_api_error(info['status'], details)
+        return content, info
+    
+    info = {'status': None}
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
+        with span("network") as network:
+            response = requests.post(url, headers=headers, json=data, timeout=60)
+            network.set(status_code=response.status_code, response_bytes=len(response.content))
+        info['status'] = response.status_code
+        info['limits'] = rate_limits(response.headers)
+        # Server-side processing time; the rest of the request is network and queueing
+        processing_ms = response.headers.get('openai-processing-ms')
+        if processing_ms and processing_ms.isdigit():
+            info['server_ms'] = int(processing_ms)
         
         if response.status_code == 200:
             result = response.json()
-            return result['choices'][0]['message']['content']
+            usage = result.get('usage') or {}
+            info['prompt_tokens'] = usage.get('prompt_tokens')
+            info['completion_tokens'] = usage.get('completion_tokens')
+            answers = [choice['message']['content'] for choice in result['choices']]
+            return (answers if data.get('n', 1) > 1 else answers[0]), info
         else:
-            print(f"[ERROR] API request failed: {response.status_code}")
-            if response.status_code == 401:
-                print("[SOLUTION] Check your OPENAI_API_KEY in .env file")
-            elif response.status_code == 429:
-                print("[SOLUTION] Rate limit exceeded. Wait a moment and try again")
-            else:
-                print(f"[DETAILS] {response.text}")
-            return None
+            _report_api_error(response.status_code, response.text)
+            return None, info
     except Exception as e:
-        print(f"[ERROR] API call failed: {e}")
+        _report_api_error(None, e)
+        return None, info
+
+def _report_api_error(status, details):
+    """Explain a failed API call (status None means no HTTP answer at all)"""
+    if status is None:
+        print(f"[ERROR] API call failed: {details}")
+        return
+    print(f"[ERROR] API request failed: {status}")
+    if status == 401:
+        print("[SOLUTION] Check your OPENAI_API_KEY in .env file")
+    elif status == 429:
+        print("[SOLUTION] Rate limit exceeded. Wait a moment and try again")
+    else:
+        print(f"[DETAILS] {details}")
+
+@traced("context")
+def document_context(exclude=None, limit=40, query=None):
+    """Labels and citation keys already used elsewhere in the document, from the section index,
+    plus the passages and bib entries most relevant to the query (CONTEXT_TOKENS budget)"""
+    index = load_index()
+    labels = [label for label, names in index.labels().items() if names != [exclude]][:limit]
+    cites = [key for key, names in index.citations().items() if names != [exclude]][:limit]
+    lines = []
+    if labels:
+        lines.append(f"Existing labels you can \\ref: {', '.join(labels)}")
+    if cites:
+        lines.append(f"Citation keys already used in the document (reuse when relevant): {', '.join(cites)}")
+    try:
+        budget = int(os.environ.get('CONTEXT_TOKENS', '600'))
+    except ValueError:
+        budget = 600
+    if query and budget > 0:
+        start = time.perf_counter()
+        retrieved = retrieve_context(query, exclude=exclude, token_budget=budget)
+        if retrieved:
+            lines.append(retrieved)
+            print(f"[CONTEXT] Retrieved ~{len(retrieved) // 4} tokens of context "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return "\n".join(lines)
+
+@traced("validate")
+def gate_latex_output(content, name, forbid_sections=True, max_rounds=2):
+    """Check AI output locally before it is written to sections/.
+    
+    Cheap deterministic repairs are applied first; anything still broken is sent
+    back to the model one small region at a time. Returns the clean content, or
+    None (saving the rejected output under .modutex/rejected/) if it stays broken.
+    """
+    start = time.perf_counter()
+    content, fixes = repair_latex(content, forbid_sections)
+    issues = validate_latex(content, forbid_sections)
+    print(f"[VALIDATE] Checked output in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for fix in fixes:
+        print(f"[VALIDATE] Auto-fixed: {fix}")
+    
+    rounds = 0
+    while issues and rounds < max_rounds:
+        rounds += 1
+        regions = broken_regions(content, issues)
+        print(f"[VALIDATE] {len(issues)} issue(s) left - re-querying {len(regions)} region(s)")
+        candidates = FIX_CANDIDATES if active_backend().supports('n') else 1
+        lines = content.split("\n")
+        # Patch from the bottom up so earlier line numbers stay valid
+        for region_start, region_end in reversed(regions):
+            problems = "\n".join(f"- line {issue.line - region_start + 1}: {issue.message}"
+                                  for issue in issues if region_start <= issue.line <= region_end)
+            snippet = "\n".join(lines[region_start - 1:region_end])
+            answers = call_openai_api(
+                "You are a LaTeX syntax fixer. Fix only the listed syntax problems in the excerpt. "
+                "Do not change wording, add content or add \\section headers. "
+                "OUTPUT: Return only the corrected excerpt, nothing else.",
+                f"Problems:\n{problems}\n\nExcerpt:\n{snippet}",
+                temperature=0 if candidates == 1 else 0.3,
+                task="fix_syntax",
+                n=candidates
+            )
+            # Keep the candidate that leaves the fewest problems (the first on a tie)
+            patched = [replace_lines(content, region_start, region_end, strip_code_fences(answer)[0])
+                       for answer in answers or [] if answer]
+            if patched:
+                content = min(patched, key=lambda text: len(validate_latex(text, forbid_sections)))
+        issues = validate_latex(content, forbid_sections)
+    
+    if issues:
+        rejected = STATE_DIR / "rejected" / f"{name}.tex"
+        rejected.parent.mkdir(parents=True, exist_ok=True)
+        rejected.write_text(content, encoding='utf-8')
+        print(f"[ERROR] AI output is not valid LaTeX - nothing was written")
+        for issue in issues[:10]:
+            print(f"  line {issue.line}: {issue.message}")
+        print(f"[INFO] Rejected output saved to {rejected}")
         return None
+    
+    return content
 
+@traced("edit_section")
 def edit_section(section_name, edit_prompt):
     """Edit an existing section with AI improvements"""
     section_file = Path("sections") / f"{section_name}.tex"
@@ -117,7 +287,7 @@ def edit_section(section_name, edit_prompt):
         print(f"[ERROR] Could not read section file: {e}")
         return False
     
-    print(f"[AI] Improving section '{section_name}' using {MODELS[select_model()]}...")
+    print(f"[AI] Improving section '{section_name}'...")
     print(f"[PROMPT] {edit_prompt}")
     print("[STATUS] Processing improvements...")
     
@@ -143,13 +313,20 @@ OUTPUT: Return only the improved LaTeX code, nothing else."""
 Improvement instructions: {edit_prompt}
 
 Please improve this content according to the instructions while maintaining the existing structure and academic quality."""
+    context = document_context(exclude=section_name, query=f"{edit_prompt}\n{current_content}")
+    if context:
+        user_prompt += f"\n\nDocument context:\n{context}"
     
-    improved_content = call_openai_api(system_prompt, user_prompt, temperature=0.3)
+    improved_content = call_openai_api(system_prompt, user_prompt, temperature=0.3, task="edit_section")
+    if improved_content:
+        # Only forbid \section if the existing content never used one
+        improved_content = gate_latex_output(improved_content, section_name,
+                                             forbid_sections="\\section" not in current_content)
     
     if improved_content:
         # Write improved content back to file
         try:
-            with open(section_file, 'w', encoding='utf-8') as f:
+            with span("write", file=section_file.as_posix()), open(section_file, 'w', encoding='utf-8') as f:
                 f.write(improved_content)
             
             print(f"[SUCCESS] Section improved: sections/{section_name}.tex")
@@ -168,9 +345,10 @@ Please improve this content according to the instructions while maintaining the
     else:
         return False
 
+@traced("add_section")
 def generate_section(name, prompt):
     """Generate LaTeX section content using ChatGPT"""
-    print(f"[AI] Generating content for '{name}' section using {MODELS[select_model()]}...")
+    print(f"[AI] Generating content for '{name}' section...")
     print(f"[PROMPT] {prompt}")
     print("[STATUS] Processing request...")
     
@@ -206,17 +384,20 @@ Make this content:
 - Add realistic citations
 - Use clear section structure with subsections if needed
 - Length: 300-500 words minimum"""
+    context = document_context(exclude=name, query=prompt)
+    if context:
+        user_prompt += f"\n\nDocument context:\n{context}"
     
-    content = call_openai_api(system_prompt, user_prompt)
+    content = call_openai_api(system_prompt, user_prompt, task="add_section")
+    if content:
+        content = gate_latex_output(content, name)
     
     if content:
         # Write to sections directory
-        sections_dir = Path("sections")
-        sections_dir.mkdir(exist_ok=True)
-        
-        output_file = sections_dir / f"{name}.tex"
+        output_file = Path("sections") / f"{name}.tex"
+        output_file.parent.mkdir(parents=True, exist_ok=True)
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
+            with span("write", file=output_file.as_posix()), open(output_file, 'w', encoding='utf-8') as f:
                 f.write(content)
             
             print(f"[SUCCESS] Section generated: sections/{name}.tex")
@@ -235,8 +416,13 @@ Make this content:
     else:
         return False
 
-def text_to_latex(text_file, output_name=None):
-    """Convert plain text to LaTeX format"""
+@traced("text_to_latex")
+def text_to_latex(text_file, output_name=None, local_only=False):
+    """Convert plain text to LaTeX format.
+    
+    Headings, lists, tables, plain paragraphs and $ math are converted locally;
+    only blocks the rules cannot handle are sent to the model (none if local_only).
+    """
     try:
         with open(text_file, 'r', encoding='utf-8') as f:
             plain_text = f.read()
@@ -244,8 +430,24 @@ def text_to_latex(text_file, output_name=None):
         print(f"[ERROR] File not found: {text_file}")
         return False
     
-    print(f"[AI] Converting text to LaTeX using {MODELS[select_model()]}...")
-    print("[STATUS] Processing text conversion...")
+    # Determine output filename
+    if not output_name:
+        base_name = Path(text_file).stem
+        output_name = f"{base_name}_latex"
+    
+    start = time.perf_counter()
+    blocks = convert_text(plain_text)
+    pending = [index for index, (_, latex) in enumerate(blocks) if latex is None]
+    print(f"[FAST] Converted {len(blocks) - len(pending)}/{len(blocks)} block(s) locally "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    # Neighbouring ambiguous blocks go to the model together
+    groups = []
+    for index in pending:
+        if groups and groups[-1][-1] == index - 1:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
     
     system_prompt = """You are a LaTeX formatting expert. Convert the given plain text to properly formatted LaTeX code.
 
@@ -263,23 +465,36 @@ CONVERSION RULES:
 
 OUTPUT: Only the formatted LaTeX code, nothing else."""
     
-    user_prompt = f"Convert this text to LaTeX format:\n\n{plain_text}"
+    def convert_group(group):
+        text = "\n\n".join(blocks[index][0] for index in group)
+        if local_only:
+            return "\n\n".join(plain_block(blocks[index][0]) for index in group)
+        converted = call_openai_api(system_prompt, f"Convert this text to LaTeX format:\n\n{text}",
+                                    temperature=0.3, task="text_to_latex")
+        return strip_code_fences(converted)[0].strip() if converted else None
+    
+    if groups and not local_only:
+        print(f"[AI] Converting {len(groups)} remaining region(s)...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        converted = list(executor.map(propagate(convert_group), groups))
+    if any(part is None for part in converted):
+        return False
     
-    latex_content = call_openai_api(system_prompt, user_prompt, temperature=0.3)
+    latex_blocks = [latex for _, latex in blocks]
+    for group, latex in zip(groups, converted):
+        latex_blocks[group[0]] = latex
+        for index in group[1:]:
+            latex_blocks[index] = None
+    latex_content = "\n\n".join(latex for latex in latex_blocks if latex) + "\n"
+    latex_content = gate_latex_output(latex_content, output_name)
     
     if latex_content:
-        # Determine output filename
-        if not output_name:
-            base_name = Path(text_file).stem
-            output_name = f"{base_name}_latex"
         
         # Write to sections directory
-        sections_dir = Path("sections")
-        sections_dir.mkdir(exist_ok=True)
-        
-        output_file = sections_dir / f"{output_name}.tex"
+        output_file = Path("sections") / f"{output_name}.tex"
+        output_file.parent.mkdir(parents=True, exist_ok=True)
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
+            with span("write", file=output_file.as_posix()), open(output_file, 'w', encoding='utf-8') as f:
                 f.write(latex_content)
             
             print(f"[SUCCESS] LaTeX file created: sections/{output_name}.tex")
@@ -298,37 +513,50 @@ OUTPUT: Only the formatted LaTeX code, nothing else."""
     else:
         return False
 
-def update_main_tex():
-    """Update main.tex to include all sections automatically"""
+@traced("update_main")
+def update_main_tex(order=None, use_include=None, only=False):
+    """Update main.tex to include all sections automatically.
+    
+    The sections, their order, chapter grouping and per-section options come from
+    document.json when it exists; otherwise every file under sections/ is included in
+    the usual academic order. `order` optionally lists section names that should come
+    first (or, with a manifest, gets any new ones appended to it); with `only` exactly
+    the sections in `order` are included, in that order, and document.json is left alone.
+    `use_include` emits \\include instead of \\input so sections get their own .aux
+    files and can be built selectively; None keeps whatever main.tex uses now.
+    main.tex is only written when the resulting include list actually changes.
+    """
     sections_dir = Path("sections")
     if not sections_dir.exists():
         print("[ERROR] Sections directory not found!")
         return False
     
-    # Get all .tex files in sections directory
-    section_files = list(sections_dir.glob("*.tex"))
-    if not section_files:
+    manifest = load_manifest()
+    if manifest is None and MANIFEST_FILE.exists():
+        return False
+    if manifest is None or (only and order):
+        # Headers written by hand next to an include travel with the section
+        main_text = Path("main.tex").read_text(encoding='utf-8') if Path("main.tex").exists() else ""
+        manifest = default_manifest(order, inline_titles(main_text), only=only)
+    elif order:
+        added = add_sections(manifest, order)
+        if added:
+            save_manifest(manifest)
+            print(f"[INFO] Added to {MANIFEST_FILE}: {', '.join(added)}")
+    
+    existing = section_names()
+    names = [name for name in listed_sections(manifest) if name in existing]
+    if not names:
         print("[INFO] No sections found to include in main.tex")
         return True
+    mentioned = mentioned_sections(manifest.get('sections', []))
+    unlisted = [name for name in existing if name not in mentioned]
+    if unlisted and only:
+        print(f"[INFO] Not part of this outline (left out): {', '.join(unlisted)}")
+    elif unlisted and MANIFEST_FILE.exists():
+        print(f"[INFO] Not listed in {MANIFEST_FILE} (left out): {', '.join(unlisted)}")
     
-    # Sort section files (common academic order)
-    section_order = [
-        'abstract', 'introduction', 'literature_review', 'related_work',
-        'methodology', 'method', 'approach', 'implementation',
-        'results', 'evaluation', 'experiments', 'analysis',
-        'discussion', 'conclusion', 'future_work', 'acknowledgments'
-    ]
-    
-    def get_order_priority(filename):
-        name = filename.stem.lower()
-        try:
-            return section_order.index(name)
-        except ValueError:
-            return 1000  # Put unknown sections at the end
-    
-    section_files.sort(key=get_order_priority)
-    
-    print(f"[INFO] Found {len(section_files)} sections to include")
+    print(f"[INFO] Found {len(names)} sections to include")
     
     # Read current main.tex
     main_tex_path = Path("main.tex")
@@ -377,69 +605,300 @@ def update_main_tex():
 
 \\end{document}"""
     
-    # Find where to insert sections (after \maketitle, before bibliography)
-    if "\\maketitle" in content and "\\bibliographystyle" in content:
-        # Split content at bibliography
-        before_bib = content.split("\\bibliographystyle")[0]
-        after_maketitle = before_bib.split("\\maketitle")
+    if use_include is None:
+        use_include = uses_include(manifest, content)
+    lines = include_lines(manifest, use_include, document_class(content))
+    
+    new_content = insert_block(content, lines)
+    if new_content is None:
+        print("[ERROR] main.tex format not recognized")
+        return False
+    
+    if new_content == content:
+        # Leave the file (and its timestamp) alone so nothing downstream rebuilds
+        print("[INFO] main.tex already matches the section list - not rewritten")
+        return True
+    
+    # Write updated main.tex
+    try:
+        with open(main_tex_path, 'w', encoding='utf-8') as f:
+            f.write(new_content)
         
-        if len(after_maketitle) >= 2:
-            # Remove any existing section inputs
-            section_part = after_maketitle[1]
-            # Remove lines that contain \input{sections/
-            lines = section_part.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                if not (line.strip().startswith('\\input{sections/') or 
-                       'Sections will be automatically inserted here' in line):
-                    cleaned_lines.append(line)
+        print(f"[SUCCESS] main.tex updated with {len(names)} sections:")
+        for name in names:
+            print(f"  • {name}.tex")
+        
+        return True
+    except Exception as e:
+        print(f"[ERROR] Could not write main.tex: {e}")
+        return False
+
+def show_manifest():
+    """Create document.json from the current sections, or show what it includes"""
+    manifest = load_manifest()
+    if manifest is None:
+        if MANIFEST_FILE.exists():
+            return False
+        main_text = Path("main.tex").read_text(encoding='utf-8') if Path("main.tex").exists() else ""
+        manifest = default_manifest(titles=inline_titles(main_text))
+        save_manifest(manifest)
+        print(f"[SUCCESS] Created {MANIFEST_FILE} with {len(listed_sections(manifest))} section(s)")
+        print("[INFO] Edit it to reorder, group into chapters ({\"chapter\": ..., \"sections\": [...]})")
+        print("       or set per-section options (title, newpage, numbered, enabled), then run update_main")
+    
+    main_text = Path("main.tex").read_text(encoding='utf-8') if Path("main.tex").exists() else ""
+    use_include = uses_include(manifest, main_text)
+    lines = include_lines(manifest, use_include, document_class(main_text))
+    print(f"\n[MANIFEST] {MANIFEST_FILE} includes:")
+    for line in lines:
+        print(f"  {line}")
+    if current_block(main_text) != lines:
+        print("[INFO] main.tex is out of date - run 'python texchat.py update_main'")
+    return True
+
+def run_dag(steps, max_workers=4):
+    """Run a dependency graph of steps, starting each one as soon as its dependencies finish.
+    
+    `steps` maps a step name to (dependencies, function). Returns {name: (success, seconds)};
+    steps whose dependencies failed are skipped and reported as failures.
+    """
+    results = {}
+    pending = dict(steps)
+    running = {}
+    
+    def timed(func):
+        start = time.perf_counter()
+        try:
+            success = bool(func())
+        except Exception as e:
+            print(f"[ERROR] Step crashed: {e}")
+            success = False
+        return success, time.perf_counter() - start
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (deps, func) in list(pending.items()):
+                if any(not results[d][0] for d in deps if d in results):
+                    print(f"[SKIP] {name} (a dependency failed)")
+                    results[name] = (False, 0.0)
+                    del pending[name]
+                elif all(d in results for d in deps):
+                    running[executor.submit(propagate(timed), func)] = name
+                    del pending[name]
             
-            # Build new content
-            new_content = after_maketitle[0] + "\\maketitle\n"
-            new_content += '\n'.join(cleaned_lines)
+            if not running:
+                if pending:
+                    print(f"[ERROR] Unresolvable dependencies: {', '.join(pending)}")
+                    for name in pending:
+                        results[name] = (False, 0.0)
+                break
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                results[running.pop(future)] = future.result()
+    
+    return results
+
+@traced("outline")
+def generate_outline(topic, num_sections=5):
+    """Ask the model for a paper outline: a list of {name, title, prompt} body sections"""
+    system_prompt = """You are an academic writing planner. Plan the body sections of a research paper.
+
+OUTPUT: Only a JSON object {"sections": [...]}, nothing else. Each element of "sections" must be an object with:
+- "name": short lowercase filename using letters, digits and underscores (e.g. "related_work")
+- "title": the section title
+- "prompt": 1-3 sentences describing what the section must cover
+
+Do not include the abstract or the conclusion - they are written separately."""
+    
+    user_prompt = f"Plan {num_sections} body sections for a paper about: {topic}"
+    
+    response = call_openai_api(system_prompt, user_prompt, temperature=0.3, task="outline", json_mode=True)
+    if not response:
+        return None
+    
+    # Models sometimes wrap JSON in a markdown fence
+    response = re.sub(r"^```(?:json)?\s*|\s*```$", "", response.strip())
+    try:
+        outline = json.loads(response)
+    except json.JSONDecodeError:
+        print("[ERROR] Outline is not valid JSON")
+        print(f"[DETAILS] {response[:300]}")
+        return None
+    # JSON mode only allows an object, so the list arrives as {"sections": [...]};
+    # models without JSON mode often answer with the bare array, which is used as it is
+    if isinstance(outline, dict):
+        outline = outline.get('sections', [])
+    
+    if not isinstance(outline, list):
+        print("[ERROR] Outline is not a list of sections")
+        return None
+    
+    sections = []
+    seen = set()
+    for entry in outline:
+        if not isinstance(entry, dict):
+            continue
+        name = re.sub(r"[^a-z0-9_]+", "_", str(entry.get('name', '')).lower()).strip("_")
+        if not name or name in ('abstract', 'conclusion') or not entry.get('prompt'):
+            continue
+        # Two sections with the same name would overwrite each other's file
+        base, number = name, 2
+        while name in seen:
+            name, number = f"{base}_{number}", number + 1
+        seen.add(name)
+        sections.append({'name': name, 'title': entry.get('title', name), 'prompt': entry['prompt']})
+    return sections
+
+def _section_digest(names, limit=400):
+    """Opening text of each finished section, used to ground abstract/conclusion"""
+    parts = []
+    for name in names:
+        section_file = Path("sections") / f"{name}.tex"
+        if section_file.exists():
+            text = section_file.read_text(encoding='utf-8')[:limit]
+            parts.append(f"[{name}]\n{text}")
+    return "\n\n".join(parts)
+
+@traced("pipeline")
+def run_pipeline(topic, num_sections=5, max_workers=4, build=True):
+    """One-shot topic -> outline -> sections -> abstract/conclusion -> main.tex -> PDF"""
+    pipeline_start = time.perf_counter()
+    
+    print(f"[PIPELINE] Planning outline for: {topic}")
+    outline = generate_outline(topic, num_sections)
+    if not outline:
+        print("[ERROR] Could not generate an outline")
+        return False
+    
+    print(f"[PIPELINE] Outline: {', '.join(s['name'] for s in outline)}")
+    body = [s['name'] for s in outline]
+    
+    steps = {}
+    for section in outline:
+        prompt = (f"{section['title']}: {section['prompt']} "
+                  f"(This section is part of a paper on '{topic}'.)")
+        steps[f"section:{section['name']}"] = (
+            [], lambda name=section['name'], prompt=prompt: generate_section(name, prompt)
+        )
+    
+    body_steps = list(steps)
+    steps['section:abstract'] = (body_steps, lambda: generate_section(
+        'abstract',
+        f"A concise abstract (150-250 words, no subsections) for a paper on '{topic}'. "
+        f"Summarize these sections:\n{_section_digest(body)}"))
+    steps['section:conclusion'] = (body_steps, lambda: generate_section(
+        'conclusion',
+        f"The conclusion of a paper on '{topic}', summarizing contributions and future work. "
+        f"The paper contains these sections:\n{_section_digest(body)}"))
+    
+    order = ['abstract'] + body + ['conclusion']
+    # Only this outline's sections: files left in sections/ by an earlier paper stay out
+    steps['update_main'] = (list(steps), lambda: update_main_tex(order=order, only=True))
+    if build:
+        steps['build'] = (['update_main'], lambda: build_pdf().success)
+    
+    results = run_dag(steps, max_workers=max_workers)
+    
+    wall_clock = time.perf_counter() - pipeline_start
+    print(f"\n[SUMMARY] Pipeline finished in {wall_clock:.1f}s")
+    for name, (success, seconds) in results.items():
+        print(f"  {'OK  ' if success else 'FAIL'} {name:<32} {seconds:6.1f}s")
+    
+    return all(success for success, _ in results.values())
+
+@traced("autofix")
+def fix_build_errors(max_iterations=3, context_lines=5, **build_options):
+    """Build, map LaTeX errors back to section files, and let the model fix only
+    the offending lines; repeats until the build is clean or the limit is hit.
+    `build_options` (only, engine, cache) are passed on to build_pdf()"""
+    for iteration in range(1, max_iterations + 1):
+        print(f"\n[AUTOFIX] Build attempt {iteration}/{max_iterations}")
+        result = build_pdf(**build_options)
+        if result.success and not result.errors:
+            return True
+        if not result.errors:
+            print(f"[ERROR] Build failed without a parsable LaTeX error - see {BUILD_DIR / 'main.log'}")
+            return False
+        
+        section_errors = [error for error in result.errors if error.is_section]
+        for error in result.errors:
+            if not error.is_section:
+                print(f"[AUTOFIX] Cannot fix outside sections/: {error.file}:{error.line}: {error.message}")
+        if not section_errors:
+            return False
+        
+        by_file = {}
+        for error in section_errors:
+            by_file.setdefault(error.file, []).append(error)
+        
+        for file_name, errors in by_file.items():
+            section_file = Path(file_name)
+            if not section_file.exists():
+                continue
+            content = section_file.read_text(encoding='utf-8')
+            total_lines = content.count("\n") + 1
             
-            # Add section inputs
-            new_content += "\n% === Auto-generated section includes ===\n"
-            for section_file in section_files:
-                section_name = section_file.stem
-                new_content += f"\\input{{sections/{section_name}}}\n"
+            # Merge overlapping windows around each error line
+            windows = []
+            for error in sorted(errors, key=lambda e: e.line):
+                start = max(1, error.line - context_lines)
+                end = min(total_lines, error.line + context_lines)
+                if windows and start <= windows[-1][1] + 1:
+                    windows[-1][1] = end
+                    windows[-1][2].append(error)
+                else:
+                    windows.append([start, end, [error]])
             
-            new_content += "\n\\bibliographystyle{ieeetr}\n"
-            new_content += content.split("\\bibliographystyle")[1]
+            lines = content.split("\n")
+            for start, end, window_errors in reversed(windows):
+                snippet = "\n".join(lines[start - 1:end])
+                error_text = "\n".join(
+                    f"- line {error.line - start + 1}: {error.message}\n  {error.context}"
+                    for error in window_errors
+                )
+                print(f"[AUTOFIX] {file_name} lines {start}-{end}: {window_errors[0].message}")
+                fixed = call_openai_api(
+                    "You are a LaTeX expert fixing a compile error. You receive an excerpt of a "
+                    "section file and the LaTeX error messages for it. Fix only what causes the "
+                    "errors, keep everything else unchanged, and do not add \\section headers. "
+                    "OUTPUT: Return only the corrected excerpt, nothing else.",
+                    f"LaTeX errors:\n{error_text}\n\nExcerpt:\n{snippet}",
+                    temperature=0,
+                    task="autofix"
+                )
+                if not fixed:
+                    return False
+                fixed, _ = strip_code_fences(fixed)
+                content = replace_lines(content, start, end, fixed)
             
-            # Write updated main.tex
-            try:
-                with open(main_tex_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                
-                print(f"[SUCCESS] main.tex updated with {len(section_files)} sections:")
-                for section_file in section_files:
-                    print(f"  • {section_file.stem}.tex")
-                
-                return True
-            except Exception as e:
-                print(f"[ERROR] Could not write main.tex: {e}")
-                return False
-        else:
-            print("[ERROR] Could not find \\maketitle in main.tex")
-            return False
-    else:
-        print("[ERROR] main.tex format not recognized")
-        return False
+            section_file.write_text(content, encoding='utf-8')
+            print(f"[AUTOFIX] Patched {file_name}")
+    
+    # The last round's patches have not been built yet
+    print("\n[AUTOFIX] Verifying the final fixes")
+    result = build_pdf(**build_options)
+    if result.success and not result.errors:
+        return True
+    print(f"[ERROR] Build still failing after {max_iterations} fix attempt(s)")
+    return False
 
+@traced("cite_doi")
 def fetch_doi_citation(doi):
     """Fetch BibTeX citation from DOI using CrossRef API"""
     print(f"[API] Fetching citation for DOI: {doi}")
     
     # CrossRef API endpoint
-    url = f"https://api.crossref.org/works/{doi}/transform/application/x-bibtex"
+    url = f"{os.environ.get('CROSSREF_URL', CROSSREF_URL).rstrip('/')}/works/{doi}/transform/application/x-bibtex"
     
     headers = {
         "User-Agent": "ModuTex/1.0 (mailto:user@example.com)"
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with span("network", doi=doi) as network:
+            response = requests.get(url, headers=headers, timeout=10)
+            network.set(status_code=response.status_code)
         
         if response.status_code == 200:
             bibtex = response.text
@@ -449,7 +908,7 @@ def fetch_doi_citation(doi):
             bib_dir.mkdir(exist_ok=True)
             
             bib_file = bib_dir / "references.bib"
-            with open(bib_file, 'a', encoding='utf-8') as f:
+            with span("write", file=bib_file.as_posix()), open(bib_file, 'a', encoding='utf-8') as f:
                 f.write(f"\n{bibtex}\n")
             
             print(f"[SUCCESS] Citation added to bib/references.bib")
@@ -473,21 +932,188 @@ def fetch_doi_citation(doi):
         print(f"[ERROR] Unexpected error: {e}")
         return False
 
+# Batch jobs: each entry maps a job kind to its command function and output file
+JOB_COMMANDS = {
+    'add_section': (lambda a: generate_section(a['name'], a['prompt']),
+                    lambda a: Path("sections") / f"{a['name']}.tex"),
+    'edit_section': (lambda a: edit_section(a['name'], a['prompt']),
+                     lambda a: Path("sections") / f"{a['name']}.tex"),
+    'text_to_latex': (lambda a: text_to_latex(a['text_file'], a.get('output_name')),
+                      lambda a: Path("sections") / f"{a.get('output_name') or Path(a['text_file']).stem + '_latex'}.tex"),
+    'cite_doi': (lambda a: fetch_doi_citation(a['doi']),
+                 lambda a: Path("bib") / "references.bib"),
+}
+
+def queue_batch(batch_file, store=None):
+    """Load a JSON batch file into the persistent job store"""
+    try:
+        with open(batch_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        print(f"[ERROR] Batch file not found: {batch_file}")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Batch file is not valid JSON: {e}")
+        return None
+    
+    if not isinstance(entries, list):
+        print("[ERROR] Batch file must contain a JSON list of jobs")
+        return None
+    
+    # Check every entry before queueing any, so a bad entry never leaves half a batch behind
+    jobs = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            print(f"[ERROR] Batch entry {number} is not a JSON object")
+            return None
+        entry = dict(entry)
+        kind = entry.pop('command', None)
+        if kind not in JOB_COMMANDS:
+            print(f"[ERROR] Unknown batch command in entry {number}: {kind}")
+            return None
+        jobs.append((kind, entry))
+    
+    store = store or JobStore()
+    batch = Path(batch_file).stem
+    store.add_jobs(batch, jobs)
+    
+    print(f"[INFO] Batch '{batch}' queued with {len(jobs)} jobs")
+    return batch
+
+def resume_batch(batch, store=None, max_attempts=MAX_ATTEMPTS):
+    """Run every unfinished job of a batch; completed jobs are skipped"""
+    store = store or JobStore()
+    
+    def output_hash(job):
+        return hash_file(JOB_COMMANDS[job['kind']][1](job['inputs']))
+    
+    # A job that died after writing its output is finished; running it again would
+    # apply an edit twice or append a citation twice
+    recovered, completed = store.recover_interrupted(batch, output_hash=output_hash)
+    if recovered:
+        print(f"[INFO] Recovered {recovered} interrupted job(s) from a previous run")
+    if completed:
+        print(f"[INFO] {completed} interrupted job(s) had already written their output - not run again")
+    
+    done_before = store.batches().get(batch, {}).get('done', 0)
+    if done_before:
+        print(f"[INFO] Skipping {done_before} completed job(s)")
+    
+    while True:
+        job = store.claim_next(batch, max_attempts=max_attempts, output_hash=output_hash)
+        if not job:
+            break
+        
+        run, output_path = JOB_COMMANDS[job['kind']]
+        print(f"\n[JOB] {job['kind']} {json.dumps(job['inputs'], ensure_ascii=False)} "
+              f"(attempt {job['attempts']}/{max_attempts})")
+        
+        try:
+            success = run(job['inputs'])
+        except Exception as e:
+            success = False
+            print(f"[ERROR] Job crashed: {e}")
+        
+        if success:
+            store.mark_done(job['id'], output_hash=hash_file(output_path(job['inputs'])))
+        else:
+            store.mark_failed(job['id'], "command reported failure")
+            if job['attempts'] < max_attempts:
+                # Back off before retrying so a network blip can clear
+                time.sleep(2 ** job['attempts'])
+    
+    counts = store.batches().get(batch, {})
+    print(f"\n[SUMMARY] Batch '{batch}': {counts.get('done', 0)} done, "
+          f"{counts.get('failed', 0)} failed, {counts.get('pending', 0)} pending")
+    pool = key_pool()
+    if len(pool.members) > 1:
+        print("[POOL] API keys after this batch:")
+        for line in pool.summary():
+            print(line)
+    return counts.get('failed', 0) == 0 and counts.get('pending', 0) == 0
+
+def show_jobs(batch=None, store=None):
+    """Print the state of queued batches or the jobs of a single batch"""
+    store = store or JobStore()
+    if batch:
+        jobs = store.list_jobs(batch)
+        if not jobs:
+            print(f"[INFO] No jobs in batch '{batch}'")
+            return
+        for job in jobs:
+            output = job['output_hash'][:12] if job['output_hash'] else '-'
+            print(f"  {job['seq']:>3}  {job['state']:<8} {job['kind']:<14} "
+                  f"attempts={job['attempts']}  output={output}  "
+                  f"{json.dumps(job['inputs'], ensure_ascii=False)[:60]}")
+    else:
+        batches = store.batches()
+        if not batches:
+            print("[INFO] Job store is empty")
+            return
+        for name, counts in batches.items():
+            states = ", ".join(f"{state}={n}" for state, n in sorted(counts.items()))
+            print(f"  {name}: {states}")
+
+def show_index():
+    """Print the section index: words, labels, references, citations and figures per section"""
+    index = load_index()
+    sections = index.sections()
+    if not sections:
+        print("[INFO] No sections found")
+        return
+    
+    print(f"{'Section':<24} {'Words':>6} {'Labels':>7} {'Refs':>5} {'Cites':>6} {'Figures':>8}")
+    print("-" * 60)
+    for entry in sections:
+        print(f"{entry['name']:<24} {entry['words']:>6} {len(entry['labels']):>7} "
+              f"{len(entry['refs']):>5} {len(entry['cites']):>6} {len(entry['figures']):>8}")
+    print("-" * 60)
+    print(f"{'Total':<24} {sum(e['words'] for e in sections):>6} {len(index.labels()):>7} "
+          f"{'':>5} {len(index.citations()):>6}")
+
+def check_references(show_warnings=True):
+    """Report undefined refs/cites, duplicate labels/keys and unused bib entries without compiling"""
+    start = time.perf_counter()
+    report = check_document()
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    for message in report['errors']:
+        print(f"[ERROR] {message}")
+    if show_warnings:
+        for message in report['warnings']:
+            print(f"[WARNING] {message}")
+    
+    print(f"[CHECK] {len(report['errors'])} error(s), {len(report['warnings'])} warning(s) in {elapsed:.1f} ms")
+    return not report['errors']
+
 def show_config():
     """Show current configuration"""
     print("ModuTex AI Configuration:")
     print("=" * 50)
     
-    api_key = os.environ.get('OPENAI_API_KEY', 'not_set')
-    if api_key == 'not_set' or api_key == 'your_api_key' or not api_key:
+    pool = key_pool()
+    if not pool.members:
         print("API Key: NOT SET")
         print("Get key from: https://platform.openai.com/api-keys")
+    elif len(pool.members) == 1:
+        print(f"API Key: CONFIGURED ({pool.members[0].label})")
     else:
-        masked_key = api_key[:10] + "..." + api_key[-4:] if len(api_key) > 15 else "SET"
-        print(f"API Key: CONFIGURED ({masked_key})")
+        print(f"API Keys: {len(pool.members)} in the pool (requests go to the key with the most quota left)")
+        for line in pool.summary():
+            print(line)
     
+    backend = active_backend()
+    capabilities = ", ".join(cap for cap in CAPABILITIES if backend.supports(cap)) or "none"
+    print(f"Backend: {backend.name} at {backend.base_url} ({len(backend.models)} model(s); supports {capabilities})")
     model = select_model()
-    print(f"Model: {model} ({MODELS.get(model, 'Unknown')})")
+    print(f"Model: {model} ({backend.models.get(model, 'Unknown')})")
+    if routing_enabled():
+        overrides = [f"{task}={task_override(task)}" for task in ROUTED_TASKS if task_override(task)]
+        print(f"Routing: automatic per task{' (overrides: ' + ', '.join(overrides) + ')' if overrides else ''}")
+    else:
+        overrides = [f"{task}={task_override(task)}" for task in ROUTED_TASKS if task_override(task)]
+        print("Routing: off (MODUTEX_ROUTING=on enables it) - every call uses the model above"
+              + (f" except {', '.join(overrides)}" if overrides else ""))
     
     print(f"Working Directory: {Path.cwd()}")
     print(f"Sections Directory: {'EXISTS' if Path('sections').exists() else 'MISSING'}")
@@ -502,8 +1128,23 @@ Examples:
   python texchat.py add_section methodology "Machine learning methodology"
   python texchat.py edit_section introduction "Add more mathematical background"
   python texchat.py text_to_latex my_text.txt result_section
+  python texchat.py text_to_latex notes.md notes --local
+  python texchat.py build --engine xelatex
   python texchat.py cite_doi 10.1038/nature12373
   python texchat.py update_main
+  python texchat.py update_main --include
+  python texchat.py build --only introduction,methodology
+  python texchat.py build --fix
+  python texchat.py build --targets article,ieee,elsevier
+  python texchat.py pipeline "Federated learning for medical imaging"
+  python texchat.py batch jobs.json
+  python texchat.py jobs resume jobs
+  python texchat.py manifest
+  python texchat.py check
+  python texchat.py check_sections --workers 8
+  python texchat.py index
+  python texchat.py trace --last 3
+  python texchat.py stats --days 30
   python texchat.py config
         """
     )
@@ -524,14 +1165,78 @@ Examples:
     text_parser = subparsers.add_parser('text_to_latex', help='Convert plain text to LaTeX')
     text_parser.add_argument('text_file', help='Input text file path')
     text_parser.add_argument('output_name', nargs='?', help='Output filename (optional)')
+    text_parser.add_argument('--local', action='store_true',
+                             help='Convert without the AI (ambiguous text is escaped as plain paragraphs)')
     
     # Update main.tex command
     update_parser = subparsers.add_parser('update_main', help='Update main.tex with all sections')
+    include_group = update_parser.add_mutually_exclusive_group()
+    include_group.add_argument('--include', dest='use_include', action='store_true', default=None,
+                               help='Use \\include (per-section .aux files, enables --only builds)')
+    include_group.add_argument('--input', dest='use_include', action='store_false',
+                               help='Use \\input (default for new documents)')
     
     # Cite DOI command
     cite_parser = subparsers.add_parser('cite_doi', help='Fetch BibTeX citation from DOI')
     cite_parser.add_argument('doi', help='DOI to fetch citation for')
     
+    # Build command
+    build_parser = subparsers.add_parser('build', help='Compile main.tex to PDF (incremental)')
+    build_parser.add_argument('--fix', action='store_true', help='Let AI fix LaTeX errors in the offending section lines')
+    build_parser.add_argument('--max-fix', type=int, default=3, help='Maximum fix iterations (default: 3)')
+    build_parser.add_argument('--only', help='Comma-separated sections to compile via \\includeonly '
+                              '(needs update_main --include); other pages keep numbers from the last full build')
+    build_parser.add_argument('--targets', help='Comma-separated templates to build in parallel, '
+                              'e.g. article,ieee,elsevier (or "all")')
+    build_parser.add_argument('--workers', type=int, help='Parallel build processes (default: one per target)')
+    build_parser.add_argument('--engine', choices=['pdflatex', 'xelatex', 'lualatex'],
+                              help='LaTeX engine (default: detected from the preamble, xelatex for Persian)')
+    build_parser.add_argument('--no-cache', action='store_true',
+                              help='Ignore the artifact cache (.modutex/artifacts and MODUTEX_REMOTE_CACHE)')
+    
+    # Pipeline command
+    pipeline_parser = subparsers.add_parser('pipeline', help='Generate a full paper from a topic: outline, sections, PDF')
+    pipeline_parser.add_argument('topic', help='Paper topic')
+    pipeline_parser.add_argument('--sections', type=int, default=5, help='Number of body sections (default: 5)')
+    pipeline_parser.add_argument('--workers', type=int, default=4, help='Concurrent AI requests (default: 4)')
+    pipeline_parser.add_argument('--no-build', action='store_true', help='Stop after updating main.tex')
+    
+    # Batch command
+    batch_parser = subparsers.add_parser('batch', help='Queue and run a JSON batch of AI jobs (resumable)')
+    batch_parser.add_argument('batch_file', help='JSON list of jobs, e.g. [{"command": "add_section", "name": ..., "prompt": ...}]')
+    
+    # Jobs command
+    jobs_parser = subparsers.add_parser('jobs', help='Inspect or resume queued batch jobs')
+    jobs_parser.add_argument('action', choices=['list', 'resume', 'retry', 'clear'], help='What to do')
+    jobs_parser.add_argument('batch', nargs='?', help='Batch name (file name without .json)')
+    
+    # Manifest command
+    subparsers.add_parser('manifest', help='Create document.json (section order, chapters, options) or show its include list')
+    
+    # Check command
+    check_parser = subparsers.add_parser('check', help='Find undefined refs/citations and duplicate labels without compiling')
+    check_parser.add_argument('--quiet', action='store_true', help='Hide unused-entry warnings')
+    
+    # Standalone section check command
+    sections_parser = subparsers.add_parser('check_sections', help='Compile each section on its own (in parallel) to find the ones that break the build')
+    sections_parser.add_argument('names', nargs='*', help='Sections to check (default: all)')
+    sections_parser.add_argument('--workers', type=int, help='Parallel LaTeX processes (default: one per CPU)')
+    sections_parser.add_argument('--engine', choices=['pdflatex', 'xelatex', 'lualatex'],
+                                 help='LaTeX engine (default: detected from the preamble)')
+    sections_parser.add_argument('--force', action='store_true', help='Also re-check sections that passed and did not change')
+    
+    # Index command
+    index_parser = subparsers.add_parser('index', help='Show per-section word counts, labels and citations')
+    
+    # Trace command
+    trace_parser = subparsers.add_parser('trace', help='Show per-stage timings of recent commands (MODUTEX_TRACE=1)')
+    trace_parser.add_argument('--last', type=int, default=1, help='Number of traces to show (default: 1)')
+    
+    # Stats command
+    stats_parser = subparsers.add_parser('stats', help='Show AI latency, tokens/sec, cost and build times over time')
+    stats_parser.add_argument('--days', type=int, default=7, help='Time window in days, 0 for everything (default: 7)')
+    stats_parser.add_argument('--model', help='Only calls to this model')
+    
     # Config command
     config_parser = subparsers.add_parser('config', help='Show current configuration')
     
@@ -546,17 +1251,84 @@ Examples:
         sys.exit(0 if success else 1)
         
     elif args.command == 'text_to_latex':
-        success = text_to_latex(args.text_file, args.output_name)
+        success = text_to_latex(args.text_file, args.output_name, local_only=args.local)
         sys.exit(0 if success else 1)
         
     elif args.command == 'update_main':
-        success = update_main_tex()
+        success = update_main_tex(use_include=args.use_include)
         sys.exit(0 if success else 1)
         
     elif args.command == 'cite_doi':
         success = fetch_doi_citation(args.doi)
         sys.exit(0 if success else 1)
         
+    elif args.command == 'build':
+        only = [name.strip() for name in args.only.split(',')] if args.only else None
+        if args.targets:
+            # Each target is a full build with its template's own engine
+            if only or args.engine or args.fix:
+                parser.error("--targets cannot be combined with --only, --engine or --fix")
+            targets = None if args.targets == 'all' else [t.strip() for t in args.targets.split(',')]
+            reports = build_matrix(targets, max_workers=args.workers)
+            success = bool(reports) and all(report['success'] for report in reports)
+        elif args.fix:
+            success = fix_build_errors(args.max_fix, only=only, engine=args.engine, cache=not args.no_cache)
+        else:
+            result = build_pdf(only=only, engine=args.engine, cache=not args.no_cache)
+            success = result.success and not result.errors
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'pipeline':
+        success = run_pipeline(args.topic, args.sections, args.workers, build=not args.no_build)
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'batch':
+        batch = queue_batch(args.batch_file)
+        success = batch is not None and resume_batch(batch)
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'jobs':
+        if args.action == 'list':
+            show_jobs(args.batch)
+            sys.exit(0)
+        if not args.batch:
+            print(f"[ERROR] 'jobs {args.action}' needs a batch name")
+            sys.exit(1)
+        if args.action == 'resume':
+            success = resume_batch(args.batch)
+        elif args.action == 'retry':
+            print(f"[INFO] Reset {JobStore().retry_failed(args.batch)} failed job(s)")
+            success = resume_batch(args.batch)
+        else:
+            print(f"[INFO] Removed {JobStore().clear(args.batch)} job(s)")
+            success = True
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'manifest':
+        success = show_manifest()
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'check':
+        success = check_references(show_warnings=not args.quiet)
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'check_sections':
+        reports = check_sections(args.names, engine=args.engine, max_workers=args.workers, force=args.force)
+        sys.exit(0 if reports and all(report['ok'] for report in reports) else 1)
+        
+    elif args.command == 'index':
+        show_index()
+        sys.exit(0)
+        
+    elif args.command == 'trace':
+        success = print_traces(args.last)
+        sys.exit(0 if success else 1)
+        
+    elif args.command == 'stats':
+        for line in stats_report(args.days, args.model):
+            print(line)
+        sys.exit(0)
+        
     elif args.command == 'config':
         show_config()
         sys.exit(0)